@@ -0,0 +1,161 @@
+import concurrent.futures
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+logger.setLevel('INFO')
+
+import sublime
+import sublime_plugin
+
+from .classes.analysis import (
+    ERROR,
+    WARNING,
+    Diagnostic,
+    analyze,
+    format_diagnostic
+)
+from .classes.analysis_server import (
+    AnalysisServerError,
+    get_analysis_client,
+    stop_analysis_client
+)
+from .classes.command_templates import FocusFileCommand
+from .tools.classes import get_ring_file, is_focus_file
+from .tools.settings import get_analysis_server_python, get_analyze_on_save
+from .tools.sublime import display_in_output_panel
+
+
+REGION_KEYS = {ERROR: 'focus_analysis_errors',
+               WARNING: 'focus_analysis_warnings'}
+REGION_SCOPES = {ERROR: 'invalid.illegal',
+                 WARNING: 'invalid.deprecated'}
+REGION_FLAGS = (sublime.DRAW_NO_FILL | sublime.DRAW_NO_OUTLINE |
+                sublime.DRAW_SQUIGGLY_UNDERLINE)
+PANEL_ID = 'focus_analysis'
+
+# Seconds to wait for the analysis server
+SERVER_TIMEOUT = 30
+
+# The pending server request for each view, by view id
+PendingRequests = dict()
+
+
+def analyze_in_server(view, contents, ring_file, python):
+    """
+    Returns the Diagnostics for contents from the analysis server. A request
+    still pending for the view is cancelled, since its contents are out of
+    date.
+
+    Raises AnalysisServerError if the server fails, or
+    concurrent.futures.CancelledError if a newer request replaces this one.
+
+    """
+    client = get_analysis_client(python, sublime.packages_path())
+    search_paths = None
+    if ring_file.ring is not None:
+        search_paths = ring_file.ring.get_search_paths()
+
+    previous = PendingRequests.get(view.id())
+    if previous is not None:
+        client.cancel(previous)
+
+    future = client.request('analyze', contents=contents,
+                            fileName=ring_file.file_name,
+                            searchPaths=search_paths)
+    PendingRequests[view.id()] = future
+    try:
+        results = future.result(SERVER_TIMEOUT)
+    finally:
+        if PendingRequests.get(view.id()) is future:
+            del PendingRequests[view.id()]
+
+    return [Diagnostic(d['code'], d['message'], tuple(d['span']),
+                       d['severity']) for d in results]
+
+
+def analyze_view(view, ring_file):
+    """
+    Analyzes the contents of a view, marks the diagnostics in it and returns
+    the list of Diagnostics.
+
+    """
+    contents = view.substr(sublime.Region(0, view.size()))
+    python = get_analysis_server_python()
+    if python:
+        diagnostics = analyze_in_server(view, contents, ring_file, python)
+    else:
+        # The server isn't needed once analysis_server_python is cleared
+        stop_analysis_client()
+        resolve_many = None
+        if ring_file.ring is not None:
+            resolve_many = ring_file.ring.resolve_many
+        diagnostics = analyze(contents, ring_file.file_name, resolve_many)
+
+    for severity, key in REGION_KEYS.items():
+        view.add_regions(key, [sublime.Region(*d.span) for d in diagnostics
+                               if d.severity == severity],
+                         REGION_SCOPES[severity], '', REGION_FLAGS)
+
+    if diagnostics:
+        view.set_status(PANEL_ID,
+                        'Focus: {0} problems'.format(len(diagnostics)))
+    else:
+        view.erase_status(PANEL_ID)
+
+    return diagnostics
+
+
+def display_diagnostics(window, file_name, contents, diagnostics):
+    lines = [format_diagnostic(os.path.basename(file_name), contents, d) for
+             d in diagnostics]
+    lines.append('{0} problems in {1}'.format(len(diagnostics), file_name))
+    display_in_output_panel(window, PANEL_ID, text='\n'.join(lines))
+
+
+class FocusAnalysisEventListener(sublime_plugin.EventListener):
+
+    def on_post_save_async(self, view):
+        if not get_analyze_on_save():
+            return
+
+        ring_file = get_ring_file(view.file_name())
+        if not is_focus_file(ring_file):
+            return
+
+        try:
+            analyze_view(view, ring_file)
+        except concurrent.futures.CancelledError:
+            pass
+        except AnalysisServerError as e:
+            logger.warning('Analysis server failed for %s: %s',
+                           ring_file.file_name, e)
+        except Exception:
+            logger.exception('Failed to analyze %s', ring_file.file_name)
+
+
+class AnalyzeFocusFileCommand(FocusFileCommand):
+    """Analyzes the file and lists the problems found in an output panel."""
+
+    def run(self, edit):
+        sublime.status_message('Analyzing ' + self.file_name)
+        sublime.set_timeout_async(self.run_async, 0)
+
+    def run_async(self):
+        try:
+            diagnostics = analyze_view(self.view, self.focus_file)
+        except concurrent.futures.CancelledError:
+            sublime.status_message('Analysis of {0} was cancelled'.format(
+                self.file_name))
+            return
+        except AnalysisServerError as e:
+            logger.warning('Analysis server failed for %s: %s',
+                           self.file_name, e)
+            sublime.status_message('Failed to analyze {0}: {1}'.format(
+                self.file_name, e))
+            return
+
+        display_diagnostics(
+            self.view.window(), self.file_name,
+            self.view.substr(sublime.Region(0, self.view.size())),
+            diagnostics)
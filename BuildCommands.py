@@ -12,6 +12,10 @@ import sublime
 import sublime_plugin
 
 from .classes.command_templates import CallbackCmdMeta
+from .classes.process_supervisor import (
+    get_process_supervisor,
+    log_job_exit
+)
 from .tools.classes import (
     get_ring,
     is_local_ring,
@@ -123,6 +127,9 @@ class RingExecCommand(sublime_plugin.TextCommand, metaclass=CallbackCmdMeta):
             logger.warning('no shell_cmd defined')
             return
         else:
+            # Builds run through the build system's exec_cmd instead of the
+            # ProcessSupervisor, so their output and errors are shown in the
+            # build panel by whatever target the build system names.
             logger.debug("post_run_callback: self.exec_cmd: %s", self.exec_cmd)
             if isinstance(shell_cmd, str):
                 self.replace_variables()
@@ -237,30 +244,36 @@ class RingRunCommand(RingExecCommand):
                     updated_cmd.append(a)
                 cmd = updated_cmd
 
-            subprocess.Popen(cmd, env=proc_env, shell=shell)
+            get_process_supervisor().submit(cmd, env=proc_env, shell=shell,
+                                            on_exit=log_job_exit,
+                                            detached=True)
 
     @staticmethod
     def launch_shell_command(shell_cmd, startupinfo, env):
         logger.debug("shell_cmd: %s", shell_cmd)
         logger.debug("env:%s", env)
+        supervisor = get_process_supervisor()
         if sys.platform == "win32":
             # Use shell=True on Windows, so shell_cmd is passed through
             # with the correct escaping
-            subprocess.Popen(shell_cmd, startupinfo=startupinfo,
-                             env=env, shell=True)
+            supervisor.submit(shell_cmd, startupinfo=startupinfo,
+                              env=env, shell=True, on_exit=log_job_exit,
+                              detached=True)
         elif sys.platform == "darwin":
             # Use a login shell on OSX, otherwise the users expected env
             # vars won't be setup
-            subprocess.Popen(["/bin/bash", "-l", "-c", shell_cmd],
-                             startupinfo=startupinfo, env=env,
-                             shell=False)
+            supervisor.submit(["/bin/bash", "-l", "-c", shell_cmd],
+                              name=shell_cmd, startupinfo=startupinfo,
+                              env=env, shell=False, on_exit=log_job_exit,
+                              detached=True)
         elif sys.platform == "linux":
             # Explicitly use /bin/bash on Linux, to keep Linux and OSX as
             # similar as possible. A login shell is explicitly not used for
             # linux, as it's not required
-            subprocess.Popen(["/bin/bash", "-c", shell_cmd],
-                             startupinfo=startupinfo, env=env,
-                             shell=False)
+            supervisor.submit(["/bin/bash", "-c", shell_cmd],
+                              name=shell_cmd, startupinfo=startupinfo,
+                              env=env, shell=False, on_exit=log_job_exit,
+                              detached=True)
 
 
     def create_results_file(self):
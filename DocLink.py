@@ -1,3 +1,4 @@
+import concurrent.futures
 import functools
 import html
 import imp
@@ -29,11 +30,13 @@ except ImportError as e:
     logger.error('EntitySelect package not installed')
     raise e
 
+from .classes import ring_queries
+from .classes.analysis_server import AnalysisServerError
 from .classes.code_blocks import CodeBlockSet
 from .tools.classes import get_ring_file, get_view
 from .tools.focus import TRANSLATOR_SEPARATOR
 from .tools.general import create_folder, string_search, string_match
-from .tools.sublime import split_focus_function
+from .tools.sublime import split_focus_function, strip_alias
 from .tools.settings import (
     get_show_doc_setting,
     get_focus_wiki_setting,
@@ -58,6 +61,7 @@ h2 { font-size: 12ex; padding-left: 1em; }
 def plugin_loaded():
     for c in EntitySelector.get_defined_classes(globals()):
         c.add_possible_selector()
+
     FSFunctionDocLink.load_doc_cache()
     FocusFunctionDocLink.load_doc_cache()
 
@@ -68,6 +72,47 @@ def plugin_unloaded():
     imp.reload(sys.modules[__name__])
 
 
+def show_doc_from_index(doc_link, find):
+    """
+    Looks up a definition in the ring's indexes on a worker thread, and
+    shows it if it's found. A lookup still pending for the same view is
+    cancelled.
+
+    Keyword arguments:
+    doc_link - The DocLink showing the definition.
+    find - Called with the key for the lookup. Returns a tuple of the file
+        and span of the definition, or None.
+
+    """
+    def lookup():
+        try:
+            location = find(('DocLink', doc_link.view.id()))
+        except concurrent.futures.CancelledError:
+            return
+        except (AnalysisServerError, concurrent.futures.TimeoutError) as e:
+            logger.warning('Failed to look up %s: %s',
+                           doc_link.search_string, e)
+            location = None
+
+        if location is None:
+            sublime.status_message("Documentation for {0} not found".format(
+                doc_link.search_string))
+            return
+
+        file_name, span = location
+
+        def show():
+            doc_link.show_doc_in_file(file_name,
+                                      sublime.Region(span[0], span[1]))
+            sublime.status_message(
+                "Documentation for {0} found in {1}".format(
+                    doc_link.search_string, os.path.basename(file_name)))
+
+        sublime.set_timeout(show, 0)
+
+    sublime.set_timeout_async(lookup, 0)
+
+
 def get_set_reg_ex(upper_or_lower, set_number):
     if upper_or_lower.islower():
         upper_or_lower = r"[a-z]"
@@ -866,15 +911,24 @@ class SubroutineDocLink(DocLink, Highlight):
     def show_doc(self):
         sublime.status_message(self.open_status_message)
 
-        for view_or_file, file_name in self.mt_file_or_view_iter():
-            if self.find_and_show(view_or_file, file_name):
-                sublime.status_message(
-                    "Documentation for {0} found in {1}".format(
-                        self.search_string, os.path.basename(file_name)))
-                return
+        # The current view may have changes that aren't saved yet
+        file_name = self.view.file_name()
+        if self.find_and_show(get_view(self.view), file_name):
+            sublime.status_message(
+                "Documentation for {0} found in {1}".format(
+                    self.search_string, os.path.basename(file_name)))
+            return
 
-        sublime.status_message("Documentation for {0} not found".format(
-            self.search_string))
+        ring_file = get_ring_file(file_name)
+        if (ring_file is None) or (ring_file.ring is None):
+            sublime.status_message("Documentation for {0} not found".format(
+                self.search_string))
+            return
+
+        # The files it includes are searched by the ring's index
+        show_doc_from_index(
+            self, lambda key: ring_queries.find_member(
+                ring_file, self.search_string, key=key))
 
     def find_and_show(self, view_or_file, file_name):
         if view_or_file is None:
@@ -887,27 +941,6 @@ class SubroutineDocLink(DocLink, Highlight):
 
         return False
 
-    def mt_file_or_view_iter(self):
-        """
-        Generator that yields an MTView object or MTRingFile object along
-        with the file name for each file that needs to be checked.
-
-        """
-        ring_view = get_view(self.view)
-        if ring_view is None:
-            return []
-        file_name = self.view.file_name()
-        yield (ring_view, file_name)
-
-        ring_file = get_ring_file(file_name)
-        if (ring_file is None) or (ring_file.ring is None):
-            return
-
-        for f in ring_file.get_include_files(current_file=False):
-            inc_file = get_ring_file(f)
-            if inc_file is not None:
-                yield (inc_file, f)
-
     def get_highlight_regions(self):
         return [r for r in self.view.find_by_selector(
                 'entity.name.subroutine.fs, entity.name.list.fs') if
@@ -1009,15 +1042,25 @@ class AliasDocLink(DocLink):
     def show_doc(self):
         sublime.status_message(self.open_status_message)
 
-        for view_or_file, file_name in self.mt_file_or_view_iter():
-            if self.find_and_show(view_or_file, file_name):
-                sublime.status_message(
-                    "Documentation for {0} found in {1}".format(
-                        self.search_string, os.path.basename(file_name)))
-                return
+        # The current view may have changes that aren't saved yet
+        file_name = self.view.file_name()
+        if self.find_and_show(get_view(self.view), file_name):
+            sublime.status_message(
+                "Documentation for {0} found in {1}".format(
+                    self.search_string, os.path.basename(file_name)))
+            return
 
-        sublime.status_message("Documentation for {0} not found".format(
-            self.search_string))
+        ring_file = get_ring_file(file_name)
+        alias = strip_alias(self.search_string)
+        if (ring_file is None) or (ring_file.ring is None) or (alias is None):
+            sublime.status_message("Documentation for {0} not found".format(
+                self.search_string))
+            return
+
+        # The alias list and includes are searched by the ring's index
+        show_doc_from_index(
+            self, lambda key: ring_queries.find_alias(
+                ring_file, alias, key=key))
 
     def find_and_show(self, view_or_file, file_name):
         if view_or_file is None:
@@ -1032,39 +1075,6 @@ class AliasDocLink(DocLink):
 
         return False
 
-    def mt_file_or_view_iter(self):
-        """
-        Function: mt_file_or_view_iter
-        Summary: Generator that yields an MTView object or MTRingFile object
-            along with the file name for each file that needs to be checked.
-        Examples:
-            for view_or_file, file_name in self.mt_file_or_view_iter():
-                print(file_name)
-        Returns: A generator yielding all possible locations for the alias
-        """
-        ring_view = get_view(self.view)
-        if ring_view is None:
-            return []
-        file_name = self.view.file_name()
-        yield (ring_view, file_name)
-
-        ring_file = get_ring_file(file_name)
-        if (ring_file is None) or (ring_file.ring is None):
-            return
-
-        file_name = ring_file.ring.find_alias_definition(
-            self.search_string)
-        if file_name is not None:
-            ring_file_2 = get_ring_file(file_name)
-            if ring_file_2 is not None:
-                yield (ring_file_2, file_name)
-            return
-
-        for f in ring_file.get_include_files(current_file=False):
-            inc_file = get_ring_file(f)
-            if inc_file is not None:
-                yield (inc_file, f)
-
 
 class IncludeFileDocLink(DocLink):
     """
@@ -1733,16 +1743,31 @@ class RTToolDocLink(DocLink):
     def show_doc(self):
         sublime.status_message(self.open_status_message)
 
-        for view_or_file, file_name in self.mt_file_or_view_iter():
-            if self.find_and_show(view_or_file, file_name):
-                sublime.status_message(
-                    "Documentation for {0} found in {1}".format(
-                        self.search_string, os.path.basename(file_name)))
+        # A tool defined in the current file may not be saved yet
+        file_name = self.view.file_name()
+        start_letter = self.search_string[1]
+        if (os.path.split(file_name)[1].startswith(start_letter) and
+                self.find_and_show(get_view(self.view), file_name)):
+            self.found_status_message(file_name)
+            return
+
+        tool_index = self.get_tool_index()
+        if tool_index is not None:
+            entry = tool_index.get_tool(self.search_string)
+            if entry is not None:
+                region = sublime.Region(entry.span[0], entry.span[1])
+                self.show_doc_in_file(entry.file_name, region)
+                self.found_status_message(entry.file_name)
                 return
 
         sublime.status_message("Documentation for {0} not found".format(
             self.search_string))
 
+    def found_status_message(self, file_name):
+        sublime.status_message(
+            "Documentation for {0} found in {1}".format(
+                self.search_string, os.path.basename(file_name)))
+
     def find_and_show(self, view_or_file, file_name):
         if view_or_file is None:
             return False
@@ -1759,47 +1784,17 @@ class RTToolDocLink(DocLink):
 
         return False
 
-    def mt_file_or_view_iter(self):
-        """
-        Generator that yields an MTView object or MTRingFile object along
-        with the file name for each file that needs to be checked.
-
-        """
-        start_letter = self.search_string[1]
-        logger.debug('start_letter = %s', start_letter)
-        file_name = self.view.file_name()
-        logger.debug('file_name = %s', file_name)
-        if os.path.split(file_name)[1].startswith(start_letter):
-            ring_view = get_view(self.view)
-            if ring_view is not None:
-                yield (ring_view, file_name)
-
-        tools_path = self.get_tools_path()
-        if tools_path is None:
-            return
-
-        for f in os.listdir(tools_path):
-            if f.startswith(start_letter):
-                f = os.path.join(tools_path, f)
-                ring_file_2 = get_ring_file(f)
-                if ring_file_2 is not None:
-                    yield (ring_file_2, f)
-
-    def get_tools_path(self):
+    def get_tool_index(self):
+        """Returns the ToolIndex of the ring's RT or TT tools, or None."""
         file_name = self.view.file_name().lower()
         ring_file = get_ring_file(file_name)
-        if ring_file is None:
+        if (ring_file is None) or (ring_file.ring is None):
             return None
 
         if ('translators' in file_name) or ('tttools' in file_name):
-            path = os.path.join(ring_file.ring.system_path, 'TTTools')
+            return ring_file.ring.get_tool_index('TTTools')
         else:
-            path = os.path.join(ring_file.ring.system_path, 'RTTools')
-
-        if os.path.isdir(path):
-            return path
-        else:
-            return None
+            return ring_file.ring.get_tool_index('RTTools')
 
 
 class FileMatchDocLink(DocLink):
@@ -1,4 +1,5 @@
 import functools
+import itertools
 import logging
 import os
 
@@ -9,9 +10,10 @@ import sublime
 import sublime_plugin
 
 from .classes.command_templates import RingFileCommand
-from .tools.classes import get_ring_file, is_local_ring
+from .classes.prefetch import summarize
+from .tools.classes import get_ring_file, is_focus_file, is_local_ring
 from .tools.general import merge_paths
-from .tools.settings import get_translate_on_save
+from .tools.settings import get_prefetch_max_workers, get_translate_on_save
 
 
 class MTRingFileEventListener(sublime_plugin.EventListener):
@@ -33,6 +35,16 @@ class MTRingFileEventListener(sublime_plugin.EventListener):
             view.set_read_only(False)
             view.erase_status('focus_read_only')
 
+    def on_load_async(self, view):
+        ring_file = get_ring_file(view.file_name())
+        if ((ring_file is None) or (ring_file.ring is None) or
+                is_local_ring(ring_file.ring)):
+            return
+
+        if ring_file.ring.refresh_cached_file(ring_file.file_name):
+            logger.info('Refreshed prefetched file %s', ring_file.file_name)
+            view.run_command('revert')
+
     def on_post_save_async(self, view):
         s = get_translate_on_save()
 
@@ -118,6 +130,87 @@ class CopyFileToCacheCommand(RingFileCommand):
             return "Copy File to Cache"
 
 
+class PrefetchToCacheCommand(RingFileCommand):
+    """
+    Command to copy files from the ring server path to the local cache in
+    the background, so they are opened locally afterwards.
+
+    """
+
+    Scopes = {'file': 'File and Includes',
+              'application': 'Application',
+              'window': 'Open Files'}
+
+    def run(self, edit, scope='file'):
+        if not self.is_enabled(scope):
+            return
+
+        ring = self.ring_file.ring
+        if scope == 'application':
+            files = self.get_application_files()
+        elif scope == 'window':
+            ring_files = [get_ring_file(v.file_name()) for v in
+                          self.view.window().views()]
+            files = itertools.chain.from_iterable(
+                self.get_working_set(f) for f in ring_files if
+                (f is not None) and (f.ring == ring))
+        else:
+            files = self.get_working_set(self.ring_file)
+
+        sublime.status_message('Prefetching files for %s' % ring)
+        sublime.set_timeout_async(
+            functools.partial(self.prefetch, ring, files), 0)
+
+    def prefetch(self, ring, files):
+        results = ring.prefetch_to_cache(files, get_prefetch_max_workers())
+        message = 'Prefetched files for %s: %s' % (ring, summarize(results))
+        logger.info(message)
+        sublime.status_message(message)
+
+    def get_working_set(self, ring_file):
+        """
+        Returns an iterator of the file, its includes and its External
+        PageSets. The includes are resolved lazily, so they are read in the
+        background once prefetching starts.
+
+        """
+        files = [ring_file.file_name]
+        if is_focus_file(ring_file):
+            files = itertools.chain(
+                files, ring_file.get_include_files(current_file=False),
+                ring_file.get_external_pageset_files(current_file=False))
+        return files
+
+    def get_application_files(self):
+        """Yields the files in the application folder on the server."""
+        ring = self.ring_file.ring
+        app, name = ring.get_app_and_filename(self.file_name)
+        folder = os.path.join(ring.server_path, 'PgmSource', app)
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+
+        for n in names:
+            path = os.path.join(folder, n)
+            if os.path.isfile(path):
+                yield path
+
+    def is_visible(self, scope='file'):
+        """Returns True if the Ring is not a local ring."""
+        return ((self.ring_file is not None) and
+                (self.ring_file.ring is not None) and
+                (not is_local_ring(self.ring_file.ring)))
+
+    def is_enabled(self, scope='file'):
+        """Returns True if the ring has a server path and a cache."""
+        return (self.is_visible() and
+                (self.ring_file.ring.prefetcher is not None))
+
+    def description(self, scope='file'):
+        return 'Prefetch %s to Cache' % self.Scopes.get(scope, 'Files')
+
+
 class DeleteFileFromCacheCommand(RingFileCommand):
     """Command to delete the file from the local cache."""
 
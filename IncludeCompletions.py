@@ -4,6 +4,7 @@ import re
 logger = logging.getLogger(__name__)
 
 import sublime
+import sublime_plugin
 
 try:
     from DynamicCompletions import FileLoader
@@ -11,6 +12,12 @@ except ImportError as e:
     logger.error('DynamicCompletions package not installed')
     raise e
 
+from .classes.completion_store import CompactCompletions
+from .classes.include_summary import IncludeSummaryCache, summarize_include
+from .classes.loader_scheduler import (
+    ScheduledLoaderMixin,
+    get_loader_scheduler
+)
 from .tools.classes import get_ring_file
 from .tools.settings import get_completion_source_enabled_setting
 
@@ -31,7 +38,11 @@ from .misc.completion_types import (
 )
 
 
-class IncludeFileLoader(FileLoader):
+IncludeSummaries = IncludeSummaryCache(
+    lambda file_name: summarize_include(get_ring_file(file_name)))
+
+
+class IncludeFileLoader(ScheduledLoaderMixin, FileLoader):
     """
     Parent class for CompletionLoaders that load completions from an Include
     file.
@@ -70,17 +81,28 @@ class IncludeFileLoader(FileLoader):
         if not include_files:
             return []
 
+        IncludeSummaries.acquire(view.id(), include_files)
+        scheduler = get_loader_scheduler()
         instances = set()
         for f in include_files:
             logger.debug('%s;  f = %s', cls, f)
             try:
-                instances.add(cls.Instances[f])
+                instance = cls.Instances[f]
             except KeyError:
-                instances.add(cls(file_path=f))
+                instance = cls(file_path=f)
             except AttributeError:
-                instances.add(cls(file_path=f))
+                instance = cls(file_path=f)
+            scheduler.register_view(view.id(), instance.get_load_key())
+            instances.add(instance)
         return instances
 
+    def get_load_key(self):
+        return (self.__class__.__name__, self.file_path)
+
+    def get_summary(self):
+        """Returns the shared IncludeSummary of the Include file."""
+        return IncludeSummaries.get(self.file_path)
+
 
 class AliasIncludeLoader(IncludeFileLoader):
     """
@@ -105,16 +127,13 @@ class AliasIncludeLoader(IncludeFileLoader):
         if super().view_check(view):
             return get_completion_source_enabled_setting('Alias', 'Include')
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
-        Populate self.completions with Aliases from an Include file.
+        Returns completions for the Aliases in an Include file.
 
         """
-        self.completions = set()
-        ring_file = get_ring_file(self.file_path)
-        for alias in ring_file.get_defined_aliases():
-            alias = '@@' + alias + '()'
-            self.completions.add((alias + '\tInclude', alias[2:]))
+        return CompactCompletions(self.get_summary().aliases,
+                                  '@@{0}()\tInclude', '{0}()')
 
 
 class LocalIncludeLoader(IncludeFileLoader):
@@ -139,16 +158,13 @@ class LocalIncludeLoader(IncludeFileLoader):
         if super().view_check(view):
             return get_completion_source_enabled_setting('Local', 'Include')
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
-        Populate self.completions with Locals from an Include file.
+        Returns completions for the Locals in an Include file.
 
         """
-        self.completions = set()
-        ring_file = get_ring_file(self.file_path)
-        for local in (ring_file.get_used_locals() |
-                      ring_file.get_defined_locals()):
-            self.completions.add((local + '\tInclude', local))
+        return CompactCompletions(self.get_summary().locals,
+                                  '{0}\tInclude', '{0}')
 
 
 class ObjectIncludeLoader(IncludeFileLoader):
@@ -172,18 +188,13 @@ class ObjectIncludeLoader(IncludeFileLoader):
         if super().view_check(view):
             return get_completion_source_enabled_setting('Object', 'Include')
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
-        Populate self.completions with objects from an Include file.
+        Returns completions for the objects in an Include file.
 
         """
-        self.completions = dict()
-        ring_file = get_ring_file(self.file_path)
-        object_dict = ring_file.get_defined_objects()
-
-        for key, object_set in object_dict.items():
-            self.completions[key] = set(
-                [(x + '\tInclude', x) for x in object_set])
+        return {k: CompactCompletions(v, '{0}\tInclude', '{0}') for k, v in
+                self.get_summary().objects.items()}
 
 
 class SubroutineIncludeLoader(IncludeFileLoader):
@@ -209,15 +220,13 @@ class SubroutineIncludeLoader(IncludeFileLoader):
             return get_completion_source_enabled_setting('Subroutine',
                                                          'Include')
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
-        Populate self.completions with subroutines from an Include file.
+        Returns completions for the subroutines in an Include file.
 
         """
-        ring_file = get_ring_file(self.file_path)
-        self.completions = set(
-            [(x + '\tInclude', x) for x in
-             ring_file.get_defined_subroutines()])
+        return CompactCompletions(self.get_summary().subroutines,
+                                  '{0}\tInclude', '{0}')
 
 
 class ListIncludeLoader(IncludeFileLoader):
@@ -243,11 +252,17 @@ class ListIncludeLoader(IncludeFileLoader):
             return get_completion_source_enabled_setting('List',
                                                          'Include')
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
-        Populate self.completions with Lists from an Include file.
+        Returns completions for the Lists in an Include file.
 
         """
-        ring_file = get_ring_file(self.file_path)
-        self.completions = set(
-            [(x + '\tInclude', x) for x in ring_file.get_defined_lists()])
+        return CompactCompletions(self.get_summary().lists,
+                                  '{0}\tInclude', '{0}')
+
+
+class IncludeSummaryEventListener(sublime_plugin.EventListener):
+    """Releases the Include summaries used by views that close."""
+
+    def on_close(self, view):
+        IncludeSummaries.release(view.id())
@@ -0,0 +1,60 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+import sublime
+import sublime_plugin
+
+from .classes.process_supervisor import (
+    format_job,
+    format_jobs,
+    get_process_supervisor
+)
+from .tools.settings import get_max_processes
+from .tools.sublime import display_in_output_panel
+
+
+PANEL_ID = 'focus_jobs'
+
+
+class ShowFocusJobsCommand(sublime_plugin.WindowCommand):
+    """
+    Shows the magic.exe processes that are running or queued, and the ones
+    that have recently ended, with their exit codes and latest output.
+
+    """
+
+    def run(self):
+        supervisor = get_process_supervisor()
+        display_in_output_panel(
+            self.window, PANEL_ID,
+            text=format_jobs(supervisor.get_jobs(), supervisor.clock()))
+
+
+class CancelFocusJobCommand(sublime_plugin.WindowCommand):
+    """Cancels a running or queued magic.exe process chosen from a list."""
+
+    def run(self):
+        supervisor = get_process_supervisor()
+        self.jobs = supervisor.get_active_jobs()
+        if not self.jobs:
+            sublime.status_message('No running jobs')
+            return
+
+        now = supervisor.clock()
+        self.window.show_quick_panel(
+            [format_job(j, now) for j in self.jobs], self.cancel_job)
+
+    def cancel_job(self, index):
+        if index == -1:
+            return
+
+        job = self.jobs[index]
+        if get_process_supervisor().cancel(job):
+            sublime.status_message('Cancelled {0}'.format(job))
+        else:
+            sublime.status_message('{0} has already ended'.format(job))
+
+
+def plugin_loaded():
+    get_process_supervisor().max_workers = get_max_processes()
@@ -21,6 +21,9 @@ from .tools.classes import (
     is_local_ring
 )
 from .classes.command_templates import RingCommand
+from .classes.file_watcher import stop_file_watcher
+from .classes.manifest import SourceManifest, format_report
+from .tools.sublime import display_in_new_view
 
 logger = logging.getLogger(__name__)
 logger.setLevel('DEBUG')
@@ -33,6 +36,26 @@ def _check_for_compare_in():
     CompareInInstalled = 'CompareIn' in sys.modules.keys()
 
 
+def compare_files(left_ring, left_file, right_ring, right_file):
+    """
+    Compares two ring files with CompareIn. Files on a server are opened
+    read-only.
+
+    """
+    left_read_only = right_read_only = False
+    if not is_local_ring(left_ring):
+        if (left_ring.server_path in left_file):
+            left_read_only = True
+    if not is_local_ring(right_ring):
+        if (right_ring.server_path in right_file):
+            right_read_only = True
+    sublime.run_command('compare_in',
+                        {'left_file': left_file,
+                         'right_file': right_file,
+                         'left_read_only': left_read_only,
+                         'right_read_only': right_read_only})
+
+
 def _load_installed_rings():
     dirs_to_check = set()
     directories = get_universe_roots()
@@ -63,6 +86,10 @@ def plugin_loaded():
     _load_installed_rings()
 
 
+def plugin_unloaded():
+    stop_file_watcher()
+
+
 class RingUpdateCommand(RingCommand):
     """Runs the SVN Ring Update command for a chosen ring."""
 
@@ -361,18 +388,8 @@ class OpenInOtherRingCommand(RingCommand):
                         self.current_file,
                         self.target_file)
 
-            left_read_only = right_read_only = False
-            if not is_local_ring(self.current_ring):
-                if (self.current_ring.server_path in self.current_file):
-                    left_read_only = True
-            if not is_local_ring(self.target_ring):
-                if (self.target_ring.server_path in self.target_file):
-                    right_read_only = True
-            sublime.run_command('compare_in',
-                                {'left_file': self.current_file,
-                                 'right_file': self.target_file,
-                                 'left_read_only': left_read_only,
-                                 'right_read_only': right_read_only})
+            compare_files(self.current_ring, self.current_file,
+                          self.target_ring, self.target_file)
 
         else:
             logger.info('Opening file: %s', self.target_file)
@@ -670,3 +687,101 @@ class BrowseSourceCommand(RingCommand):
             return False
         else:
             return os.path.isdir(ring.pgmsource_path)
+
+
+class CompareRingSourcesCommand(RingCommand):
+    """
+    Command to list the source files that differ between two rings, for all
+    applications or a single one.
+
+    The files in each ring are hashed in the background. Choosing a file
+    from the report compares it between the rings, or opens it if it only
+    exists in one of them.
+
+    """
+
+    AllApplications = 'All Applications'
+
+    def run(self):
+        self.choose_installed_ring(
+            self.choose_other_ring,
+            ring_filter_callback=BrowseSourceCommand.ring_is_browsable)
+
+    def choose_other_ring(self, ring):
+        if ring is None:
+            return
+
+        self.left_ring = ring
+        self.choose_installed_ring(
+            self.choose_application, rings_to_remove=[ring],
+            ring_filter_callback=BrowseSourceCommand.ring_is_browsable)
+
+    def choose_application(self, ring):
+        if ring is None:
+            return
+
+        self.right_ring = ring
+        self.applications = [self.AllApplications]
+        self.applications.extend(sorted(os.listdir(
+            self.left_ring.pgmsource_path)))
+
+        sublime.set_timeout(
+            lambda: sublime.active_window().show_quick_panel(
+                self.applications, self.application_selected),
+            0)
+
+    def application_selected(self, sel):
+        if sel == -1:
+            return
+
+        if sel == 0:
+            application = ''
+        else:
+            application = self.applications[sel]
+
+        sublime.status_message('Comparing sources in %s and %s' %
+                               (self.left_ring, self.right_ring))
+        sublime.set_timeout_async(
+            lambda: self.compare_sources(application), 0)
+
+    def compare_sources(self, application):
+        self.left_manifest = SourceManifest.build(os.path.join(
+            self.left_ring.pgmsource_path, application))
+        self.right_manifest = SourceManifest.build(os.path.join(
+            self.right_ring.pgmsource_path, application))
+        diff = self.left_manifest.diff(self.right_manifest)
+
+        self.entries = ([('Changed', p) for p in diff.changed] +
+                        [('Added', p) for p in diff.added] +
+                        [('Removed', p) for p in diff.removed])
+        report = format_report(diff, str(self.left_ring),
+                               str(self.right_ring))
+        sublime.set_timeout(lambda: self.show_report(report), 0)
+
+    def show_report(self, report):
+        window = sublime.active_window()
+        view = display_in_new_view(window, text=report)
+        view.set_name('Source Differences')
+
+        if self.entries:
+            window.show_quick_panel([[p, k] for k, p in self.entries],
+                                    self.entry_selected)
+
+    def entry_selected(self, sel):
+        if sel == -1:
+            return
+
+        kind, path = self.entries[sel]
+        if kind == 'Added':
+            sublime.active_window().open_file(
+                self.right_manifest.get_path(path))
+        elif kind == 'Removed':
+            sublime.active_window().open_file(
+                self.left_manifest.get_path(path))
+        elif CompareInInstalled:
+            compare_files(self.left_ring, self.left_manifest.get_path(path),
+                          self.right_ring, self.right_manifest.get_path(path))
+        else:
+            window = sublime.active_window()
+            window.open_file(self.left_manifest.get_path(path))
+            window.open_file(self.right_manifest.get_path(path))
@@ -1,13 +1,12 @@
 from abc import abstractmethod
 import logging
 import os
-from queue import Queue
-import threading
 
 logger = logging.getLogger(__name__)
 logger.setLevel('DEBUG')
 
 import sublime
+import sublime_plugin
 
 try:
     from DynamicCompletions import FileLoader, PathLoader, StaticLoader
@@ -15,12 +14,22 @@ except ImportError as e:
     logger.error('DynamicCompletions package not installed')
     raise e
 
-from .tools.classes import get_ring, get_ring_file, is_homecare_ring
+from .classes import ring_queries
+from .classes.completion_store import CompactCompletions, match_completions
+from .classes.file_watcher import register_with_file_watcher
+from .classes.loader_scheduler import (
+    ScheduledLoaderMixin,
+    format_stats,
+    get_loader_scheduler
+)
+from .tools.classes import get_ring, is_homecare_ring
 from .tools.general import read_file
 from .tools.settings import (
+    get_completion_loader_workers,
     get_completion_source_enabled_setting,
     get_system_variables
 )
+from .tools.sublime import display_in_output_panel, get_completion_query
 
 from .misc.completion_types import (
     CT_ALIAS,
@@ -32,6 +41,7 @@ from .misc.completion_types import (
     CT_EXTERNAL_PAGESET,
     CT_STATE,
     CT_SYSTEM,
+    CT_RT_TOOL,
 
     CT_OBJECT,
     CT_RECORD,
@@ -97,15 +107,79 @@ class RingLoader(PathLoader):
             return []
 
         try:
-            return [cls.Instances[cls.get_path_from_ring(ring)]]
+            instance = cls.Instances[cls.get_path_from_ring(ring)]
         except KeyError:
-            pass
+            instance = cls(ring=ring)
+        except AttributeError:
+            instance = cls(ring=ring)
+
+        if isinstance(instance, ScheduledLoaderMixin):
+            get_loader_scheduler().register_view(view.id(),
+                                                 instance.get_load_key())
+        return [instance]
+
+
+class WatchedRingLoader(RingLoader):
+    """
+    Parent class for RingLoaders whose completions are reloaded when the
+    file watcher reports changes in a folder of the ring.
+
+    """
+
+    def watch_changes(self, path, depth=0):
+        """
+        Marks the completions as current, and as stale again once the file
+        watcher reports a change in path.
+
+        """
+        self.stale = False
+        key = (self.__class__.__name__, path)
+        interval = self.ring.get_poll_interval(path)
+
+        def register(watcher):
+            watcher.watch(path, interval, depth)
+            watcher.subscribe(key, self.path_changed, path)
+
+        register_with_file_watcher(key, register, start=True)
+
+    def path_changed(self, events):
+        logger.debug('%s changed', self.path)
+        self.stale = True
+
+    def refresh_completions(self):
+        """Return True if the completions need to be reloaded."""
+        try:
+            return self.stale
         except AttributeError:
-            pass
-        return [cls(ring=ring)]
+            return True
+
 
+class MatchedLoaderMixin(object):
+    """
+    Mixin for the loaders of a ring's large CompactCompletions. Queries only
+    build the completions for names starting with the name being typed, at
+    most MatchLimit of them, instead of a tuple for every name in the ring.
+
+    """
+
+    MatchLimit = 500
+
+    def filter_completions(self, completion_types, **kwargs):
+        view = kwargs.get('view') or sublime.active_window().active_view()
+        completions = None
+        if view is not None:
+            completions = match_completions(
+                getattr(self, 'completions', None), completion_types,
+                get_completion_query(view), self.MatchLimit)
 
-class AliasRingLoader(RingLoader, FileLoader):
+        if completions is None:
+            return super(MatchedLoaderMixin, self).filter_completions(
+                completion_types, **kwargs)
+        return (completions,) + tuple(self.EmptyReturn[1:])
+
+
+class AliasRingLoader(MatchedLoaderMixin, ScheduledLoaderMixin, RingLoader,
+                      FileLoader):
     """
     Loads Alias completions from the Alias List.
     """
@@ -146,19 +220,19 @@ class AliasRingLoader(RingLoader, FileLoader):
     def get_path_from_ring(cls, ring):
         return ring.alias_list_path
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """
         Loads alias completions from the ring.
         """
         logger.debug('Loading Alias Ring Completions')
-        self.ring.load_aliases()
-        self.completions = set(
-            [('@@%s()' % a, '%s()' % a) for a in
-             self.ring.alias_lookup.keys()])
+        completions = CompactCompletions(ring_queries.get_aliases(self.ring),
+                                         '@@{0}()', '{0}()')
         logger.debug('Done Loading Alias Ring Completions')
+        return completions
 
 
-class ObjectRingLoader(RingLoader):
+class ObjectRingLoader(MatchedLoaderMixin, ScheduledLoaderMixin,
+                       WatchedRingLoader):
     """
     Loads object completions for the ring.
     """
@@ -180,112 +254,31 @@ class ObjectRingLoader(RingLoader):
     def get_path_from_ring(cls, ring):
         return ring.datadefs_path
 
-    def refresh_completions(self):
-        """
-        Return True if the completions need to be reloaded.
-        """
-        logger.debug("Should Ring Object Completions Be Refreshed?")
-        try:
-            if self.get_path_update_time() <= self.last_modified_time:
-                logger.debug("Don't Refresh Ring Object Completions")
-                return False
-            logger.debug("Refresh Ring Object Completions")
-            return True
-        except AttributeError:
-            logger.debug("Refresh Ring Object Completions")
-            return True
+    def get_object_path(self):
+        return os.path.join(os.path.dirname(self.path), 'Object')
 
-    def get_path_update_time(self):
+    def build_completions(self, **kwargs):
         """
-        Return the last time the file was modified.
-        """
-        object_path = os.path.join(os.path.dirname(self.path), 'Object')
-        return os.path.getmtime(object_path)
+        Loads the object completions from the ring's Datadef files, which
+        are indexed by the analysis server or the plugin's RingIndex.
 
-    def load_completions(self, **kwargs):
         """
-        Loads the object completions from the ring.
+        logger.debug('Running Object Loader')
 
-        Gathers all the Datadef files and then spawns DatadefProcessor threads
-        to process them.
+        if not os.path.isdir(self.path):
+            return None
 
-        """
-        logger.debug('Running Object Loader thread')
+        self.watch_changes(self.get_object_path())
+        objects = ring_queries.get_objects(self.ring)
+        if not objects:
+            return None
 
-        if not os.path.isdir(self.path):
-            return
-
-        file_queue = Queue()
-        for filename in os.listdir(self.path):
-            if filename.lower().endswith('.focus'):
-                file_queue.put(os.path.join(self.path, filename))
-
-        if file_queue.empty():
-            return
-
-        self.last_modified_time = self.get_path_update_time()
-        threads = set()
-        completion_queue = Queue()
-        for i in range(4):
-            t = ObjectRingLoader.DatadefProcessor(file_queue, completion_queue)
-            t.start()
-            threads.add(t)
-
-        self.completions = dict()
-        for t in threads:
-            t.join()
-            c = completion_queue.get()
-            for t, s in c.items():
-                try:
-                    self.completions[t].update(s)
-                except KeyError:
-                    self.completions[t] = s
-
-        logger.debug('Object Loader thread ending')
-
-    class DatadefProcessor(threading.Thread):
-        """
-        Reads Datadef files and parses the relevant details.
-        """
-
-        def __init__(self, file_queue, completion_queue):
-            """
-            Creates a DatadefProcessor instance.
-
-            Keyword arguments:
-            file_queue - List of file paths for Datadef files.
-            completion_queue - Once all files have been processed, completions
-            gathered by this object are added to this queue.
-
-            """
-            super(ObjectRingLoader.DatadefProcessor, self).__init__()
-            self.file_queue = file_queue
-            self.completion_queue = completion_queue
-            self.completions = dict()
-
-        def run(self):
-            """
-            Processes Datadefs until the queue is empty, then adds completions
-            to the queue.
-
-            """
-            while not self.file_queue.empty():
-                self.process_datadef(self.file_queue.get())
-            self.completion_queue.put(self.completions)
-
-        def process_datadef(self, file_name):
-            """Extracts relevant information from the given Datadef file."""
-            ring_file = get_ring_file(file_name)
-            object_dict = ring_file.get_defined_objects(
-                for_completions=True)
-            for key, value in object_dict.items():
-                try:
-                    self.completions[key].update(value)
-                except KeyError:
-                    self.completions[key] = value
-
-
-class IncludeLoader(RingLoader):
+        logger.debug('Object Loader ending')
+        return objects
+
+
+class IncludeLoader(MatchedLoaderMixin, ScheduledLoaderMixin,
+                    WatchedRingLoader):
     """Loads completions from a View."""
 
     EmptyReturn = ([], (sublime.INHIBIT_EXPLICIT_COMPLETIONS |
@@ -312,74 +305,72 @@ class IncludeLoader(RingLoader):
     def get_path_from_ring(cls, ring):
         return ring.pgmsource_path
 
-    def load_completions(self, **kwargs):
+    def build_completions(self, **kwargs):
         """Loads the Include and ExternalPageSet completions from the ring.
 
-        Walks through the PgmSource directory, finding all the Include files,
-        DataDef files, and ExternalPageSet files.
+        The PgmSource directory is walked by the analysis server, or by the
+        plugin's RingIndex, to find all the Include files, DataDef files,
+        and ExternalPageSet files.
 
         """
         logger.debug('Loading Include File Completions')
-        self.completions = dict()
-        self.completions[CT_INCLUDE_FILE] = set()
-        self.completions[CT_EXTERNAL_PAGESET] = set()
-        self.modified_dict = self.build_modified_dict()
-
-        for path, dirs, files in os.walk(self.path):
-            for f in files:
-                f_lower = f.lower()
-                if (f_lower.endswith('.i.focus') or
-                        f_lower.endswith('.d.focus')):
-                    self.completions[CT_INCLUDE_FILE].add((f,))
-                elif f_lower.endswith('.e.focus'):
-                    self.completions[CT_EXTERNAL_PAGESET].add((f,))
+        self.watch_changes(self.path)
+        include_files, external_pagesets = ring_queries.get_include_files(
+            self.ring)
 
         logger.debug('Done Loading Include File Completions')
+        return {CT_INCLUDE_FILE: CompactCompletions(include_files),
+                CT_EXTERNAL_PAGESET: CompactCompletions(external_pagesets)}
 
-    def refresh_completions(self):
-        """Return True if the completions need to be reloaded.
 
-        Iterates through the folders in the DataDef folders. If any of them
-        have been modified since the last time the completions were loaded,
-        return True. Else return False.
+class RTToolLoader(MatchedLoaderMixin, ScheduledLoaderMixin,
+                   WatchedRingLoader):
+    """Loads RT Tool completions from the ring's ToolIndex."""
+
+    EmptyReturn = ([], sublime.INHIBIT_EXPLICIT_COMPLETIONS)
+    LoadAsync = True
 
+    @classmethod
+    def completion_types(cls):
         """
-        logger.debug('Should Include File Completions be Refreshed?')
-        try:
-            m1 = self.modified_dict
-        except AttributeError:
-            logger.debug('Refresh Include File Completions')
-            return True
-        else:
-            m2 = self.build_modified_dict()
-            keys1 = set(m1.keys())
-            keys2 = set(m2.keys())
-            if keys1.symmetric_difference(keys2):
-                logger.debug('Refresh Include File Completions')
-                return True
-            keys = keys1.union(keys2)
-            if len(keys) == 0:
-                logger.debug("Don't Refresh Include File Completions")
-                return False
-
-            for k in keys:
-                try:
-                    if m2[k] > m1[k]:
-                        logger.debug('Refresh Include File Completions')
-                        return True
-                except KeyError:
-                    logger.debug('Refresh Include File Completions')
-                    return True
-            logger.debug("Don't Refresh Include File Completions")
+        Return a set of completion types that this CompletionLoader can return.
+        """
+        return [CT_RT_TOOL]
+
+    @classmethod
+    def view_scope(cls):
+        """
+        Return a scope to determine if the CompletionLoader will be enabled
+        for a view.
+
+        """
+        return 'source.focus, source.fs'
+
+    @classmethod
+    def view_check(cls, view):
+        if not super(RTToolLoader, cls).view_check(view):
             return False
+        else:
+            return get_completion_source_enabled_setting(CT_RT_TOOL, 'Ring')
+
+    @classmethod
+    def get_path_from_ring(cls, ring):
+        tool_index = ring.get_tool_index()
+        if tool_index is None:
+            return None
+        return tool_index.path
 
-    def build_modified_dict(self):
-        mod_dict = dict()
-        for d in os.listdir(self.path):
-            full_path = os.path.join(self.path, d)
-            if os.path.isdir(full_path):
-                mod_dict[d] = os.path.getmtime(full_path)
-        return mod_dict
+    def build_completions(self, **kwargs):
+        """Loads the RT Tool completions from the ring."""
+        logger.debug('Loading RT Tool Completions')
+        self.watch_changes(self.path)
+        tools = self.ring.get_tool_index().get_tools()
+
+        # The @ is a word separator, so only the rest of the name is inserted
+        completions = CompactCompletions((n[1:] for n in tools),
+                                         '@{0}\tRT Tool', '{0}')
+        logger.debug('Done Loading RT Tool Completions')
+        return completions
 
 
 class StateRingLoader(RingLoader, FileLoader):
@@ -463,3 +454,27 @@ class SystemLoader(StaticLoader):
 
         """
         self.completions = set([(v, ) for v in get_system_variables()])
+
+
+class CompletionLoaderEventListener(sublime_plugin.EventListener):
+    """Tells the loader scheduler which views are active and closed."""
+
+    def on_activated(self, view):
+        get_loader_scheduler().set_active_view(view.id())
+
+    def on_close(self, view):
+        get_loader_scheduler().release_view(view.id())
+
+
+class ShowCompletionLoaderStatusCommand(sublime_plugin.WindowCommand):
+    """Shows the state of the completion loader queue."""
+
+    def run(self):
+        display_in_output_panel(
+            self.window, 'focus_completion_loaders',
+            text='Completion loaders: ' +
+            format_stats(get_loader_scheduler().get_stats()))
+
+
+def plugin_loaded():
+    get_loader_scheduler().max_workers = get_completion_loader_workers()
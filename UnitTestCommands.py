@@ -1,6 +1,5 @@
 import logging
 import os
-import re
 import tempfile
 
 logger = logging.getLogger(__name__)
@@ -10,162 +9,75 @@ import sublime
 import sublime_plugin
 
 from .classes.ring_files import InvalidFileFormat
+from .classes.unit_tests import (
+    UnitTestJob,
+    UnitTestPlan,
+    filter_source,
+    format_summary,
+    get_unit_test_file_name,
+    hash_file,
+    run_unit_test_job,
+    run_unit_test_jobs
+)
 from .classes.views import ViewTypeException
 from .tools.classes import get_view, get_ring_file, is_focus_file
 from .tools.focus import TRANSLATOR_SEPARATOR, get_translated_path
+from .tools.settings import get_unit_test_max_workers
 from .tools.sublime import display_in_output_panel, display_in_new_view
 from .tools.general import read_file
 
 
-class Subroutine(object):
-    """Represents a subroutine containing unit tests"""
+def load_unit_test_template():
+    template = sublime.load_resource(
+        'Packages/Focus/resources/Unit Test Template.focus')
+    return template.replace(os.linesep, '\n')
 
-    MatTemplate = ('{{":Code {subroutine}"}}'
-                   '@CallSub(UnitTestTemplate_LogResults),')
 
-    def __init__(self, subroutine_name, unit_test_text):
-        super(Subroutine, self).__init__()
-        self.subroutine_name = subroutine_name
-        # List of strings extracted from documentation
-        self.unit_test_text = unit_test_text
-
-        self.unit_tests = []
-        self.errors = []
-
-        for t in unit_test_text:
-            try:
-                self.unit_tests.append(UnitTest(subroutine_name, t))
-            except IncompleteUnitTestException as e:
-                self.errors.append(e)
-
-    def format_for_unit_test(self):
-        text = self.MatTemplate.format(subroutine=self.subroutine_name)
-        for t in self.unit_tests:
-            text += '\n' + t.format_for_unit_test()
-        for e in self.errors:
-            text += '\n' + e.format_for_unit_test()
-
-        return text
-
-
-class UnitTest(object):
-    """Object to represent an M-AT Unit Test."""
-
-    TestNameMatcher = re.compile(r"// *:Test *(.+)")
-    InputMatcher = re.compile(r"// *Input *(.+)", re.IGNORECASE)
-    OutputMatcher = re.compile(r"// *Output *(.+)", re.IGNORECASE)
-    SetupMatcher = re.compile(r"// *Setup *(.+)", re.IGNORECASE)
-    CleanupMatcher = re.compile(r"// *Cleanup *(.+)", re.IGNORECASE)
-    CompareMatcher = re.compile(r"// *Compare *(.+)", re.IGNORECASE)
-
-    # MatTemplate = ('{setup},{{"{name}",{input}^I,{output},'
-    #                '[@MT^T]I@CallSub({subroutine_name}),@MT-T,{compare}}}'
-    #                '@CallSub(UnitTestTemplate_FormatResults),{cleanup},')
-
-    MatTemplate = ('{{"{name}"}}{setup},{{"{name}",{input},{output}}}'
-                   '[@{{,@MT,|1@CallSub({subroutine_name}),@MT}}@JV'
-                   '@{{|0,|1,|2,|4,@{{|5,|3}}@-,{compare}}}'
-                   '@CallSub(UnitTestTemplate_FormatResults)]$2[{cleanup}],')
-    CompareTemplate = (
-        '@{{|0,|1,|4,@CallSub(UnitTestTemplate_GetLogMessages)}}{compare}')
-
-    def __init__(self, subroutine_name, test):
-        super(UnitTest, self).__init__()
-        self.subroutine_name = subroutine_name
-        self.text = test
-
-        match = self.TestNameMatcher.match(test)
-        if match is None:
-            raise IncompleteUnitTestException(subroutine_name, 'UNKNOWN',
-                                              "Missing name")
-        else:
-            self.name = match.group(1)
-
-        self.input = None
-        self.output = None
-        self.setup = None
-        self.cleanup = None
-        self.compare = None
-
-        for l in test.split('\n'):
-            if self.input is None:
-                match = self.InputMatcher.match(l)
-                if match is not None:
-                    self.input = match.group(1)
-                    continue
+def build_unit_test_file_contents(template, file_name, subroutines, lines,
+                                  results_file):
+    """
+    Builds the contents of a Unit Test file.
 
-            if self.output is None:
-                match = self.OutputMatcher.match(l)
-                if match is not None:
-                    self.output = match.group(1)
-                    if self.output == 'False':
-                        self.output = '"False"'
-                    elif self.output == 'True':
-                        self.output = '"True"'
-                    continue
+    Keyword arguments:
+    template - The contents of the Unit Test Template.
+    file_name - The name of the Focus file being tested.
+    subroutines - The Subroutines whose Unit Tests should be run.
+    lines - The lines of the Focus file being tested.
+    results_file - The file the results should be written to.
 
-            if self.setup is None:
-                match = self.SetupMatcher.match(l)
-                if match is not None:
-                    self.setup = match.group(1)
-                    continue
+    """
+    main = UnitTestFocusFileCommand.MainTemplate.format(
+        file_name=file_name,
+        tests='\n'.join(s.format_for_unit_test() for s in subroutines),
+        results_file=results_file)
+    return '{0}{1}\n{2}'.format(template, main, filter_source(lines))
 
-            if self.cleanup is None:
-                match = self.CleanupMatcher.match(l)
-                if match is not None:
-                    self.cleanup = match.group(1)
-                    continue
 
-            if self.compare is None:
-                match = self.CompareMatcher.match(l)
-                if match is not None:
-                    self.compare = match.group(1)
-                    continue
+def get_include_hashes(ring_file):
+    """Returns hashes of all the files included by a Focus file."""
+    return [hash_file(f) for f in
+            sorted(set(ring_file.get_include_files(current_file=False)))]
 
-        if self.input is None:
-            raise IncompleteUnitTestException(subroutine_name, self.name,
-                                              "Missing input")
-        if (self.output is None) and (self.compare is None):
-            raise IncompleteUnitTestException(subroutine_name, self.name,
-                                              "Missing output")
-        if self.setup is None:
-            self.setup = '""'
-        if self.cleanup is None:
-            self.cleanup = '""'
-        if self.compare is None:
-            self.compare = '""'
-        else:
-            self.compare = self.CompareTemplate.format(compare=self.compare)
 
-    def str(self):
-        return "Test: {0}\n  Input: {1}\n  Output {2}".format(
-            self.name, self.input, self.output)
+def translate_unit_test_file(unit_test_file_name):
+    return get_ring_file(unit_test_file_name).translate(separate_process=False)
 
-    def format_for_unit_test(self):
-        return self.MatTemplate.format(**self.__dict__)
 
+def run_unit_test_file(unit_test_file_name):
+    get_ring_file(unit_test_file_name).run(separate_process=False)
 
-class IncompleteUnitTestException(Exception):
-    """Exception thrown if the unit test is incomplete. For example, if it is
-    missing its input or output."""
 
-    DescriptionTemplate = 'Incomplete unit test: {0} - {1}; Problem: {2}'
-    MatTemplate = ('{{"     Unit Test: {unit_test_name} - Incomplete",'
-                   '"          Problem:             {problem}",""}}'
-                   '@CallSub(UnitTestTemplate_LogResults),')
+def remove_results_files(job):
+    trans_path = get_translated_path(job.unit_test_file_name)
+    for f in (job.results_file_name, trans_path):
+        if f and os.path.isfile(f):
+            os.remove(f)
 
-    def __init__(self, subroutine_name, unit_test_name, problem):
-        super(IncompleteUnitTestException, self).__init__()
-        self.subroutine_name = subroutine_name
-        self.unit_test_name = unit_test_name
-        self.problem = problem
-        self.description = self.DescriptionTemplate.format(subroutine_name,
-                                                           unit_test_name,
-                                                           problem)
 
-    def format_for_unit_test(self):
-        return self.MatTemplate.format(unit_test_name=self.unit_test_name,
-                                       problem=self.problem)
+def remove_unit_test_files(job):
+    remove_results_files(job)
+    if os.path.isfile(job.unit_test_file_name):
+        os.remove(job.unit_test_file_name)
 
 
 class UnitTestCommand(sublime_plugin.TextCommand):
@@ -241,164 +153,79 @@ class UnitTestFocusFileCommand(FocusUnitTestCommand):
 "";
 """
 
-    UnitTestLogTemplate = '[{message}@CallSub(UnitTestTemplate_LogMessage)]'
-    LogMessageMatcher = re.compile(r" *// *Unit Test Log: *(.+)",
-                                   re.IGNORECASE)
-
     def run(self, edit, display_unit_test=False):
         self.output_panel = display_in_output_panel(
             sublime.active_window(), 'focus_unit_test_results',
             text='Building Unit Test file for %s\n\n' % self.file_name)
         self.output_panel.set_syntax_file(
             'Packages/Focus/Focus Unit Test Results.hidden-tmLanguage')
+
+        contents = self.mt_view.get_contents()
+        sublime.set_timeout_async(
+            lambda: self.run_async(contents, display_unit_test), 0)
+
+    def run_async(self, contents, display_unit_test):
+        plan = UnitTestPlan(self.file_name, contents,
+                            get_include_hashes(self.mt_ring_file))
+        if not plan.pending:
+            results = plan.get_results()
+            sublime.set_timeout(lambda: self.display_results(results), 0)
+            return
+
         results_file_object = tempfile.NamedTemporaryFile(suffix='.txt',
                                                           mode='w',
                                                           delete=False)
         with results_file_object as f:
             f.write("testing")
-        file_contents = self.build_unit_test_file_contents(
-            results_file_object.name)
+        file_contents = build_unit_test_file_contents(
+            load_unit_test_template(), self.file_name, plan.pending,
+            contents.split('\n'), results_file_object.name)
         unit_test_file_name = self.write_to_unit_test_file(file_contents)
-        self.output_panel.run_command(
-            'append',
-            {'characters': 'Unit Test file: %s\n\n' % unit_test_file_name,
-             'force': True})
-        sublime.set_timeout_async(
-            lambda: self.run_async(unit_test_file_name,
-                                   results_file_object.name,
-                                   display_unit_test), 0)
-
-    def run_async(self, unit_test_file_name, results_file_name, display_unit_test):
-        sublime.run_command('run_unit_test',
-                            {'unit_test_file_name': unit_test_file_name,
-                             'results_file_name': results_file_name,
-                             'display_unit_test': display_unit_test,
-                             # 'output_panel': self.output_panel
-                             })
-
-    def build_unit_test_file_contents(self, results_file):
-        file_contents = sublime.load_resource(
-            'Packages/Focus/resources/Unit Test Template.focus')
-        file_contents = file_contents.replace(os.linesep, '\n')
-        file_contents += self.build_main_code_member(results_file)
-        file_contents += '\n' + self.read_and_filter_view()
-        return file_contents
-
-    def read_and_filter_view(self):
-        lines = []
-
-        line_matcher = re.compile(r"(\s*)(.+)")
-
-        include_lines = False
-        processing_magic = False
-        processing_alias = False
-        alias_lines = []
-        include_alias = False
-
-        for l in self.mt_view.get_lines_iterator():
-            match = line_matcher.match(l)
-            if match is None:
-                lines.append(l)
-                continue
-            else:
-                content = match.group(2)
-
-            if content.startswith('#'):
-                if processing_alias:
-                    if include_alias and alias_lines:
-                        lines.extend(alias_lines)
-                    alias_lines = []
-                    include_alias = False
-
-                processing_alias = processing_magic = False
-
-                if content.startswith('#Include'):
-                    include_lines = True
-                elif content.startswith('#ImportExport'):
-                    include_lines = True
-                elif content.startswith('#Locals'):
-                    include_lines = True
-                elif content.startswith('#Lock'):
-                    include_lines = True
-                elif content.startswith('#DataDef'):
-                    include_lines = True
-                elif content.startswith('#Alias'):
-                    processing_alias = True
-                    lines.append(l)
-                    continue
-                elif content.startswith('#Magic'):
-                    processing_magic = True
-                    lines.append(l)
-                    continue
-                else:
-                    include_lines = False
-                    continue
-
-            if processing_alias:
-                if content.startswith(':Alias'):
-                    if include_alias and alias_lines:
-                        lines.extend(alias_lines)
-                    alias_lines = []
-                    include_alias = False
-                elif content.startswith('Scope'):
-                    if 'Local' in content:
-                        include_alias = True
-
-                alias_lines.append(l)
-                continue
-
-            if processing_magic:
-                if content.startswith(':EntryPoint'):
-                    include_lines = False
-                elif content.startswith(':'):
-                    if content.startswith(':Code') and ('Main' in content):
-                        include_lines = False
-                    else:
-                        include_lines = True
-                else:
-                    match = self.LogMessageMatcher.match(l)
-                    if match is not None:
-                        l = self.UnitTestLogTemplate.format(
-                            message=match.group(1))
-
-            if include_lines:
-                lines.append(l)
-
-        return '\n'.join(lines)
-
-    def build_main_code_member(self, results_file):
-        test_lines = []
-        for region in self.view.find_all(r"//:Doc Unit Test"):
-            cb = self.mt_view.get_codeblock(region.begin())
-            if cb is None:
-                continue
-            else:
-                documentation = cb.doc
-
-                if documentation.doc_regions['Unit Test'].unit_tests:
-                    subroutine = Subroutine(
-                        cb.codeblock_name,
-                        documentation.doc_regions['Unit Test'].unit_tests)
-
-                    test_lines.append(subroutine.format_for_unit_test())
+        message = 'Unit Test file: %s\n\n' % unit_test_file_name
+        if plan.cached:
+            message += ('Using cached results for %s unchanged subroutines'
+                        '\n\n' % len(plan.cached))
+        sublime.set_timeout(lambda: self.output_panel.run_command(
+            'append', {'characters': message, 'force': True}), 0)
+
+        job = UnitTestJob(self.file_name, unit_test_file_name,
+                          results_file_object.name)
+        self.run_unit_test(job, plan, display_unit_test)
+
+    def run_unit_test(self, job, plan, display_unit_test):
+        if display_unit_test:
+            cleanup = remove_results_files
+        else:
+            cleanup = remove_unit_test_files
 
-        contents = self.MainTemplate.format(file_name=self.file_name,
-                                            tests="\n".join(test_lines),
-                                            results_file=results_file)
+        sublime.status_message('Running Unit Test')
+        results = plan.get_results(run_unit_test_job(
+            job, translate_unit_test_file, run_unit_test_file, cleanup))
+        if results.error is not None:
+            sublime.status_message(results.error)
 
-        return contents
+        if display_unit_test:
+            sublime.set_timeout(lambda: self.display_results(
+                results, job.unit_test_file_name), 0)
+        else:
+            sublime.set_timeout(lambda: self.display_results(results), 0)
+
+    def display_results(self, results, unit_test_file_name=None):
+        v = display_in_output_panel(sublime.active_window(),
+                                    'focus_unit_test_results',
+                                    text=results.format())
+        v.set_syntax_file('Packages/Focus/'
+                          'Focus Unit Test Results.hidden-tmLanguage')
+        v.run_command('fold_by_level', {'level': 2})
+        v.show(0)
+
+        if unit_test_file_name is not None:
+            v = sublime.active_window().open_file(unit_test_file_name)
+            v.set_syntax_file('Packages/Focus/focus.tmLanguage')
 
     def write_to_unit_test_file(self, contents):
-        ring = self.mt_ring_file.ring
-        path, name = os.path.split(self.file_name)
-        first_folder = os.path.basename(path)
-        match = re.match(r"(.+?)(\.[A-Z])?\.focus", name)
-
-        unit_test_file_name = os.path.join(
-            ring.pgm_cache_path,
-            'PgmSource',
-            first_folder,
-            '{0}.UnitTest.P.focus'.format(match.group(1)))
+        unit_test_file_name = get_unit_test_file_name(
+            self.mt_ring_file.ring.pgm_cache_path, self.file_name)
         with open(unit_test_file_name, 'w') as f:
             f.write(contents)
         return unit_test_file_name
@@ -412,6 +239,13 @@ class RunUnitTestCommand(sublime_plugin.ApplicationCommand):
 
     def run(self, unit_test_file_name, results_file_name,
             display_unit_test=False):
+        # Translating and running wait for magic.exe, so they're kept off
+        # the main thread
+        sublime.set_timeout_async(lambda: self.run_async(
+            unit_test_file_name, results_file_name, display_unit_test), 0)
+
+    def run_async(self, unit_test_file_name, results_file_name,
+                  display_unit_test):
         logger.debug("unit_test_file_name = %s", unit_test_file_name)
         logger.debug("results_file_name = %s", results_file_name)
         unit_test_file = get_ring_file(unit_test_file_name)
@@ -421,25 +255,27 @@ class RunUnitTestCommand(sublime_plugin.ApplicationCommand):
             sublime.status_message('Translating Unit Test file failed')
         else:
             sublime.status_message('Running Unit Test')
-            unit_test_file.run(separate_process=False)
-
-            # text = '\n'.join(read_file(results_file_name, False))
-            # output_panel.run_command(
-            #     'append', {'characters': text, 'force': True})
-            v = display_in_output_panel(sublime.active_window(),
-                                        'focus_unit_test_results',
-                                        file_name=results_file_name)
-            v.set_syntax_file('Packages/Focus/'
-                              'Focus Unit Test Results.hidden-tmLanguage')
-            v.run_command('fold_by_level', {'level': 2})
-            v.show(0)
-            # v = display_in_new_view(sublime.active_window(),
-            #                         file_name=results_file_name)
-            # v.set_syntax_file(
-            #     'Packages/Focus/Focus Unit Test Results.hidden-tmLanguage')
-            # v.run_command('fold_by_level', {'level': 2})
-            # v.show(0)
-
+            if unit_test_file.run(separate_process=False):
+                sublime.set_timeout(
+                    lambda: self.display_results(results_file_name), 0)
+            else:
+                logger.warning('Running Unit Test file failed')
+                sublime.status_message('Running Unit Test file failed')
+
+        sublime.set_timeout(lambda: self.clean_up(
+            unit_test_file_name, results_file_name, display_unit_test), 0)
+
+    def display_results(self, results_file_name):
+        v = display_in_output_panel(sublime.active_window(),
+                                    'focus_unit_test_results',
+                                    file_name=results_file_name)
+        v.set_syntax_file('Packages/Focus/'
+                          'Focus Unit Test Results.hidden-tmLanguage')
+        v.run_command('fold_by_level', {'level': 2})
+        v.show(0)
+
+    def clean_up(self, unit_test_file_name, results_file_name,
+                 display_unit_test):
         if display_unit_test:
             v = sublime.active_window().open_file(unit_test_file_name)
             v.set_syntax_file(
@@ -447,8 +283,177 @@ class RunUnitTestCommand(sublime_plugin.ApplicationCommand):
         else:
             os.remove(unit_test_file_name)
 
-        os.remove(results_file_name)
+        if os.path.isfile(results_file_name):
+            os.remove(results_file_name)
         trans_path = get_translated_path(unit_test_file_name)
         if trans_path:
             logger.debug("trans_path = %s", trans_path)
             os.remove(trans_path)
+
+
+class UnitTestFocusFilesCommand(sublime_plugin.WindowCommand):
+    """
+    Builds, translates and runs the Unit Tests for several Focus files at
+    once, then shows a summary of all the results. By default, the Focus
+    files open in the window are tested.
+
+    """
+
+    def run(self, files=None, folder=None, include_file=None):
+        """
+        Keyword arguments:
+        files - A list of Focus files to test.
+        folder - A folder to search for Focus files to test.
+        include_file - If specified, only files that include this file
+            (directly or through another include file) are tested. The
+            folder containing include_file is searched if no files or
+            folder are given.
+
+        """
+        file_names = self.get_file_names(files, folder, include_file)
+        sources = [(f, self.get_source(f)) for f in file_names]
+        sources = [s for s in sources if s[1] is not None]
+        if not sources:
+            sublime.status_message('No Focus files to Unit Test')
+            return
+
+        self.output_panel = display_in_output_panel(
+            self.window, 'focus_unit_test_results',
+            text='Building Unit Test files for %s files\n\n' % len(sources))
+        self.output_panel.set_syntax_file(
+            'Packages/Focus/Focus Unit Test Results.hidden-tmLanguage')
+
+        template = load_unit_test_template()
+        sublime.set_timeout_async(lambda: self.run_async(sources, template), 0)
+
+    def run_async(self, sources, template):
+        plans = []
+        jobs = []
+        for file_name, contents in sources:
+            plan = UnitTestPlan(file_name, contents,
+                                get_include_hashes(get_ring_file(file_name)))
+            if not plan.subroutines:
+                continue
+            plans.append(plan)
+            if plan.pending:
+                jobs.append(self.build_unit_test_file(plan, contents,
+                                                      template))
+
+        sublime.status_message('Running Unit Tests for %s files' % len(jobs))
+        job_results = run_unit_test_jobs(
+            jobs, translate_unit_test_file, run_unit_test_file,
+            cleanup=remove_unit_test_files,
+            max_workers=get_unit_test_max_workers())
+        job_results = dict(zip((j.file_name for j in jobs), job_results))
+
+        results = [p.get_results(job_results.get(p.file_name)) for p in plans]
+        summary = format_summary(results)
+        sublime.set_timeout(lambda: self.display_summary(summary), 0)
+
+    def display_summary(self, summary):
+        v = display_in_output_panel(self.window, 'focus_unit_test_results',
+                                    text=summary)
+        v.set_syntax_file('Packages/Focus/'
+                          'Focus Unit Test Results.hidden-tmLanguage')
+        v.run_command('fold_by_level', {'level': 2})
+        v.show(0)
+
+    def get_file_names(self, files, folder, include_file):
+        if files:
+            file_names = list(files)
+        elif folder or include_file:
+            if not folder:
+                folder = os.path.dirname(include_file)
+            file_names = []
+            for path, dirs, names in os.walk(folder):
+                for n in names:
+                    if (n.lower().endswith('.focus') and
+                            not n.lower().endswith('.unittest.p.focus')):
+                        file_names.append(os.path.join(path, n))
+        else:
+            file_names = [v.file_name() for v in self.window.views() if
+                          v.file_name()]
+
+        if include_file:
+            file_names = self.filter_including_files(file_names, include_file)
+
+        return file_names
+
+    def filter_including_files(self, file_names, include_file):
+        """
+        Returns the files in file_names that include include_file directly
+        or through another include file in file_names.
+
+        """
+        ring_files = []
+        for f in file_names:
+            try:
+                ring_file = get_ring_file(f)
+            except InvalidFileFormat:
+                continue
+            if is_focus_file(ring_file):
+                ring_files.append(ring_file)
+
+        includes = [get_ring_file(include_file)]
+        including_files = []
+        checked = set()
+        while includes:
+            inc = includes.pop()
+            for ring_file in ring_files:
+                if (ring_file in checked) or not ring_file.includes(inc):
+                    continue
+                checked.add(ring_file)
+                if ring_file.is_includable():
+                    includes.append(ring_file)
+                else:
+                    including_files.append(ring_file.file_name)
+
+        return including_files
+
+    def get_source(self, file_name):
+        """
+        Returns the contents of a Focus file that can be tested, preferring
+        the contents of an open view over the file on disk.
+
+        """
+        try:
+            ring_file = get_ring_file(file_name)
+        except InvalidFileFormat:
+            return None
+        if ((not is_focus_file(ring_file)) or (ring_file.ring is None) or
+                ring_file.is_includable()):
+            return None
+
+        view = self.window.find_open_file(file_name)
+        if view is not None:
+            return view.substr(sublime.Region(0, view.size()))
+
+        try:
+            with open(file_name, 'r') as f:
+                return f.read()
+        except OSError:
+            logger.warning('Could not read %s', file_name)
+            return None
+
+    def build_unit_test_file(self, plan, contents, template):
+        """
+        Writes the Unit Test file for the pending subroutines in a
+        UnitTestPlan and returns a UnitTestJob for it.
+
+        """
+        with tempfile.NamedTemporaryFile(suffix='.txt', mode='w',
+                                         delete=False) as f:
+            f.write("testing")
+            results_file_name = f.name
+
+        file_contents = build_unit_test_file_contents(
+            template, plan.file_name, plan.pending, contents.split('\n'),
+            results_file_name)
+
+        unit_test_file_name = get_unit_test_file_name(
+            get_ring_file(plan.file_name).ring.pgm_cache_path, plan.file_name)
+        with open(unit_test_file_name, 'w') as f:
+            f.write(file_contents)
+
+        return UnitTestJob(plan.file_name, unit_test_file_name,
+                           results_file_name)
@@ -586,14 +586,14 @@ class FoldSubroutineCommand(RingViewCommand):
         sel = self.view.sel()
         fold_regions = list()
         if all_regions:
-            for reg in view.find_by_selector(
-                    'meta.subroutine.header.fs, meta.list.header.fs'):
-                r = self.get_region(reg)
+            for member_region in self.ring_view.get_member_regions(
+                    (':Code', ':List')):
+                r = self.member_to_fold_region(member_region)
                 for s in sel:
                     if r.intersects(s):
                         break
                 else:
-                    fold_regions.append(self.get_region(reg))
+                    fold_regions.append(r)
         else:
             for sel in view.sel():
                 if view.score_selector(sel.begin(),
@@ -604,6 +604,10 @@ class FoldSubroutineCommand(RingViewCommand):
     def get_region(self, region):
         """Expands the selected region to include the entire subroutine."""
         member_region = self.ring_view.get_member_region(region.begin())
+        return self.member_to_fold_region(member_region)
+
+    def member_to_fold_region(self, member_region):
+        """Returns the region of a member after its header line."""
         header_line = self.view.line(member_region[0])
         r = sublime.Region(header_line.end(),
                            member_region[1])
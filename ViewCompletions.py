@@ -28,6 +28,7 @@ from .misc.completion_types import (
     CT_LIST,
     CT_TRANSLATOR,
     CT_SUBROUTINE_LOCAL,
+    CT_RT_TOOL,
 
     CT_OBJECT,
     CT_RECORD,
@@ -222,6 +223,48 @@ class TranslatorTrigger(CompletionTrigger):
             return translator.completion_types
 
 
+class RTToolTrigger(CompletionTrigger):
+    """Object to check RT Tool calls to return completion types."""
+
+    @classmethod
+    def view_scope(cls):
+        """
+        Return a scope to determine if a CompletionTrigger will be enabled for
+        a view.
+
+        """
+        return 'source.focus, source.fs'
+
+    def selection_scope(self):
+        """
+        Return a scope to determine if a CompletionTrigger will be enabled for
+        the current selection.
+
+        """
+        return ('source.fs - comment - string, '
+                'meta.keyword.code.focus - comment - string')
+
+    def selection_check(self, prefix, locs):
+        """
+        Return a list of completion types for the current locations.
+
+        If no completion types are handled for the current locations by this
+        trigger, return an empty list.
+
+        """
+        if not get_completion_trigger_enabled_setting('RT Tool'):
+            return []
+
+        # Tool calls are a single @ followed by the prefix, where @@ would
+        # start an Alias
+        start = locs[0] - len(prefix)
+        substring = self.view.substr(sublime.Region(start - 2, start))
+        if substring.endswith('@') and not substring.startswith('@'):
+            return [CT_RT_TOOL]
+
+        return []
+
+
 class VariablesTrigger(CompletionTrigger):
     """Trigger to include subroutine variables."""
 
@@ -0,0 +1,279 @@
+"""
+Static analysis of Focus files.
+
+Finds problems that are otherwise only reported when a file is translated on
+the server: undocumented and undeclared locals, :Code members that are never
+called and #Include files that don't exist.
+
+The analysis doesn't depend on Sublime Text, so whole applications can be
+checked from the command line. From the Packages folder:
+
+    python -m Focus.classes.analysis PgmSource\\Hha --ring DEV25.Ring
+
+"""
+
+from collections import namedtuple
+import argparse
+import concurrent.futures
+import hashlib
+import os
+import re
+import sys
+
+from .source_tree import get_source_tree
+from ..tools.general import LimitedSizeDict
+
+# Severities
+ERROR = 'error'
+WARNING = 'warning'
+
+# A problem found in a file. span is the (start, end) of the text it refers
+# to.
+Diagnostic = namedtuple('Diagnostic', ['code', 'message', 'span', 'severity'])
+
+LOCAL_USE_MATCHER = re.compile(
+    r"//.*|@(?:Get|Put)Local\((?P<local>[\w._-]+)\)")
+
+SUBROUTINE_CALL_MATCHER = re.compile(
+    r"//.*|@(?:CallSub|CodeMemberNumber|BatchesToStackWhile)\("
+    r"(?P<subroutine>[^\n()\t]+)\)|"
+    r"@FileBatchesWhile\(\w[\w._\- ]*?,(?P<batch_subroutine>[^\n()\t]+)\)")
+
+PRODUCT_TYPE_MATCHER = re.compile(r"\.([A-Za-z])\.focus$")
+
+Diagnostics = LimitedSizeDict(size_limit=128)
+
+
+def check_locals(tree, contents):
+    """
+    Yields a Diagnostic for each local declared in #Locals without a comment
+    documenting it, and for each use of a local that isn't declared.
+
+    """
+    declared = set()
+    for entry in tree.get_entries('Locals', ':Name'):
+        declared.add(entry.value)
+        if '//' not in contents[entry.span[0]:entry.span[1]]:
+            yield Diagnostic(
+                'undocumented-local',
+                'Local {0} is not documented'.format(entry.value),
+                entry.value_span, WARNING)
+
+    for m in LOCAL_USE_MATCHER.finditer(contents):
+        local = m.group('local')
+        if (local is not None) and (local not in declared):
+            yield Diagnostic(
+                'undeclared-local',
+                'Local {0} is not declared in #Locals'.format(local),
+                m.span('local'), ERROR)
+
+
+def check_subroutines(tree, contents, file_name=None):
+    """
+    Yields a Diagnostic for each :Code member that isn't called within the
+    file.
+
+    The first :Code member runs when the program starts, so it is never
+    reported. Include files are skipped, since their members are called by
+    the files that include them.
+
+    """
+    if file_name is not None:
+        match = PRODUCT_TYPE_MATCHER.search(file_name)
+        if (match is not None) and (match.group(1).upper() == 'I'):
+            return
+
+    called = set()
+    for m in SUBROUTINE_CALL_MATCHER.finditer(contents):
+        subroutine = m.group('subroutine') or m.group('batch_subroutine')
+        if subroutine is not None:
+            called.add(subroutine.strip())
+
+    members = [m for m in tree.members if m.keyword == ':Code']
+    for member in members[1:]:
+        if member.name not in called:
+            start = member.header[0] + len(':Code')
+            start = contents.index(member.name, start)
+            yield Diagnostic(
+                'uncalled-subroutine',
+                'Subroutine {0} is never called'.format(member.name),
+                (start, start + len(member.name)), WARNING)
+
+
+def get_includes(tree):
+    """
+    Returns a list of (partial path, span) tuples for the files in the
+    #Include translator. span is the span of the File attribute's value.
+
+    """
+    includes = []
+    for entry in tree.get_entries('Include', ':Source'):
+        attributes = {a.keyword: a for a in entry.attributes}
+        try:
+            folder = attributes['Folder']
+            file_ = attributes['File']
+        except KeyError:
+            continue
+
+        includes.append((os.path.join('PgmSource', folder.value, file_.value),
+                         file_.value_span))
+    return includes
+
+
+def check_includes(tree, resolve_many):
+    """
+    Yields a Diagnostic for each #Include file that can't be found.
+
+    Keyword arguments:
+    tree - The SourceTree of the file.
+    resolve_many - A function that takes a list of partial paths and returns
+        a dict mapping each to its full path or None, such as
+        Ring.resolve_many.
+
+    """
+    includes = get_includes(tree)
+    if not includes:
+        return
+
+    resolved = resolve_many([p for p, s in includes])
+    for partial_path, span in includes:
+        if resolved.get(partial_path) is None:
+            yield Diagnostic(
+                'missing-include',
+                'Include file {0} does not exist'.format(partial_path),
+                span, ERROR)
+
+
+def analyze(contents, file_name=None, resolve_many=None):
+    """
+    Returns a list of Diagnostics for the contents of a Focus file, sorted
+    by position.
+
+    The checks that only depend on the contents are cached by a hash of the
+    contents, so analyzing an unchanged file again only checks its includes.
+
+    Keyword arguments:
+    contents - The contents of the file.
+    file_name - The name of the file, used to tell whether it is an include
+        file.
+    resolve_many - If specified, #Include files are checked with this
+        function. See check_includes.
+
+    """
+    tree = get_source_tree(contents)
+    key = (hashlib.sha1(contents.encode('utf-8')).hexdigest(),
+           os.path.basename(file_name or '').lower())
+    try:
+        diagnostics = list(Diagnostics[key])
+    except KeyError:
+        diagnostics = list(check_locals(tree, contents))
+        diagnostics.extend(check_subroutines(tree, contents, file_name))
+        Diagnostics[key] = tuple(diagnostics)
+
+    if resolve_many is not None:
+        diagnostics.extend(check_includes(tree, resolve_many))
+
+    diagnostics.sort(key=lambda d: d.span)
+    return diagnostics
+
+
+def format_diagnostic(file_name, contents, diagnostic):
+    """Returns a diagnostic as file:row:column: severity code: message."""
+    start = diagnostic.span[0]
+    row = contents.count('\n', 0, start) + 1
+    column = start - (contents.rfind('\n', 0, start) + 1) + 1
+    return '{0}:{1}:{2}: {3} {4}: {5}'.format(
+        file_name, row, column, diagnostic.severity, diagnostic.code,
+        diagnostic.message)
+
+
+class FolderResolver(object):
+    """
+    Resolves partial paths against the folders of a ring, for analyzing files
+    outside of Sublime Text. Folders are searched in the order given; e.g.,
+    the PgmCache, then the server.
+
+    """
+
+    def __init__(self, *ring_paths):
+        self.ring_paths = ring_paths
+
+    def __call__(self, partial_paths):
+        results = dict()
+        for p in partial_paths:
+            results[p] = None
+            for ring_path in self.ring_paths:
+                path = os.path.join(ring_path, p)
+                if os.path.isfile(path):
+                    results[p] = path
+                    break
+        return results
+
+
+def analyze_file(file_name, resolve_many=None):
+    """Returns a list of the formatted diagnostics for a file."""
+    with open(file_name, 'r') as f:
+        contents = f.read()
+
+    return [format_diagnostic(file_name, contents, d) for d in
+            analyze(contents, file_name, resolve_many)]
+
+
+def analyze_files(file_names, resolve_many=None, max_workers=None):
+    """
+    Analyzes files in worker processes and yields each file name with its
+    list of formatted diagnostics, in the same order as file_names.
+
+    """
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers) as executor:
+        futures = [executor.submit(analyze_file, f, resolve_many) for f in
+                   file_names]
+        for file_name, future in zip(file_names, futures):
+            yield (file_name, future.result())
+
+
+def find_focus_files(path):
+    """Returns a sorted list of the Focus files in or under path."""
+    if os.path.isfile(path):
+        return [path]
+
+    file_names = []
+    for folder, dirs, files in os.walk(path):
+        file_names.extend(os.path.join(folder, f) for f in files if
+                          f.lower().endswith('.focus'))
+    return sorted(file_names)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Checks Focus files for common problems.')
+    parser.add_argument('paths', nargs='+',
+                        help='Focus files or folders of Focus files')
+    parser.add_argument('--ring', help=('The ring folder, used to check '
+                                        '#Include files'))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='The number of worker processes')
+    args = parser.parse_args(args)
+
+    resolve_many = None
+    if args.ring is not None:
+        resolve_many = FolderResolver(args.ring)
+
+    file_names = []
+    for p in args.paths:
+        file_names.extend(find_focus_files(p))
+
+    problems = 0
+    for file_name, lines in analyze_files(file_names, resolve_many,
+                                          args.workers):
+        for line in lines:
+            print(line)
+        problems += len(lines)
+
+    print('{0} problems in {1} files'.format(problems, len(file_names)))
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+A long running process that answers analysis queries about Focus files over
+JSON-RPC, and the client the plugin uses to talk to it.
+
+Files are analyzed and rings are indexed outside of the plugin host, by a
+process that keeps running when plugins are reloaded. The server owns a
+RingIndex, so its alias lists, Datadef objects, include graphs and member
+tables stay warm between requests and across reloads. Messages are JSON-RPC
+2.0 objects, one per line, on the server's stdin and stdout. Start it from
+the Packages folder with:
+
+    python -m Focus.classes.analysis_server
+
+Methods:
+    analyze - Diagnostics for the contents of a file. See classes.analysis.
+    aliases - The aliases in an alias list.
+    objects - The names defined by the Datadef files in a folder, packed by
+        CompactCompletions.get_state.
+    includeFiles - The Include and External PageSet files in PgmSource.
+    findMember - Where a :Code or :List is defined in a file's includes.
+    findAlias - Where an alias used in a file is defined.
+    $/cancelRequest - Cancels a request that hasn't finished.
+    shutdown - Stops the server.
+
+This module isn't reloaded by misc/reloader.py, so the client and its server
+survive plugin reloads.
+
+"""
+
+import concurrent.futures
+import functools
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from .analysis import FolderResolver, analyze
+from .ring_index import RingIndex
+
+logger = logging.getLogger(__name__)
+
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class AnalysisServerError(Exception):
+    """Raised by the client for an error response from the server."""
+
+    def __init__(self, code, message):
+        super(AnalysisServerError, self).__init__(message)
+        self.code = code
+
+
+class AnalysisServer(object):
+    """
+    Answers requests read from a stream on a bounded pool of worker threads.
+    Ring queries are answered from the server's RingIndex.
+
+    Keyword arguments:
+    input_stream - The stream requests are read from, one per line.
+    output_stream - The stream responses are written to.
+    max_workers - The maximum number of requests handled at once.
+
+    """
+
+    def __init__(self, input_stream, output_stream, max_workers=4):
+        super(AnalysisServer, self).__init__()
+        self.input_stream = input_stream
+        self.output_stream = output_stream
+        self.max_workers = max_workers
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._cancelled = set()
+        self._pending = set()
+        self.index = RingIndex()
+
+    def serve(self):
+        """Handles requests until shutdown or the end of the input."""
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers) as executor:
+            for line in self.input_stream:
+                if not line.strip():
+                    continue
+
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.send_error(None, PARSE_ERROR, 'Invalid JSON')
+                    continue
+
+                method = message.get('method')
+                if method == '$/cancelRequest':
+                    self.cancel(message.get('params', {}).get('id'))
+                elif method == 'shutdown':
+                    self.send_result(message.get('id'), None)
+                    break
+                else:
+                    with self._lock:
+                        self._pending.add(message.get('id'))
+                    executor.submit(self.handle, message)
+
+    def cancel(self, request_id):
+        with self._lock:
+            if request_id in self._pending:
+                self._cancelled.add(request_id)
+
+    def check_cancelled(self, request_id):
+        """Raises RequestCancelled if the request has been cancelled."""
+        with self._lock:
+            if request_id in self._cancelled:
+                raise RequestCancelled()
+
+    def handle(self, message):
+        request_id = message.get('id')
+        try:
+            self.check_cancelled(request_id)
+            try:
+                method = getattr(self, 'rpc_' + message['method'])
+            except (KeyError, AttributeError):
+                self.send_error(request_id, METHOD_NOT_FOUND,
+                                'Unknown method %s' % message.get('method'))
+                return
+
+            try:
+                result = method(request_id, **message.get('params', {}))
+            except TypeError as e:
+                self.send_error(request_id, INVALID_PARAMS, str(e))
+                return
+
+            self.check_cancelled(request_id)
+            self.send_result(request_id, result)
+        except RequestCancelled:
+            self.send_error(request_id, REQUEST_CANCELLED,
+                            'Request cancelled')
+        except Exception as e:
+            logger.exception('Request %s failed', request_id)
+            self.send_error(request_id, INTERNAL_ERROR, str(e))
+        finally:
+            with self._lock:
+                self._pending.discard(request_id)
+                self._cancelled.discard(request_id)
+
+    def send(self, message):
+        if message.get('id') is None:
+            return
+
+        message['jsonrpc'] = '2.0'
+        with self._write_lock:
+            self.output_stream.write(json.dumps(message) + '\n')
+            self.output_stream.flush()
+
+    def send_result(self, request_id, result):
+        self.send({'id': request_id, 'result': result})
+
+    def send_error(self, request_id, code, message):
+        self.send({'id': request_id,
+                   'error': {'code': code, 'message': message}})
+
+    def rpc_analyze(self, request_id, contents, fileName=None,
+                    searchPaths=None):
+        resolve_many = None
+        if searchPaths:
+            resolve_many = FolderResolver(*searchPaths)
+
+        return [{'code': d.code, 'message': d.message, 'span': d.span,
+                 'severity': d.severity} for d in
+                analyze(contents, fileName, resolve_many)]
+
+    def rpc_aliases(self, request_id, aliasListPath):
+        return list(self.index.get_aliases(aliasListPath))
+
+    def rpc_objects(self, request_id, datadefsPath):
+        objects = self.index.get_objects(
+            datadefsPath, functools.partial(self.check_cancelled, request_id))
+        return {k: v.get_state() for k, v in objects.items()}
+
+    def rpc_includeFiles(self, request_id, pgmsourcePath):
+        return self.index.get_include_files(
+            pgmsourcePath, functools.partial(self.check_cancelled, request_id))
+
+    def rpc_findMember(self, request_id, fileName, name, searchPaths):
+        return self.index.find_member(
+            fileName, name, searchPaths,
+            functools.partial(self.check_cancelled, request_id))
+
+    def rpc_findAlias(self, request_id, alias, fileName, aliasListPath,
+                      searchPaths):
+        return self.index.find_alias(
+            alias, fileName, aliasListPath, searchPaths,
+            functools.partial(self.check_cancelled, request_id))
+
+
+class AnalysisClient(object):
+    """
+    Starts an AnalysisServer process and sends it requests.
+
+    Requests return a concurrent.futures.Future for the result; cancelling
+    the request tells the server to stop working on it.
+
+    Keyword arguments:
+    args - The command that starts the server.
+    cwd - The folder the server is started in.
+
+    """
+
+    def __init__(self, args, cwd=None):
+        super(AnalysisClient, self).__init__()
+        startupinfo = None
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+
+        self.process = subprocess.Popen(
+            args, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            universal_newlines=True, startupinfo=startupinfo)
+        self.args = args
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._futures = dict()
+        self._reader = threading.Thread(target=self._read,
+                                        name='Focus Analysis Client')
+        self._reader.daemon = True
+        self._reader.start()
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def request(self, method, **params):
+        """Sends a request and returns a Future for its result."""
+        future = concurrent.futures.Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._futures[request_id] = future
+        future.request_id = request_id
+
+        self._send({'id': request_id, 'method': method, 'params': params})
+        return future
+
+    def cancel(self, future):
+        """Cancels a request made with request."""
+        if future.cancel():
+            self._send({'method': '$/cancelRequest',
+                        'params': {'id': future.request_id}})
+
+    def close(self):
+        if self.is_alive():
+            try:
+                self._send({'id': 0, 'method': 'shutdown'})
+                self.process.stdin.close()
+                self.process.wait(5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+    def _send(self, message):
+        message['jsonrpc'] = '2.0'
+        with self._lock:
+            self.process.stdin.write(json.dumps(message) + '\n')
+            self.process.stdin.flush()
+
+    def _read(self):
+        for line in self.process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logger.warning('Invalid response from analysis server: %s',
+                               line)
+                continue
+
+            with self._lock:
+                future = self._futures.pop(message.get('id'), None)
+            if (future is None) or future.cancelled():
+                continue
+
+            error = message.get('error')
+            if error is None:
+                future.set_result(message.get('result'))
+            else:
+                future.set_exception(AnalysisServerError(error['code'],
+                                                         error['message']))
+
+        # Fail whatever is still waiting once the server exits
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            if not future.cancelled():
+                future.set_exception(AnalysisServerError(
+                    INTERNAL_ERROR, 'Analysis server exited'))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_analysis_client(python, packages_path):
+    """
+    Returns the shared AnalysisClient, starting the server if it isn't
+    running. A server started with a different interpreter is stopped first.
+
+    Keyword arguments:
+    python - The Python interpreter used to run the server.
+    packages_path - The Packages folder containing the Focus package.
+
+    """
+    global _client
+    args = [python, '-m',
+            __package__.rpartition('.')[0] + '.classes.analysis_server']
+    with _client_lock:
+        if (_client is not None) and (_client.args != args):
+            logger.info('Analysis server python changed')
+            _client.close()
+            _client = None
+
+        if (_client is None) or not _client.is_alive():
+            logger.info('Starting analysis server with %s', python)
+            _client = AnalysisClient(args, cwd=packages_path)
+        return _client
+
+
+def stop_analysis_client():
+    """Stops the analysis server, if it's running."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def main():
+    AnalysisServer(sys.stdin, sys.stdout).serve()
+
+
+if __name__ == '__main__':
+    main()
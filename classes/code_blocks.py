@@ -4,9 +4,7 @@ import re
 
 import sublime
 
-from ..tools.sublime import (
-    split_member_region
-)
+from .source_tree import get_source_tree
 from ..tools.settings import (
     get_documentation_sections,
     get_default_separators,
@@ -114,11 +112,25 @@ class CodeBlock(object):
         Splits the codeblock region into header region, documentation region
         and code region.
         """
-        (self.header_region,
-         self.documentation_region,
-         self.var_declaration_region,
-         self.code_region) = split_member_region(self.view,
-                                                 self.codeblock_region)
+        # Only the member itself is parsed, so an edit elsewhere in the view
+        # doesn't reparse the whole file.
+        members = get_source_tree(
+            self.view.substr(self.codeblock_region)).members
+        member = members[0] if members else None
+        if (member is None) or (member.keyword not in (':Code', ':List')):
+            (self.header_region,
+             self.documentation_region,
+             self.var_declaration_region,
+             self.code_region) = (None, None, None, None)
+        else:
+            offset = self.codeblock_region.begin()
+            (self.header_region,
+             self.documentation_region,
+             self.var_declaration_region,
+             self.code_region) = [sublime.Region(start + offset, end + offset)
+                                  for start, end in
+                                  (member.header, member.doc,
+                                   member.declaration, member.body)]
 
     def get_arguments_from_function(self, return_flat_list=False):
         """Gathers the arguments to a function."""
@@ -184,26 +196,20 @@ class CodeBlock(object):
         """Get the variables used in the function."""
 
         codeblock_vars = dict()
-        codeblock_args = set()
-
-        first_line = self.view.substr(
-            self.view.line(self.code_region.begin()))
-        match = re.search(r"\^([A-Z,{}]*)", first_line)
-        if match:
-            args = match.group(1)
-            codeblock_args = set(re.findall(r'\b[A-Z]\b', args))
-
-        for r in self.view.find_by_selector('meta.variable.other'):
-            if self.code_region.contains(r):
-                var = self.view.substr(r)
-                if var in codeblock_vars.keys():
-                    codeblock_vars[var].add_region(r)
-                else:
-                    is_arg = False
-                    if var in codeblock_args:
-                        is_arg = True
-                    cbv = CodeBlockVar(var, is_arg, self.view, [r])
-                    codeblock_vars[cbv.var] = cbv
+        start = self.code_region.begin()
+        codeblock_args, variables, _ = self.ring_view.codeblock_analysis.get(
+            self.code_region)
+
+        for var, begin, end in variables:
+            r = sublime.Region(start + begin, start + end)
+            if var in codeblock_vars.keys():
+                codeblock_vars[var].add_region(r)
+            else:
+                is_arg = False
+                if var in codeblock_args:
+                    is_arg = True
+                cbv = CodeBlockVar(var, is_arg, self.view, [r])
+                codeblock_vars[cbv.var] = cbv
 
         return codeblock_vars
 
@@ -211,22 +217,23 @@ class CodeBlock(object):
         """Get the sets used in the function"""
 
         codeblock_sets = dict()
+        start = self.code_region.begin()
+        _, _, sets = self.ring_view.codeblock_analysis.get(self.code_region)
 
-        for r in self.view.find_all(r'@[A-Za-z]\d+'):
-            if self.code_region.contains(r):
-                listset = self.view.substr(r)
-                set_number = listset[2:]
-                upper_or_lower = CodeBlockSet.determine_upper(listset)
-                listset = CodeBlockSet.format_set(set_number, upper_or_lower)
+        for listset, begin, end in sets:
+            r = sublime.Region(start + begin, start + end)
+            set_number = listset[2:]
+            upper_or_lower = CodeBlockSet.determine_upper(listset)
+            listset = CodeBlockSet.format_set(set_number, upper_or_lower)
 
-                if listset in codeblock_sets.keys():
-                    codeblock_sets[listset].add_region(r)
-                else:
-                    cbs = CodeBlockSet(set_number,
-                                       upper_or_lower,
-                                       self.view,
-                                       [r])
-                    codeblock_sets[cbs.set] = cbs
+            if listset in codeblock_sets.keys():
+                codeblock_sets[listset].add_region(r)
+            else:
+                cbs = CodeBlockSet(set_number,
+                                   upper_or_lower,
+                                   self.view,
+                                   [r])
+                codeblock_sets[cbs.set] = cbs
 
         return codeblock_sets
 
@@ -0,0 +1,82 @@
+import re
+
+from ..tools.general import LimitedSizeDict
+
+
+class CodeBlockAnalysisCache(object):
+    """
+    Caches the arguments, variables and sets used in the code regions of a
+    view. Results are stored relative to the start of the code region and
+    keyed by the code itself, so an edit only invalidates the codeblocks it
+    touches. Within a single change count, results are also keyed by
+    region so repeated lookups do not need to read the view.
+
+    """
+
+    ARG_MATCHER = re.compile(r"\^([A-Z,{}]*)")
+    VARIABLE_MATCHER = re.compile(r"(?<![@.])\b[A-Za-z][A-Za-z0-9]*")
+    SET_MATCHER = re.compile(r"@[A-Za-z]\d+")
+
+    def __init__(self, view, size_limit=128):
+        super(CodeBlockAnalysisCache, self).__init__()
+        self.view = view
+        self._change_count = None
+        self._regions = dict()
+        self._analyses = LimitedSizeDict(size_limit=size_limit)
+
+    def get(self, code_region):
+        """
+        Returns a tuple of (arguments, variables, sets) for a code region.
+        Variables and sets are tuples of (text, start, end) with start and
+        end relative to the beginning of the region.
+
+        Keyword arguments:
+        code_region - The code region of a CodeBlock.
+
+        """
+        change_count = self.view.change_count()
+        if change_count != self._change_count:
+            self._regions = dict()
+            self._change_count = change_count
+
+        key = (code_region.begin(), code_region.end())
+        try:
+            return self._regions[key]
+        except KeyError:
+            pass
+
+        code = self.view.substr(code_region)
+        try:
+            analysis = self._analyses[code]
+        except KeyError:
+            analysis = self.analyze(code_region.begin(), code)
+            self._analyses[code] = analysis
+
+        self._regions[key] = analysis
+        return analysis
+
+    def analyze(self, start, code):
+        """
+        Finds the arguments, variables and sets in a piece of code. Only the
+        words in the code are checked against the variable scope, rather
+        than searching the whole view.
+
+        Keyword arguments:
+        start - The point in the view where the code begins.
+        code - The text of the code region.
+
+        """
+        arguments = frozenset()
+        match = self.ARG_MATCHER.search(code.split('\n', 1)[0])
+        if match:
+            arguments = frozenset(re.findall(r'\b[A-Z]\b', match.group(1)))
+
+        variables = tuple(
+            (m.group(0), m.start(), m.end()) for m in
+            self.VARIABLE_MATCHER.finditer(code) if
+            self.view.match_selector(start + m.start(), 'meta.variable.other'))
+
+        sets = tuple((m.group(0), m.start(), m.end()) for m in
+                     self.SET_MATCHER.finditer(code))
+
+        return (arguments, variables, sets)
@@ -20,6 +20,14 @@ from ..tools.sublime import (
     KEYWORD_ATTRIBUTE_MATCHER,
     strip_alias
 )
+from .ring_index import (
+    find_alias_definition,
+    find_member,
+    get_defined_objects,
+    iter_translator_sections
+)
+from .source_tree import get_source_tree
+from .translator_tree import MAGIC_KEYWORDS
 
 
 logger = logging.getLogger(__name__)
@@ -52,41 +60,6 @@ def get_object_search_reg_exes(type_, name):
     return reg_exes
 
 
-Object_Load_Reg_Exes = {}
-ALL_OBJECT_KEYWORDS = ('Object', 'LongLock', 'Mutex', 'File', 'Record', 'Key',
-                       'Field', 'Index', 'IndexKey')
-
-
-def get_object_load_reg_ex(type_):
-    def format_reg_ex(*args):
-        keys = '|'.join(args)
-        return (r"^[ \t]*:(?P<keyword>{keyword})[ \t]+"
-                r"(?P<entity>.+?)[ \t]*$").format(keyword=keys)
-
-    try:
-        return Object_Load_Reg_Exes[type_]
-    except KeyError:
-        pass
-
-    if type_ == 'All':
-        keys = ALL_OBJECT_KEYWORDS
-    else:
-        keys = ['Object']
-
-        if type_ == 'IndexKey':
-            keys.append('Index')
-
-        if type_ == 'Element':
-            keys.append('Key')
-            keys.append('Field')
-        else:
-            keys.append(type_)
-
-    reg_ex = re.compile(format_reg_ex(*keys), re.MULTILINE)
-    Object_Load_Reg_Exes[type_] = reg_ex
-    return reg_ex
-
-
 class FSCompatibility(metaclass=abc.ABCMeta):
     """
     Contains common functions that can be used between both MTFSView and
@@ -136,53 +109,16 @@ class FSCompatibility(metaclass=abc.ABCMeta):
         pass
 
     def find_member(self, name):
-        reg_ex = r"^ *:(Code|List) +({name}) *$".format(name=re.escape(name))
-        logger.debug("reg_ex = %s", reg_ex)
-        return string_search(self.get_contents(),
-                             reg_ex,
-                             match_group=2,
-                             flags=re.MULTILINE).span
+        return find_member(self.get_contents(), name)
 
-    MEMBER_REGION_REGEX = re.compile(r"(#[A-Za-z]+|:[A-Za-z]+) *(.+)?$")
+    def get_source_tree(self):
+        """Returns the SourceTree for the contents of the file or view."""
+        return get_source_tree(self.get_contents())
 
     def get_member_region(self, point):
         if isinstance(point, tuple):
             point = point[0]
-        line_span = self.get_line(point)[0]
-        line_span = (line_span[1] + 1, line_span[1] + 1)
-
-        start_point = None
-        for line in self.get_lines_from_iterator(point, reverse=True):
-            line_span = (line_span[0] - len(line) - 1, line_span[0] - 1)
-            match = string_match(line, self.MEMBER_REGION_REGEX,
-                                 base_point=line_span[0])
-            if match[0] and (match[1] in MAGIC_KEYWORDS):
-                start_point = line_span[0]
-                break
-        if not start_point or (start_point > point):
-            return None
-
-        end_point = None
-        line_stack = []
-        for line in self.get_lines_from_iterator(line_span[1] + 1):
-            line_span = (line_span[1] + 1, line_span[1] + len(line) + 1)
-            if line == '':
-                continue
-
-            match = string_match(line, self.MEMBER_REGION_REGEX,
-                                 base_point=line_span[0])
-            if match[0]:
-                prev_line = line_stack.pop()
-                end_point = prev_line[0][1]
-                break
-            line_stack.append((line_span, line))
-        else:
-            end_point = line_span[1]
-
-        if end_point >= point:
-            return (start_point, end_point)
-        else:
-            return None
+        return self.get_source_tree().get_member_region(point)
 
     def _extract_entity(self, extract_func, point):
         if isinstance(point, tuple):
@@ -283,9 +219,6 @@ class FSCompatibility(metaclass=abc.ABCMeta):
         return entities
 
 
-MAGIC_KEYWORDS = (':Code', ':List', ':EntryPoint', ':Icon')
-
-
 class FocusCompatibility(FSCompatibility):
     """
     Contains common functions that can be used between both MTFocusView and
@@ -321,20 +254,8 @@ class FocusCompatibility(FSCompatibility):
         return self._extract_entity(extract_focus_file, point)
 
     def get_translator_sections_iter(self, translator, include_end_space=True):
-        if translator.startswith('#'):
-            translator = translator[1:]
-
-        contents = self.get_contents() + "\n#END"
-
-        regex = r"^((//[ -=+*_]+\n)?#{translator}\n.+?".format(
-            translator=translator)
-        if include_end_space:
-            regex += r")(//[ -=+*_]+\n)?^#[A-Za-z]+$"
-        else:
-            regex += r"\n)\n*(//[ -=+*_]+\n)?^#[A-Za-z]+$"
-
-        for m in re.finditer(regex, contents, re.MULTILINE | re.DOTALL):
-            yield (m.span(1), m.group(1))
+        return iter_translator_sections(self.get_contents(), translator,
+                                        include_end_space)
 
     def get_translator_sections(self, translator, include_end_space=True):
         return list(self.get_translator_sections_iter(
@@ -356,18 +277,7 @@ class FocusCompatibility(FSCompatibility):
         if name is None:
             return None
 
-        reg_ex = (r"^([ \t]*:|:EntryPoint[ \t]+(?P<subroutine>\S+)\s+)"
-                  r"Alias[ \t]+(?P<alias>{name}) *$").format(name=re.escape(name))
-
-        match = re.search(reg_ex, self.get_contents(), re.MULTILINE)
-        if match is None:
-            return None
-
-        subroutine = match.group("subroutine")
-        if (subroutine is None) or (subroutine == ''):
-            return match.span('alias')
-        else:
-            return self.find_member(subroutine)
+        return find_alias_definition(self.get_contents(), name)
 
     def find_local_definition(self, name):
         if name is None:
@@ -494,42 +404,8 @@ class FocusCompatibility(FSCompatibility):
                                  for_completions=for_completions)
 
     def get_defined_objects(self, type_='All', for_completions=False):
-        object_dict = {}
-
-        def add_to_dict(keyword, value):
-            try:
-                object_dict[keyword].add(value)
-            except KeyError:
-                object_dict[keyword] = set()
-                object_dict[keyword].add(value)
-
-            if keyword in ('Key', 'Field'):
-                add_to_dict('Element', value)
-
-        compiled_reg_ex = get_object_load_reg_ex(type_)
-        object_ = ''
-        index = ''
-
-        for t_span, t_string in self.get_translator_sections('DataDef'):
-            for m in compiled_reg_ex.finditer(t_string):
-                keyword = m.group('keyword')
-                value = m.group('entity')
-
-                if keyword == 'Object':
-                    object_ = value
-                elif keyword == 'IndexKey':
-                    value = index + '.' + value
-                else:
-                    value = object_ + '.' + value
-                    if keyword == 'Index':
-                        index = value
-
-                if for_completions:
-                    value = (value,)
-
-                add_to_dict(keyword, value)
-
-        return object_dict
+        return get_defined_objects(self.get_contents(), type_,
+                                   for_completions)
 
     DEFINED_SCREEN_COMPONENT_LOADER = re.compile(
         r"^[ \t]*:(?P<type>ElementSet|Index|Display)[ \t]+" +
@@ -0,0 +1,244 @@
+from array import array
+import base64
+import collections.abc
+import heapq
+import sys
+
+
+# The number of rests joined at a time while packing names
+JOIN_SIZE = 1024
+
+
+def get_sort_key(name):
+    """Returns the key names are sorted by: case-insensitive, then exact."""
+    return (name.lower(), name)
+
+
+class CompactCompletions(collections.abc.Set):
+    """
+    An immutable set of completion tuples for a large list of names, such as
+    a ring's aliases or Datadef elements, stored in packed arrays.
+
+    Each name is kept once, split at its last dot into an interned prefix
+    (such as the object name) and the rest, with the rest of every name
+    joined into one string. The (trigger, contents) tuples Sublime Text
+    needs are only built while iterating or matching, using the formats the
+    set was created with, and aren't kept, so large sets don't hold a string
+    and a tuple for every completion. Queries on large sets should use
+    match(), which only builds the tuples it returns.
+
+    Behaves like a frozenset of the tuples, so it can be used anywhere a set
+    of completions is expected.
+
+    Keyword arguments:
+    names - An iterable of the names to complete.
+    trigger_format - The format of each completion's trigger, with {0} for
+        the name.
+    contents_format - The format of each completion's contents. If None,
+        completions are 1-tuples of the trigger.
+
+    """
+
+    def __init__(self, names=(), trigger_format='{0}', contents_format=None):
+        super(CompactCompletions, self).__init__()
+        self.trigger_format = trigger_format
+        self.contents_format = contents_format
+        self._trigger_affixes = self._split_format(trigger_format)
+        self._pack(sorted(set(names), key=get_sort_key))
+
+    @classmethod
+    def merge(cls, sets, trigger_format='{0}', contents_format=None):
+        """
+        Returns a CompactCompletions of the names in several of them. The
+        names are merged in order one at a time, so they are never all held
+        as strings at once.
+
+        """
+        def iter_keys(completions):
+            for i in range(len(completions)):
+                yield get_sort_key(completions.get_name(i))
+
+        def iter_names():
+            last = None
+            for lower, name in heapq.merge(*[iter_keys(s) for s in sets]):
+                if name != last:
+                    yield name
+                last = name
+
+        completions = cls(trigger_format=trigger_format,
+                          contents_format=contents_format)
+        completions._pack(iter_names())
+        return completions
+
+    def _pack(self, names):
+        """Packs names, which must be unique and in sorted order."""
+        prefix_ids = dict()
+        self._prefixes = []
+        self._prefix_ids = array('i')
+        self._offsets = array('i', [0])
+        chunks = []
+        parts = []
+        end = 0
+        for name in names:
+            prefix, dot, rest = name.rpartition('.')
+            if dot:
+                try:
+                    prefix_id = prefix_ids[prefix]
+                except KeyError:
+                    prefix_id = prefix_ids[prefix] = len(self._prefixes)
+                    self._prefixes.append(sys.intern(prefix))
+            else:
+                prefix_id = -1
+
+            self._prefix_ids.append(prefix_id)
+            parts.append(rest)
+            if len(parts) >= JOIN_SIZE:
+                chunks.append(''.join(parts))
+                parts = []
+            end += len(rest)
+            self._offsets.append(end)
+
+        chunks.append(''.join(parts))
+        self._text = ''.join(chunks)
+
+    def get_state(self):
+        """
+        Returns the packed names as a dict that can be sent as JSON, with the
+        arrays encoded in base64.
+
+        """
+        return {'prefixes': self._prefixes,
+                'prefixIds': base64.b64encode(
+                    self._prefix_ids.tobytes()).decode('ascii'),
+                'offsets': base64.b64encode(
+                    self._offsets.tobytes()).decode('ascii'),
+                'text': self._text}
+
+    @classmethod
+    def from_state(cls, state, trigger_format='{0}', contents_format=None):
+        """Returns a CompactCompletions of names packed by get_state."""
+        completions = cls(trigger_format=trigger_format,
+                          contents_format=contents_format)
+        completions._prefixes = [sys.intern(p) for p in state['prefixes']]
+        completions._prefix_ids = array('i')
+        completions._prefix_ids.frombytes(
+            base64.b64decode(state['prefixIds']))
+        completions._offsets = array('i')
+        completions._offsets.frombytes(base64.b64decode(state['offsets']))
+        completions._text = state['text']
+        return completions
+
+    @staticmethod
+    def _split_format(format_):
+        head, marker, tail = format_.partition('{0}')
+        return (head, tail)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # Results of set operations are ordinary sets
+        return set(iterable)
+
+    def __len__(self):
+        return len(self._prefix_ids)
+
+    def get_name(self, index):
+        """Returns the name at index, in sorted order."""
+        rest = self._text[self._offsets[index]:self._offsets[index + 1]]
+        prefix_id = self._prefix_ids[index]
+        if prefix_id == -1:
+            return rest
+        return self._prefixes[prefix_id] + '.' + rest
+
+    def get_names(self):
+        return [self.get_name(i) for i in range(len(self))]
+
+    def make_completion(self, name):
+        """Returns the completion tuple for a name."""
+        trigger = self.trigger_format.format(name)
+        if self.contents_format is None:
+            return (trigger,)
+        return (trigger, self.contents_format.format(name))
+
+    def _find(self, key):
+        """
+        Returns the index of the first name whose sort key isn't less than
+        key.
+
+        """
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if get_sort_key(self.get_name(middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def has_name(self, name):
+        index = self._find(get_sort_key(name))
+        return (index < len(self)) and (self.get_name(index) == name)
+
+    def __contains__(self, completion):
+        try:
+            trigger = completion[0]
+        except (TypeError, IndexError):
+            return False
+
+        head, tail = self._trigger_affixes
+        if not (trigger.startswith(head) and trigger.endswith(tail) and
+                len(trigger) >= len(head) + len(tail)):
+            return False
+
+        name = trigger[len(head):len(trigger) - len(tail)]
+        return (self.has_name(name) and
+                (self.make_completion(name) == tuple(completion)))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.make_completion(self.get_name(i))
+
+    def match(self, prefix, limit=None):
+        """
+        Returns a list of the completions for names starting with prefix,
+        ignoring case as Sublime Text does, building at most limit of them.
+
+        """
+        prefix = prefix.lower()
+        completions = []
+        for i in range(self._find((prefix,)), len(self)):
+            if (limit is not None) and (len(completions) >= limit):
+                break
+
+            name = self.get_name(i)
+            if not name.lower().startswith(prefix):
+                break
+            completions.append(self.make_completion(name))
+        return completions
+
+
+def match_completions(completions, completion_types, prefix, limit):
+    """
+    Returns a list of at most limit completions of completion_types for
+    names starting with prefix, or None if completions aren't stored as
+    CompactCompletions.
+
+    Keyword arguments:
+    completions - A CompactCompletions, or a dict mapping completion types
+        to them.
+    completion_types - The types of completion requested.
+    prefix - The name being typed.
+    limit - The number of completions to build.
+
+    """
+    if isinstance(completions, dict):
+        sets = [completions[t] for t in completion_types if t in completions]
+    else:
+        sets = [completions]
+
+    if not all(isinstance(s, CompactCompletions) for s in sets):
+        return None
+
+    matches = []
+    for s in sets:
+        matches.extend(s.match(prefix, limit - len(matches)))
+    return matches
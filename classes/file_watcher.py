@@ -0,0 +1,319 @@
+from collections import namedtuple
+import logging
+import os
+import threading
+import time
+
+from ..tools.general import DirectoryListing
+
+logger = logging.getLogger(__name__)
+
+
+# Kinds of change
+ADDED = 'added'
+REMOVED = 'removed'
+MODIFIED = 'modified'
+
+# A change to a file or folder in a watched folder. Folders are reported as
+# modified when files are added to or removed from them.
+ChangeEvent = namedtuple('ChangeEvent', ['path', 'kind'])
+
+# Seconds between polls of folders on local drives and on servers
+LOCAL_INTERVAL = 2
+SERVER_INTERVAL = 30
+
+# Seconds the polling thread sleeps between checking for due folders
+TICK = 0.5
+
+
+def is_local_path(path):
+    """
+    Returns True if path is on a local drive rather than a UNC path to a
+    server.
+
+    """
+    return os.path.splitdrive(path)[0].endswith(':')
+
+
+def is_in_folder(path, folder):
+    """Returns True if path is folder or is under it."""
+    return (path == folder) or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+def get_poll_interval(path):
+    """Returns the polling interval for a folder."""
+    return LOCAL_INTERVAL if is_local_path(path) else SERVER_INTERVAL
+
+
+class Watch(object):
+    """A folder being polled and what was in it at the last poll."""
+
+    def __init__(self, path, interval, depth):
+        super(Watch, self).__init__()
+        self.path = path
+        self.interval = interval
+        self.depth = depth
+        self.due = 0
+        self.snapshot = None
+
+    def take_snapshot(self):
+        """
+        Returns a dict mapping each file and folder within depth levels of
+        the folder to its modified time and size.
+
+        Raises OSError if the folder can't be listed.
+
+        """
+        snapshot = dict()
+        folders = [(self.path, 0)]
+        while folders:
+            folder, level = folders.pop()
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                snapshot[path] = (stat.st_mtime, stat.st_size)
+                if (level < self.depth) and os.path.isdir(path):
+                    folders.append((path, level + 1))
+        return snapshot
+
+    def poll(self):
+        """Returns a list of the ChangeEvents since the last poll."""
+        try:
+            snapshot = self.take_snapshot()
+        except OSError:
+            # Keep the last snapshot while a server is unreachable, so
+            # nothing is reported as removed
+            logger.debug('Failed to poll %s', self.path)
+            return []
+
+        previous = self.snapshot
+        self.snapshot = snapshot
+        if previous is None:
+            return []
+
+        events = [ChangeEvent(p, ADDED) for p in
+                  snapshot.keys() - previous.keys()]
+        events.extend(ChangeEvent(p, REMOVED) for p in
+                      previous.keys() - snapshot.keys())
+        events.extend(ChangeEvent(p, MODIFIED) for p in
+                      snapshot.keys() & previous.keys() if
+                      snapshot[p] != previous[p])
+        return events
+
+
+class FileWatcher(object):
+    """
+    Polls registered folders on a background thread and publishes the
+    changes to subscribers, so caches are invalidated from one place instead
+    of each checking the file system on its own.
+
+    Each folder is polled at its own interval; by default folders on servers
+    are polled much less often than folders on local drives. Subscribers
+    are called on the polling thread with a list of ChangeEvents.
+
+    """
+
+    def __init__(self, clock=time.time):
+        super(FileWatcher, self).__init__()
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._watches = dict()
+        self._subscribers = dict()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def watch(self, path, interval=None, depth=0):
+        """
+        Starts polling a folder. Watching a folder that is already watched
+        uses the shorter interval and the greater depth.
+
+        Keyword arguments:
+        path - The folder to watch.
+        interval - Seconds between polls. Defaults to get_poll_interval.
+        depth - How many levels of subfolders to look into. With 0, only the
+            entries in the folder itself are checked.
+
+        """
+        if interval is None:
+            interval = get_poll_interval(path)
+
+        key = os.path.normcase(path)
+        with self._lock:
+            try:
+                w = self._watches[key]
+            except KeyError:
+                logger.debug('Watching %s', path)
+                self._watches[key] = Watch(path, interval, depth)
+            else:
+                w.interval = min(w.interval, interval)
+                if depth > w.depth:
+                    w.depth = depth
+                    w.snapshot = None
+
+    def unwatch(self, path):
+        with self._lock:
+            self._watches.pop(os.path.normcase(path), None)
+
+    def is_watched(self, path):
+        """Returns True if path is in or under a watched folder."""
+        path = os.path.normcase(path)
+        with self._lock:
+            return any(is_in_folder(path, k) for k in self._watches)
+
+    def subscribe(self, key, callback, path=None):
+        """
+        Registers a callback for changes. Subscribing again with the same
+        key replaces the earlier callback, so modules can subscribe when
+        they are reloaded.
+
+        Keyword arguments:
+        key - A name for the subscription.
+        callback - Called with a list of ChangeEvents.
+        path - If specified, the callback is only called for changes in or
+            under this folder.
+
+        """
+        if path is not None:
+            path = os.path.normcase(path)
+        with self._lock:
+            self._subscribers[key] = (callback, path)
+
+    def unsubscribe(self, key):
+        with self._lock:
+            self._subscribers.pop(key, None)
+
+    def poll(self):
+        """
+        Polls every folder that is due and publishes the changes. Returns
+        the list of ChangeEvents.
+
+        """
+        now = self.clock()
+        with self._lock:
+            due = [w for w in self._watches.values() if w.due <= now]
+            for w in due:
+                w.due = now + w.interval
+
+        events = []
+        for w in due:
+            events.extend(w.poll())
+
+        if events:
+            self.publish(events)
+        return events
+
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+
+        for key, (callback, path) in subscribers:
+            if path is None:
+                selected = events
+            else:
+                selected = [e for e in events if
+                            is_in_folder(os.path.normcase(e.path), path)]
+
+            if not selected:
+                continue
+
+            try:
+                callback(selected)
+            except Exception:
+                logger.exception('File watcher subscriber %s failed', key)
+
+    def start(self):
+        """Starts the polling thread if it isn't running."""
+        with self._lock:
+            if (self._thread is not None) and self._thread.is_alive():
+                return
+
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name='Focus File Watcher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        logger.debug('File watcher started')
+        while not self._stop.wait(TICK):
+            self.poll()
+        logger.debug('File watcher stopped')
+
+
+def invalidate_listings(events):
+    """Drops the DirectoryListings of folders that have changed."""
+    for e in events:
+        DirectoryListing.invalidate(os.path.dirname(e.path))
+        if e.kind != ADDED:
+            DirectoryListing.invalidate(e.path)
+
+
+_file_watcher = None
+
+# Functions that set up watches and subscriptions, called with each shared
+# FileWatcher that is started, keyed by name.
+_registrations = dict()
+
+
+def get_file_watcher():
+    """
+    Returns the shared FileWatcher, starting it the first time along with
+    everything registered with register_with_file_watcher.
+
+    """
+    global _file_watcher
+    if _file_watcher is None:
+        _file_watcher = FileWatcher()
+        _file_watcher.subscribe('directory_listings', invalidate_listings)
+        for key, callback in list(_registrations.items()):
+            _register(key, callback, _file_watcher)
+        _file_watcher.start()
+    return _file_watcher
+
+
+def register_with_file_watcher(key, callback, start=False):
+    """
+    Registers a function that sets up watches or subscriptions on the shared
+    FileWatcher. It's called with the watcher if one is running, and again
+    with each watcher started later, so nothing is lost when the watcher is
+    stopped and started again. Registering again with the same key replaces
+    the earlier function.
+
+    Keyword arguments:
+    key - A name for the registration.
+    callback - Called with the FileWatcher.
+    start - If True, the watcher is started if it isn't running. Otherwise
+        the callback waits for something else to start it.
+
+    """
+    _registrations[key] = callback
+    if _file_watcher is not None:
+        _register(key, callback, _file_watcher)
+    elif start:
+        get_file_watcher()
+
+
+def _register(key, callback, watcher):
+    try:
+        callback(watcher)
+    except Exception:
+        logger.exception('File watcher registration %s failed', key)
+
+
+def stop_file_watcher():
+    """
+    Stops the shared FileWatcher. The registrations are kept, and set up
+    again on the next one started.
+
+    """
+    global _file_watcher
+    if _file_watcher is not None:
+        _file_watcher.stop()
+        _file_watcher = None
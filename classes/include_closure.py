@@ -0,0 +1,202 @@
+from collections import namedtuple
+import logging
+import os
+import threading
+
+from ..tools.general import get_file_version
+
+logger = logging.getLogger(__name__)
+
+
+# The files included by a file, directly or through other includes, in
+# precedence order, and the include cycles found as tuples of files, each
+# ending with the file that was included again.
+Closure = namedtuple('Closure', ['files', 'cycles'])
+
+# A computed closure, with the versions of every file it depends on and the
+# keys of the files on the stack that its cycles lead back to.
+_Result = namedtuple('_Result', ['closure', 'versions', 'open_cycles'])
+
+
+class IncludeClosures(object):
+    """
+    Computes the transitive includes of files, once per version of the files
+    involved.
+
+    Each file's direct includes are read once per version, and closures are
+    memoized, so files included from many places (diamonds in the include
+    graph) are only expanded once and share their closures. A cached
+    closure is reused until any file in it changes.
+
+    The order matches the order the includes are searched: a file's direct
+    includes, then the closure of each of them in turn, keeping the first
+    occurrence of each file. Include cycles are reported rather than
+    followed.
+
+    Keyword arguments:
+    get_includes - Called with a file name to get the list of files it
+        includes directly.
+    get_version - Called with a file name to get a value that changes when
+        the file does.
+    get_folders - If specified, called with a file name to get the folders
+        its includes are looked for in, so invalidate_folders only forgets
+        the files whose includes could be found elsewhere.
+
+    """
+
+    def __init__(self, get_includes, get_version=get_file_version,
+                 get_folders=None):
+        super(IncludeClosures, self).__init__()
+        self.get_includes = get_includes
+        self.get_version = get_version
+        self.get_folders = get_folders
+        self._lock = threading.RLock()
+        self._direct = dict()
+        self._folders = dict()
+        self._results = dict()
+        self._logged_cycles = set()
+
+    @staticmethod
+    def key(file_name):
+        return os.path.normcase(file_name)
+
+    def get_closure(self, file_name):
+        """Returns the Closure of a file."""
+        with self._lock:
+            result = self._get_result(file_name, [], dict())
+            cycles = [c for c in result.closure.cycles if
+                      c not in self._logged_cycles]
+            self._logged_cycles.update(cycles)
+
+        for cycle in cycles:
+            logger.warning('Include cycle: %s', ' -> '.join(cycle))
+        return result.closure
+
+    def get_direct_includes(self, file_name):
+        """Returns the files a file includes directly."""
+        key = self.key(file_name)
+        with self._lock:
+            return self._get_direct_includes(key, file_name,
+                                             self.get_version(file_name))
+
+    def invalidate(self, file_name=None):
+        """Forgets a file's includes and closure, or everything."""
+        with self._lock:
+            if file_name is None:
+                self._direct.clear()
+                self._folders.clear()
+                self._results.clear()
+            else:
+                key = self.key(file_name)
+                self._direct.pop(key, None)
+                self._folders.pop(key, None)
+                self._results.pop(key, None)
+
+    def invalidate_folders(self, folders):
+        """
+        Forgets the includes of the files whose includes are looked for in
+        any of folders, and the closures that contain them. Without
+        get_folders, everything is forgotten.
+
+        """
+        if self.get_folders is None:
+            self.invalidate()
+            return
+
+        folders = set(self.key(os.path.normpath(f)) for f in folders)
+        with self._lock:
+            keys = set(k for k, f in self._folders.items() if f & folders)
+            for key in keys:
+                del self._direct[key]
+                del self._folders[key]
+
+            for key, result in list(self._results.items()):
+                if not keys.isdisjoint(result.versions):
+                    del self._results[key]
+
+    def _get_version(self, key, file_name, versions):
+        # Each file is only checked once per call to get_closure
+        try:
+            return versions[key]
+        except KeyError:
+            version = versions[key] = self.get_version(file_name)
+            return version
+
+    def _get_direct_includes(self, key, file_name, version):
+        try:
+            cached_version, includes = self._direct[key]
+        except KeyError:
+            pass
+        else:
+            if cached_version == version:
+                return includes
+
+        includes = tuple(self.get_includes(file_name))
+        self._direct[key] = (version, includes)
+        if self.get_folders is not None:
+            self._folders[key] = frozenset(
+                self.key(os.path.normpath(f)) for f in
+                self.get_folders(file_name))
+        return includes
+
+    def _is_current(self, result, names, versions):
+        return all(self._get_version(k, names.get(k, k), versions) == v for
+                   k, v in result.versions.items())
+
+    def _get_result(self, file_name, stack, versions):
+        key = self.key(file_name)
+        try:
+            result = self._results[key]
+        except KeyError:
+            pass
+        else:
+            names = {self.key(f): f for f in result.closure.files}
+            names[key] = file_name
+            if self._is_current(result, names, versions):
+                return result
+
+        version = self._get_version(key, file_name, versions)
+        includes = self._get_direct_includes(key, file_name, version)
+        stack.append((key, file_name))
+        stack_keys = set(k for k, f in stack)
+
+        files = []
+        seen = {key}
+        cycles = []
+        open_cycles = set()
+        dependencies = {key: version}
+
+        def add(f):
+            k = self.key(f)
+            if k not in seen:
+                seen.add(k)
+                files.append(f)
+
+        for f in includes:
+            add(f)
+
+        for f in includes:
+            k = self.key(f)
+            if k in stack_keys:
+                start = [s for s, n in stack].index(k)
+                cycles.append(tuple(n for s, n in stack[start:]) + (f,))
+                open_cycles.add(k)
+                continue
+
+            sub = self._get_result(f, stack, versions)
+            for i in sub.closure.files:
+                add(i)
+            cycles.extend(c for c in sub.closure.cycles if c not in cycles)
+            open_cycles |= sub.open_cycles
+            dependencies.update(sub.versions)
+
+        stack.pop()
+        open_cycles.discard(key)
+        result = _Result(Closure(tuple(files), tuple(cycles)), dependencies,
+                         frozenset(open_cycles))
+
+        # A closure cut short by a cycle back to a file further up the stack
+        # is incomplete on its own, so it isn't kept
+        if not open_cycles:
+            self._results[key] = result
+        return result
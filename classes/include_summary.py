@@ -0,0 +1,121 @@
+from collections import namedtuple
+import logging
+import os
+import threading
+
+from ..tools.general import get_file_version
+
+logger = logging.getLogger(__name__)
+
+
+# Everything the completion loaders need from an Include file. objects maps
+# each Datadef keyword to the names defined for it.
+IncludeSummary = namedtuple('IncludeSummary', [
+    'aliases', 'locals', 'objects', 'subroutines', 'lists'])
+
+
+def summarize_include(ring_file):
+    """Returns the IncludeSummary of a FocusFile."""
+    return IncludeSummary(
+        frozenset(ring_file.get_defined_aliases()),
+        frozenset(ring_file.get_used_locals() |
+                  ring_file.get_defined_locals()),
+        {k: frozenset(v) for k, v in
+         ring_file.get_defined_objects().items()},
+        frozenset(ring_file.get_defined_subroutines()),
+        frozenset(ring_file.get_defined_lists()))
+
+
+class SummaryEntry(object):
+
+    def __init__(self):
+        super(SummaryEntry, self).__init__()
+        self.lock = threading.Lock()
+        self.version = None
+        self.summary = None
+
+
+class IncludeSummaryCache(object):
+    """
+    The IncludeSummaries of the Include files used by open views, so each
+    file is parsed once per version however many loaders and views read it.
+
+    Views acquire the Include files they use and release them when they
+    close; a summary is dropped once no open view uses its file.
+
+    Keyword arguments:
+    build - Called with a file name to build its IncludeSummary.
+    get_version - Called with a file name to get a value that changes when
+        the file does.
+
+    """
+
+    def __init__(self, build, get_version=get_file_version):
+        super(IncludeSummaryCache, self).__init__()
+        self.build = build
+        self.get_version = get_version
+        self._lock = threading.Lock()
+        self._entries = dict()
+        self._holders = dict()
+
+    @staticmethod
+    def key(file_name):
+        return os.path.normcase(file_name)
+
+    def acquire(self, holder, file_names):
+        """
+        Records that holder, such as a view id, uses file_names. Files it
+        held before that aren't in file_names are released.
+
+        """
+        keys = set(self.key(f) for f in file_names)
+        with self._lock:
+            self._holders[holder] = keys
+            self._evict()
+
+    def release(self, holder):
+        """Releases every file held by holder."""
+        with self._lock:
+            self._holders.pop(holder, None)
+            self._evict()
+
+    def _evict(self):
+        needed = set()
+        for keys in self._holders.values():
+            needed |= keys
+
+        for key in list(self._entries):
+            if key not in needed:
+                logger.debug('Dropping include summary for %s', key)
+                del self._entries[key]
+
+    def get(self, file_name):
+        """
+        Returns the IncludeSummary of a file, building it if the file has
+        changed since it was last built. Concurrent calls for the same file
+        share one build. The summary is only kept if a holder uses the file.
+
+        """
+        key = self.key(file_name)
+        with self._lock:
+            try:
+                entry = self._entries[key]
+            except KeyError:
+                entry = self._entries[key] = SummaryEntry()
+
+        with entry.lock:
+            version = self.get_version(file_name)
+            if (entry.summary is None) or (entry.version != version):
+                logger.debug('Summarizing %s', file_name)
+                entry.summary = self.build(file_name)
+                entry.version = version
+            summary = entry.summary
+
+        with self._lock:
+            if not any(key in keys for keys in self._holders.values()):
+                self._entries.pop(key, None)
+        return summary
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,277 @@
+from abc import abstractmethod
+from collections import namedtuple
+import concurrent.futures
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# A snapshot of the scheduler's queue. Waits are the seconds jobs spent in
+# the queue before a worker started them.
+SchedulerStats = namedtuple('SchedulerStats', [
+    'queued', 'running', 'completed', 'deduplicated', 'cancelled',
+    'average_wait', 'max_wait'])
+
+
+class LoadJob(object):
+    """A queued or running load."""
+
+    def __init__(self, key, func, sequence, submitted):
+        super(LoadJob, self).__init__()
+        self.key = key
+        self.func = func
+        self.sequence = sequence
+        self.submitted = submitted
+        self.future = concurrent.futures.Future()
+        self.cancelled = threading.Event()
+
+
+class LoaderScheduler(object):
+    """
+    Runs completion loads on a bounded pool of worker threads.
+
+    A load is identified by a key, such as the loader class and path, and
+    loads submitted while one with the same key is queued or running share
+    its result. Loads needed by the active view are started first, and
+    queued loads are cancelled once every view that needed them has closed.
+    A running load is told it isn't needed anymore through load_cancelled.
+
+    Keyword arguments:
+    max_workers - The maximum number of loads run at once.
+    clock - The function used to time waits.
+
+    """
+
+    def __init__(self, max_workers=2, clock=time.time):
+        super(LoaderScheduler, self).__init__()
+        self.max_workers = max_workers
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._queue = []
+        self._jobs = dict()
+        self._views = dict()
+        self._active_view = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._completed = 0
+        self._deduplicated = 0
+        self._cancelled = 0
+        self._total_wait = 0
+        self._max_wait = 0
+        self._local = threading.local()
+
+    def register_view(self, view_id, key):
+        """Records that a view needs the load for key."""
+        with self._condition:
+            self._views.setdefault(key, set()).add(view_id)
+            try:
+                self._jobs[key].cancelled.clear()
+            except KeyError:
+                pass
+
+    def set_active_view(self, view_id):
+        with self._condition:
+            self._active_view = view_id
+
+    def release_view(self, view_id):
+        """
+        Forgets a view that has closed and cancels the queued loads no other
+        view needs. Returns the number of loads cancelled.
+
+        """
+        with self._condition:
+            if self._active_view == view_id:
+                self._active_view = None
+
+            unneeded = set()
+            for key, view_ids in self._views.items():
+                if view_id in view_ids:
+                    view_ids.discard(view_id)
+                    if not view_ids:
+                        unneeded.add(key)
+
+            for key in unneeded:
+                del self._views[key]
+
+            cancelled = [j for j in self._queue if j.key in unneeded]
+            for job in cancelled:
+                self._queue.remove(job)
+                del self._jobs[job.key]
+                self._cancelled += 1
+
+            for key in unneeded:
+                try:
+                    self._jobs[key].cancelled.set()
+                except KeyError:
+                    pass
+
+        for job in cancelled:
+            logger.debug('Cancelled load %s', job.key)
+            job.future.cancel()
+        return len(cancelled)
+
+    def submit(self, key, func):
+        """
+        Queues func to be run for key and returns a Future for its result.
+        If a load for key is already queued or running, its Future is
+        returned instead.
+
+        """
+        with self._condition:
+            try:
+                job = self._jobs[key]
+            except KeyError:
+                pass
+            else:
+                self._deduplicated += 1
+                return job.future
+
+            job = LoadJob(key, func, next(self._sequence), self.clock())
+            self._jobs[key] = job
+            self._queue.append(job)
+            if len(self._workers) < self.max_workers:
+                self._start_worker()
+            self._condition.notify()
+            return job.future
+
+    def run(self, key, func):
+        """
+        Runs func through the scheduler and returns its result.
+
+        Raises concurrent.futures.CancelledError if the load is cancelled.
+
+        """
+        return self.submit(key, func).result()
+
+    def load_cancelled(self):
+        """
+        Returns True if the load running on the calling thread is no longer
+        needed by any view, so it can stop early. Outside of a load, it
+        returns False.
+
+        """
+        job = getattr(self._local, 'job', None)
+        return (job is not None) and job.cancelled.is_set()
+
+    def get_stats(self):
+        with self._condition:
+            started = self._completed + self._running
+            return SchedulerStats(
+                len(self._queue), self._running, self._completed,
+                self._deduplicated, self._cancelled,
+                (self._total_wait / started) if started else 0,
+                self._max_wait)
+
+    def _priority(self, job):
+        active = ((self._active_view is not None) and
+                  (self._active_view in self._views.get(job.key, ())))
+        return (0 if active else 1, job.sequence)
+
+    def _start_worker(self):
+        worker = threading.Thread(target=self._work,
+                                  name='Focus Completion Loader')
+        worker.daemon = True
+        self._workers.append(worker)
+        worker.start()
+
+    def _next_job(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            job = min(self._queue, key=self._priority)
+            self._queue.remove(job)
+            wait = self.clock() - job.submitted
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._running += 1
+            return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if not job.future.set_running_or_notify_cancel():
+                self._finish(job)
+                continue
+
+            # The job is finished before its result is set, so a load
+            # submitted once the result is available runs again instead of
+            # getting this result
+            self._local.job = job
+            try:
+                result = job.func()
+            except concurrent.futures.CancelledError as e:
+                logger.debug('Load %s stopped', job.key)
+                self._finish(job)
+                job.future.set_exception(e)
+            except Exception as e:
+                logger.exception('Load %s failed', job.key)
+                self._finish(job)
+                job.future.set_exception(e)
+            else:
+                self._finish(job)
+                job.future.set_result(result)
+            finally:
+                self._local.job = None
+
+    def _finish(self, job):
+        with self._condition:
+            self._running -= 1
+            self._completed += 1
+            if self._jobs.get(job.key) is job:
+                del self._jobs[job.key]
+
+
+def format_stats(stats):
+    """Returns a one line summary of SchedulerStats."""
+    return ('{0.queued} queued, {0.running} running, {0.completed} completed, '
+            '{0.deduplicated} deduplicated, {0.cancelled} cancelled; '
+            'wait {0.average_wait:.2f}s average, {0.max_wait:.2f}s max'.format(
+                stats))
+
+
+class ScheduledLoaderMixin(object):
+    """
+    Mixin for CompletionLoaders whose loads run through the shared
+    LoaderScheduler. Subclasses implement build_completions, which returns
+    the completions instead of setting them, or None if there are none to
+    load.
+
+    """
+
+    def get_load_key(self):
+        """Returns the key that identical loads share."""
+        return (self.__class__.__name__, self.path)
+
+    @abstractmethod
+    def build_completions(self, **kwargs):
+        pass
+
+    def load_completions(self, **kwargs):
+        try:
+            completions = get_loader_scheduler().run(
+                self.get_load_key(),
+                lambda: self.build_completions(**kwargs))
+        except concurrent.futures.CancelledError:
+            logger.debug('Load of %s cancelled', self.get_load_key())
+            return
+
+        if completions is not None:
+            self.completions = completions
+
+
+_loader_scheduler = None
+_loader_scheduler_lock = threading.Lock()
+
+
+def get_loader_scheduler():
+    """Returns the shared LoaderScheduler, creating it the first time."""
+    global _loader_scheduler
+    with _loader_scheduler_lock:
+        if _loader_scheduler is None:
+            _loader_scheduler = LoaderScheduler()
+        return _loader_scheduler
@@ -0,0 +1,138 @@
+from collections import namedtuple
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+
+from ..tools.general import LimitedSizeDict
+
+logger = logging.getLogger(__name__)
+
+
+# The relative paths that differ between two manifests, each sorted.
+# added and removed are relative to the left manifest; changed files exist
+# in both with different contents.
+ManifestDiff = namedtuple('ManifestDiff', ['added', 'removed', 'changed'])
+
+HASH_BUFFER_SIZE = 1 << 16
+
+
+class SourceManifest(object):
+    """
+    The content hashes of every file under a folder, such as a ring's
+    PgmSource or one of its applications, keyed by the path relative to the
+    folder.
+
+    Hashes are cached by path, size and modified time, so building the
+    manifest of a folder again only reads the files that changed.
+
+    """
+
+    Hashes = LimitedSizeDict(size_limit=200000)
+    HashesLock = threading.Lock()
+
+    def __init__(self, root, hashes):
+        super(SourceManifest, self).__init__()
+        self.root = root
+        self.hashes = hashes
+        self._keys = {os.path.normcase(p): p for p in hashes}
+
+    def __len__(self):
+        return len(self.hashes)
+
+    @classmethod
+    def hash_file(cls, file_name):
+        """Returns the SHA-1 of a file's contents, or None if it is gone."""
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return None
+
+        key = (os.path.normcase(file_name), stat.st_size, stat.st_mtime)
+        with cls.HashesLock:
+            try:
+                return cls.Hashes[key]
+            except KeyError:
+                pass
+
+        sha1 = hashlib.sha1()
+        try:
+            with open(file_name, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+                    sha1.update(chunk)
+        except OSError:
+            logger.exception('Failed to hash %s', file_name)
+            return None
+
+        digest = sha1.hexdigest()
+        with cls.HashesLock:
+            cls.Hashes[key] = digest
+        return digest
+
+    @classmethod
+    def build(cls, root, max_workers=8):
+        """
+        Returns the SourceManifest for a folder, hashing its files on a
+        bounded pool of worker threads.
+
+        Keyword arguments:
+        root - The folder to hash; e.g., a ring's PgmSource folder.
+        max_workers - The maximum number of files to hash at once.
+
+        """
+        paths = []
+        for folder, dirs, files in os.walk(root):
+            relative_folder = os.path.relpath(folder, root)
+            for f in files:
+                paths.append(os.path.normpath(
+                    os.path.join(relative_folder, f)))
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers) as executor:
+            digests = executor.map(
+                cls.hash_file, (os.path.join(root, p) for p in paths))
+            hashes = {p: d for p, d in zip(paths, digests) if d is not None}
+
+        logger.info('Hashed %s files in %s', len(hashes), root)
+        return cls(root, hashes)
+
+    def get_path(self, relative_path):
+        """
+        Returns the full path of a file in the manifest, matching
+        relative_path without regard to case where the file system does.
+
+        """
+        return os.path.join(
+            self.root, self._keys.get(os.path.normcase(relative_path),
+                                      relative_path))
+
+    def diff(self, other):
+        """Returns a ManifestDiff of the files that differ in other."""
+        left = self._keys
+        right = other._keys
+
+        added = sorted(right[k] for k in right.keys() - left.keys())
+        removed = sorted(left[k] for k in left.keys() - right.keys())
+        changed = sorted(
+            left[k] for k in left.keys() & right.keys() if
+            self.hashes[left[k]] != other.hashes[right[k]])
+
+        return ManifestDiff(added, removed, changed)
+
+
+def format_report(diff, left_name, right_name):
+    """Returns the text of a report of a ManifestDiff."""
+    lines = ['Source Differences: {0} -> {1}'.format(left_name, right_name),
+             'Added:  {0}     Removed:  {1}     Changed:  {2}'.format(
+                 len(diff.added), len(diff.removed), len(diff.changed)),
+             '']
+    for title, paths in (('Changed', diff.changed),
+                         ('Added in ' + right_name, diff.added),
+                         ('Removed in ' + right_name, diff.removed)):
+        if paths:
+            lines.append(title + ':')
+            lines.extend('    ' + p for p in paths)
+            lines.append('')
+
+    return '\n'.join(lines)
@@ -0,0 +1,124 @@
+import bisect
+import itertools
+import logging
+import re
+
+from ..tools.general import diff_lines
+from .translator_tree import MAGIC_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+
+class MemberMap(object):
+    """
+    Sorted map of the members (:Code, :List, :EntryPoint and :Icon) in a
+    Focus or FS file.
+
+    Header lines are found once per line and kept up to date by update,
+    which only reparses the lines that changed. The member boundaries are
+    rebuilt from the header lines the next time they are needed, so finding
+    the member at a point is a bisect.
+
+    """
+
+    HEADER_MATCHER = re.compile(r"(#[A-Za-z]+|:[A-Za-z]+) *(.+)?$")
+
+    def __init__(self, contents=''):
+        super(MemberMap, self).__init__()
+        self._lines = []
+        self._headers = []
+        self._members = None
+        self._starts = None
+        self.update(contents)
+
+    @classmethod
+    def parse_line(cls, line):
+        """Returns the translator or keyword starting a line, or None."""
+        match = cls.HEADER_MATCHER.match(line)
+        if match is None:
+            return None
+        return match.group(1)
+
+    def update(self, contents):
+        """
+        Updates the map to match contents. Returns a tuple of the first and
+        last (exclusive) rows that were reparsed, or None if nothing
+        changed.
+
+        Keyword arguments:
+        contents - The full contents of the file.
+
+        """
+        lines = contents.split('\n')
+        diff = diff_lines(self._lines, lines)
+        if diff is None:
+            return None
+
+        start, old_end, new_end = diff
+        self._headers[start:old_end] = [self.parse_line(l) for l in
+                                        lines[start:new_end]]
+        self._lines = lines
+        self._members = None
+        self._starts = None
+
+        logger.debug('Reparsed rows %s to %s', start, new_end)
+        return (start, new_end)
+
+    @property
+    def members(self):
+        """
+        Returns a list of (keyword, start, end) tuples for each member, in
+        the order they appear in the file.
+
+        """
+        if self._members is None:
+            self._build()
+        return self._members
+
+    def _build(self):
+        lines = self._lines
+        offsets = [0]
+        offsets.extend(itertools.accumulate(len(l) + 1 for l in lines))
+
+        header_rows = [i for i, h in enumerate(self._headers) if h is not None]
+        header_rows.append(len(lines))
+
+        members = []
+        for row, next_row in zip(header_rows, header_rows[1:]):
+            keyword = self._headers[row]
+            if keyword not in MAGIC_KEYWORDS:
+                continue
+
+            if next_row == len(lines):
+                end = offsets[-1] - 1
+            else:
+                # A member ends at the last non-empty line before the next
+                # translator or keyword.
+                end_row = next_row - 1
+                while (end_row > row) and (lines[end_row] == ''):
+                    end_row -= 1
+                end = offsets[end_row + 1] - 1
+
+            members.append((keyword, offsets[row], end))
+
+        self._members = members
+        self._starts = [m[1] for m in members]
+
+    def get_member_region(self, point):
+        """
+        Returns a tuple of the start and end of the member containing point,
+        or None if point is not within a member.
+
+        Keyword arguments:
+        point - The point to look up.
+
+        """
+        members = self.members
+        index = bisect.bisect_right(self._starts, point) - 1
+        if index < 0:
+            return None
+
+        _, start, end = members[index]
+        if end >= point:
+            return (start, end)
+        return None
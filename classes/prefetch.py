@@ -0,0 +1,230 @@
+from collections import namedtuple
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from ..tools.general import create_folder
+
+logger = logging.getLogger(__name__)
+
+
+# Outcomes of prefetching a file
+COPIED = 'copied'
+CURRENT = 'current'
+MODIFIED = 'modified'
+SKIPPED = 'skipped'
+MISSING = 'missing'
+FAILED = 'failed'
+
+PrefetchResult = namedtuple('PrefetchResult', ['partial_path', 'status'])
+
+# What was copied for a prefetched file: the modified time and size of the
+# server file, and the SHA-1 of its contents.
+ManifestEntry = namedtuple('ManifestEntry', ['mtime', 'size', 'checksum'])
+
+COPY_BUFFER_SIZE = 1 << 16
+
+
+class PrefetchError(Exception):
+    """Raised when a copy doesn't match the file it was copied from."""
+    pass
+
+
+def hash_contents(file_name):
+    """Returns the SHA-1 of the contents of a file."""
+    sha1 = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def copy_verified(source, dest):
+    """
+    Copies source to dest and returns a ManifestEntry for the copy.
+
+    The file is copied to a temporary file next to dest, which only replaces
+    dest once its checksum matches what was read from source and source
+    hasn't changed while it was being copied.
+
+    Raises PrefetchError if the copy can't be verified.
+
+    """
+    stat = os.stat(source)
+    temp = dest + '.prefetch'
+    sha1 = hashlib.sha1()
+    create_folder(os.path.dirname(dest))
+    try:
+        with open(source, 'rb') as src, open(temp, 'wb') as dst:
+            for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+                sha1.update(chunk)
+                dst.write(chunk)
+
+        after = os.stat(source)
+        if (after.st_mtime, after.st_size) != (stat.st_mtime, stat.st_size):
+            raise PrefetchError('%s changed while it was copied' % source)
+
+        checksum = sha1.hexdigest()
+        if hash_contents(temp) != checksum:
+            raise PrefetchError('Copy of %s is corrupt' % source)
+
+        os.replace(temp, dest)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    os.utime(dest, (stat.st_atime, stat.st_mtime))
+    return ManifestEntry(stat.st_mtime, stat.st_size, checksum)
+
+
+class PrefetchManifest(object):
+    """
+    The files prefetched into a PgmCache, keyed by partial path. Saved as
+    JSON so prefetched copies are still recognized after a restart.
+
+    """
+
+    def __init__(self, file_name):
+        super(PrefetchManifest, self).__init__()
+        self.file_name = file_name
+        self._lock = threading.Lock()
+        self._entries = dict()
+
+        try:
+            with open(file_name, 'r') as f:
+                contents = json.load(f)
+        except (OSError, ValueError):
+            contents = dict()
+
+        for partial_path, entry in contents.items():
+            try:
+                self._entries[partial_path] = ManifestEntry(*entry)
+            except TypeError:
+                logger.warning('Invalid prefetch entry for %s', partial_path)
+
+    @staticmethod
+    def key(partial_path):
+        return os.path.normcase(partial_path)
+
+    def get(self, partial_path):
+        with self._lock:
+            return self._entries.get(self.key(partial_path))
+
+    def set(self, partial_path, entry):
+        with self._lock:
+            self._entries[self.key(partial_path)] = entry
+
+    def remove(self, partial_path):
+        with self._lock:
+            self._entries.pop(self.key(partial_path), None)
+
+    def save(self):
+        with self._lock:
+            contents = {k: list(v) for k, v in self._entries.items()}
+        create_folder(os.path.dirname(self.file_name))
+        with open(self.file_name, 'w') as f:
+            json.dump(contents, f, indent=4, sort_keys=True)
+
+
+class Prefetcher(object):
+    """
+    Copies files from a ring's server path into its PgmCache ahead of time,
+    so they are opened and searched locally.
+
+    Prefetched copies are recorded in a PrefetchManifest. A copy is only
+    refreshed while it still matches the recorded checksum; once it has been
+    edited it belongs to the user and is left alone, as are files that were
+    already in the cache before they were prefetched.
+
+    """
+
+    MANIFEST_NAME = 'Focus Prefetch.json'
+
+    def __init__(self, server_path, pgm_cache_path):
+        super(Prefetcher, self).__init__()
+        self.server_path = server_path
+        self.pgm_cache_path = pgm_cache_path
+        self.manifest = PrefetchManifest(os.path.join(
+            os.path.dirname(pgm_cache_path), self.MANIFEST_NAME))
+
+    def prefetch_file(self, partial_path):
+        """
+        Copies a file into the cache unless there's a current or user owned
+        copy already, and returns a PrefetchResult.
+
+        """
+        source = os.path.join(self.server_path, partial_path)
+        dest = os.path.join(self.pgm_cache_path, partial_path)
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return PrefetchResult(partial_path, MISSING)
+
+        entry = self.manifest.get(partial_path)
+        if os.path.exists(dest):
+            if entry is None:
+                return PrefetchResult(partial_path, SKIPPED)
+            elif hash_contents(dest) != entry.checksum:
+                return PrefetchResult(partial_path, MODIFIED)
+            elif (stat.st_mtime, stat.st_size) == entry[:2]:
+                return PrefetchResult(partial_path, CURRENT)
+
+        try:
+            self.manifest.set(partial_path, copy_verified(source, dest))
+        except (OSError, PrefetchError):
+            logger.exception('Failed to prefetch %s', source)
+            return PrefetchResult(partial_path, FAILED)
+
+        logger.debug('Prefetched %s', source)
+        return PrefetchResult(partial_path, COPIED)
+
+    def prefetch(self, partial_paths, max_workers=4):
+        """
+        Prefetches files on a bounded pool of worker threads and returns a
+        list of PrefetchResults in the same order as partial_paths.
+
+        Keyword arguments:
+        partial_paths - An iterable of paths relative to the ring.
+        max_workers - The maximum number of files to copy at once.
+
+        """
+        partial_paths = list(partial_paths)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers) as executor:
+            results = list(executor.map(self.prefetch_file, partial_paths))
+
+        if any(r.status == COPIED for r in results):
+            self.manifest.save()
+        return results
+
+    def refresh(self, partial_path):
+        """
+        Copies the server file again if partial_path was prefetched, hasn't
+        been edited and the server file has changed since. Returns True if
+        the cached copy was replaced.
+
+        """
+        if self.manifest.get(partial_path) is None:
+            return False
+
+        result = self.prefetch_file(partial_path)
+        if result.status == MISSING:
+            self.manifest.remove(partial_path)
+        elif result.status == COPIED:
+            self.manifest.save()
+            return True
+        return False
+
+
+def summarize(results):
+    """Returns a one line summary of a list of PrefetchResults."""
+    counts = dict()
+    for r in results:
+        counts[r.status] = counts.get(r.status, 0) + 1
+
+    return ', '.join('{0} {1}'.format(counts[s], s) for s in
+                     (COPIED, CURRENT, MODIFIED, SKIPPED, MISSING, FAILED)
+                     if s in counts)
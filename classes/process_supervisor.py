@@ -0,0 +1,415 @@
+import collections
+import itertools
+import locale
+import logging
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+TIMED_OUT = 'timed out'
+CANCELLED = 'cancelled'
+
+# The number of lines of output kept for each job.
+OUTPUT_LINES = 200
+
+
+class ProcessJob(object):
+    """
+    A command run by the ProcessSupervisor.
+
+    The job's state is one of QUEUED, RUNNING, FINISHED (the process exited,
+    with its exit code in returncode), FAILED (the process couldn't be
+    started, with the reason in error), TIMED_OUT or CANCELLED. The last
+    OUTPUT_LINES lines of output are kept in output as (stream, line)
+    tuples.
+
+    """
+
+    def __init__(self, id_, args, name, timeout, on_output, on_exit,
+                 popen_kwargs, submitted):
+        super(ProcessJob, self).__init__()
+        self.id = id_
+        self.args = args
+        self.name = name
+        self.timeout = timeout
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self.popen_kwargs = popen_kwargs
+        self.submitted = submitted
+        self.started = None
+        self.finished = None
+        self.state = QUEUED
+        self.returncode = None
+        self.error = None
+        self.process = None
+        self.output = collections.deque(maxlen=OUTPUT_LINES)
+        self._cancel_requested = False
+        self._done = threading.Event()
+
+    def __str__(self):
+        return '#{0} {1}'.format(self.id, self.name)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def succeeded(self):
+        return (self.state == FINISHED) and (self.returncode == 0)
+
+    def wait(self, timeout=None):
+        """
+        Waits for the job to end. Returns False if it's still queued or
+        running after timeout seconds.
+
+        """
+        return self._done.wait(timeout)
+
+    def get_output(self, stream=None):
+        """Returns the kept lines of output, from one stream or both."""
+        return [l for s, l in list(self.output) if stream in (None, s)]
+
+
+class ProcessSupervisor(object):
+    """
+    Runs commands, such as magic.exe, on a bounded number of worker threads.
+    Detached commands, such as the ones a user launches, start right away on
+    their own thread instead of waiting for a worker.
+
+    Each process has its stdout and stderr read line by line as it runs,
+    can be given a timeout after which it's killed, and can be cancelled
+    while it's queued or running. Jobs that have ended are kept for a while,
+    with their exit codes, so they can be listed along with the ones still
+    running.
+
+    Keyword arguments:
+    max_workers - The maximum number of processes run at once.
+    history - The number of ended jobs kept.
+    popen - The function used to start processes.
+    clock - The function used to time jobs.
+    stop_timeout - Seconds to wait for a stopped job to end, and for the
+        output of a job whose process has exited. A process started through
+        a shell can leave a child that holds its output open.
+
+    """
+
+    def __init__(self, max_workers=4, history=20, popen=subprocess.Popen,
+                 clock=time.time, stop_timeout=10):
+        super(ProcessSupervisor, self).__init__()
+        self.max_workers = max_workers
+        self.stop_timeout = stop_timeout
+        self.popen = popen
+        self.clock = clock
+        self.encoding = locale.getpreferredencoding(False)
+        self._condition = threading.Condition()
+        self._queue = collections.deque()
+        self._running = []
+        self._ended = collections.deque(maxlen=history)
+        self._workers = []
+        self._idle = 0
+        self._ids = itertools.count(1)
+
+    def submit(self, args, name=None, timeout=None, on_output=None,
+               on_exit=None, detached=False, **popen_kwargs):
+        """
+        Queues a command and returns its ProcessJob.
+
+        Keyword arguments:
+        args - The command, as passed to subprocess.Popen.
+        name - A description of the job, shown when listing jobs.
+        timeout - Seconds after which the process is killed, or None.
+        on_output - Called with the job, the stream name ('stdout' or
+            'stderr') and the line for each line of output.
+        on_exit - Called with the job once it has ended.
+        detached - If True, the command is started right away on its own
+            thread, outside of the max_workers limit, and is still listed
+            with the other jobs.
+        popen_kwargs - Other arguments passed to subprocess.Popen, such as
+            env, shell or startupinfo.
+
+        """
+        if name is None:
+            name = args if isinstance(args, str) else ' '.join(args)
+
+        with self._condition:
+            job = ProcessJob(next(self._ids), args, name, timeout, on_output,
+                             on_exit, popen_kwargs, self.clock())
+            if detached:
+                self._start(job)
+            else:
+                self._queue.append(job)
+                if ((len(self._queue) > self._idle) and
+                        (len(self._workers) < self.max_workers)):
+                    self._start_worker()
+                self._condition.notify()
+
+        if detached:
+            thread = threading.Thread(target=self._run, args=(job,),
+                                      name='Focus Process Supervisor')
+            thread.daemon = True
+            thread.start()
+            logger.debug('Started detached job %s', job)
+        else:
+            logger.debug('Queued job %s', job)
+        return job
+
+    def run(self, args, wait_timeout=None, **kwargs):
+        """
+        Runs a command through the supervisor and returns its job. If the
+        job hasn't ended wait_timeout seconds after it was submitted,
+        including the time it spent queued, it's cancelled, and it's
+        returned still running if it doesn't stop within stop_timeout.
+
+        """
+        job = self.submit(args, **kwargs)
+        if not job.wait(wait_timeout):
+            logger.warning('Job %s did not end within %ss', job, wait_timeout)
+            self.cancel(job)
+            if not job.wait(self.stop_timeout):
+                logger.warning('Job %s did not stop within %ss', job,
+                               self.stop_timeout)
+        return job
+
+    def cancel(self, job):
+        """
+        Cancels a queued job, or stops a running one. Returns False if the
+        job had already ended.
+
+        """
+        with self._condition:
+            if job.state not in (QUEUED, RUNNING):
+                return False
+            elif job._cancel_requested:
+                return True
+
+            job._cancel_requested = True
+            if job in self._queue:
+                self._queue.remove(job)
+                self._end(job, CANCELLED)
+                cancelled = True
+            else:
+                cancelled = False
+                if job.process is not None:
+                    self._stop(job.process)
+
+        logger.debug('Cancelled job %s', job)
+        if cancelled:
+            self._notify_exit(job)
+        return True
+
+    def cancel_all(self):
+        """Cancels every queued and running job."""
+        for job in self.get_active_jobs():
+            self.cancel(job)
+
+    def get_active_jobs(self):
+        """Returns a list of the running and queued jobs."""
+        with self._condition:
+            return list(self._running) + list(self._queue)
+
+    def get_jobs(self):
+        """
+        Returns a list of the running and queued jobs, followed by the kept
+        jobs that have ended, most recent first.
+
+        """
+        with self._condition:
+            return (list(self._running) + list(self._queue) +
+                    list(reversed(self._ended)))
+
+    def _start_worker(self):
+        worker = threading.Thread(target=self._work,
+                                  name='Focus Process Supervisor')
+        worker.daemon = True
+        self._workers.append(worker)
+        worker.start()
+
+    def _next_job(self):
+        with self._condition:
+            self._idle += 1
+            while not self._queue:
+                self._condition.wait()
+            self._idle -= 1
+
+            job = self._queue.popleft()
+            self._start(job)
+            return job
+
+    def _start(self, job):
+        """Records that a job has started. Must hold the condition."""
+        job.state = RUNNING
+        job.started = self.clock()
+        self._running.append(job)
+
+    def _work(self):
+        while True:
+            self._run(self._next_job())
+
+    def _run(self, job):
+        try:
+            self._run_job(job)
+        except Exception:
+            logger.exception('Job %s failed', job)
+            with self._condition:
+                if job.state == RUNNING:
+                    self._end(job, FAILED)
+        self._notify_exit(job)
+
+    def _run_job(self, job):
+        try:
+            process = self.popen(job.args, stdin=subprocess.DEVNULL,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE, **job.popen_kwargs)
+        except (OSError, ValueError) as e:
+            logger.warning('Could not start job %s: %s', job, e)
+            with self._condition:
+                job.error = str(e)
+                self._end(job, FAILED)
+            return
+
+        with self._condition:
+            job.process = process
+            if job._cancel_requested:
+                self._stop(process)
+
+        readers = [threading.Thread(target=self._read,
+                                    args=(job, process.stdout, 'stdout')),
+                   threading.Thread(target=self._read,
+                                    args=(job, process.stderr, 'stderr'))]
+        for reader in readers:
+            reader.daemon = True
+            reader.start()
+
+        timed_out = False
+        try:
+            returncode = process.wait(job.timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning('Job %s timed out after %ss', job, job.timeout)
+            timed_out = True
+            self._stop(process)
+            returncode = process.wait()
+
+        # The output ends when the process exits, unless a child it started
+        # still holds the pipes; the job ends anyway and the readers are
+        # left to finish on their own.
+        deadline = time.monotonic() + self.stop_timeout
+        for reader in readers:
+            reader.join(max(deadline - time.monotonic(), 0))
+            if reader.is_alive():
+                logger.warning('Output of job %s still open %ss after it '
+                               'exited', job, self.stop_timeout)
+                break
+
+        with self._condition:
+            job.returncode = returncode
+            if job._cancel_requested:
+                self._end(job, CANCELLED)
+            elif timed_out:
+                self._end(job, TIMED_OUT)
+            else:
+                self._end(job, FINISHED)
+
+    def _read(self, job, stream, stream_name):
+        try:
+            for line in iter(stream.readline, b''):
+                line = line.decode(self.encoding, 'replace').rstrip('\r\n')
+                job.output.append((stream_name, line))
+                if job.on_output is not None:
+                    try:
+                        job.on_output(job, stream_name, line)
+                    except Exception:
+                        logger.exception('Output handler for %s failed', job)
+        finally:
+            stream.close()
+
+    @staticmethod
+    def _stop(process):
+        try:
+            process.kill()
+        except OSError:
+            # The process has already exited
+            pass
+
+    def _end(self, job, state):
+        """Records that a job has ended. Must hold the condition."""
+        job.state = state
+        job.finished = self.clock()
+        job.process = None
+        try:
+            self._running.remove(job)
+        except ValueError:
+            pass
+        self._ended.append(job)
+
+    def _notify_exit(self, job):
+        logger.debug('Job %s %s, exit code %s', job, job.state,
+                     job.returncode)
+        try:
+            if job.on_exit is not None:
+                job.on_exit(job)
+        except Exception:
+            logger.exception('Exit handler for %s failed', job)
+        finally:
+            job._done.set()
+
+
+def log_job_exit(job):
+    """An on_exit handler that logs jobs that didn't exit cleanly."""
+    if job.state != FINISHED:
+        logger.warning('Job %s %s', job, job.state)
+    elif job.returncode != 0:
+        logger.warning('Job %s exited with code %s', job, job.returncode)
+
+
+def format_job(job, now, output_lines=0):
+    """
+    Returns a description of a job, with up to output_lines of its most
+    recent output.
+
+    """
+    if job.started is None:
+        elapsed = now - job.submitted
+    elif job.finished is None:
+        elapsed = now - job.started
+    else:
+        elapsed = job.finished - job.started
+
+    state = job.state
+    if job.returncode is not None:
+        state += ' (exit code {0})'.format(job.returncode)
+    elif job.error is not None:
+        state += ' ({0})'.format(job.error)
+
+    lines = ['#{0} {1}, {2:.1f}s: {3}'.format(job.id, state, elapsed,
+                                              job.name)]
+    if output_lines:
+        output = list(job.output)[-output_lines:]
+        lines.extend('    ' + l for s, l in output)
+    return '\n'.join(lines)
+
+
+def format_jobs(jobs, now, output_lines=5):
+    """Returns a description of a list of jobs, for the jobs panel."""
+    if not jobs:
+        return 'No jobs'
+    return '\n\n'.join(format_job(j, now, output_lines) for j in jobs)
+
+
+_process_supervisor = None
+_process_supervisor_lock = threading.Lock()
+
+
+def get_process_supervisor():
+    """Returns the shared ProcessSupervisor, creating it the first time."""
+    global _process_supervisor
+    with _process_supervisor_lock:
+        if _process_supervisor is None:
+            _process_supervisor = ProcessSupervisor()
+        return _process_supervisor
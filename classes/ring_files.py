@@ -7,8 +7,11 @@ logger = logging.getLogger(__name__)
 
 from .metaclasses import MiniPluginMeta
 from .compatibility import FSCompatibility, FocusCompatibility
+from .file_watcher import ADDED, REMOVED, register_with_file_watcher
+from .include_closure import IncludeClosures
 from .rings import get_ring, get_backup_ring
-from ..tools.general import read_file, read_file_iter
+from ..tools.general import FileBuffer, list_directory
+from ..tools.settings import get_process_timeout
 
 
 def get_ring_file(file_name):
@@ -83,6 +86,24 @@ class RingFile(object, metaclass=MiniPluginMeta):
             logger.debug("Ring file: %s", f)
             return f
 
+    @classmethod
+    def files_changed(cls, events):
+        """
+        Forgets files the file watcher reports as removed. Adding or
+        removing a file can change where includes are found, so the include
+        closures that look for includes in its folder are computed again.
+
+        """
+        folders = set()
+        for e in events:
+            if e.kind == REMOVED:
+                cls.Files.pop(e.path.lower(), None)
+            if e.kind in (ADDED, REMOVED):
+                folders.add(os.path.dirname(e.path))
+
+        if folders:
+            IncludeFileClosures.invalidate_folders(folders)
+
     @classmethod
     def valid_file(cls, file_name):
         return os.path.splitext(file_name)[1][1:].lower() in cls.extensions()
@@ -115,6 +136,10 @@ class RingFile(object, metaclass=MiniPluginMeta):
         else:
             return self.ring
 
+    def get_job_name(self, action):
+        """Returns the name shown in the jobs panel for an action."""
+        return '{0} {1}'.format(action, os.path.basename(self.file_name))
+
     def is_translatable(self):
         if not self.get_ring():
             return False
@@ -148,15 +173,35 @@ class RingFile(object, metaclass=MiniPluginMeta):
     def is_includable(self):
         return False
 
+    def get_file_buffer(self):
+        """Returns the FileBuffer holding the contents of the file."""
+        return FileBuffer.get_buffer(self.file_name)
+
     def get_file_contents(self, split_lines=True, omit_empty_lines=True):
-        lines = read_file(self.file_name, omit_empty_lines)
+        lines = list(self.get_lines_iterator(omit_empty_lines))
         if not split_lines:
             lines = '\n'.join(lines)
         return lines
 
     def get_contents(self):
-        return self.get_file_contents(split_lines=False,
-                                      omit_empty_lines=False)
+        return self.get_file_buffer().contents
+
+    def get_source_tree(self):
+        """
+        Returns the SourceTree for the file. The contents are only hashed
+        again if the file has changed since it was last used.
+
+        """
+        buffer = self.get_file_buffer()
+        try:
+            if self._source_tree_buffer is buffer:
+                return self._source_tree
+        except AttributeError:
+            pass
+
+        self._source_tree = super(RingFile, self).get_source_tree()
+        self._source_tree_buffer = buffer
+        return self._source_tree
 
     def get_line(self, point):
         """
@@ -175,46 +220,24 @@ class RingFile(object, metaclass=MiniPluginMeta):
         else:
             return (None, None)
 
-        line_start = line_end = 0
-        return_start = return_end = 0
-        lines = []
-        capture = False
-        for l in self.get_lines_iterator():
-            line_start = line_end
-            line_end = line_start + len(l)
-
-            if (line_start <= start) and (line_end >= start):
-                capture = True
-                return_start = line_start
-            elif not capture:
-                continue
-
-            if l[-1] == '\n':
-                l = l[:-1]
-                line_end -= 1
-
-            if capture:
-                lines.append(l)
-            if line_end >= end:
-                return_end = line_end
-                break
-
-            line_end += 1
-        else:
-            if capture:
-                return_end = line_end - 1
-
-        if capture:
-            return ((return_start, return_end), '\n'.join(lines))
-        else:
+        buffer = self.get_file_buffer()
+        start_row = buffer.get_row(start)
+        if start_row is None:
             return (None, None)
 
+        end_row = buffer.get_row(end)
+        if end_row is None:
+            end_row = buffer.line_count - 1
+
+        span = (buffer.get_line_span(start_row)[0],
+                buffer.get_line_span(end_row)[1])
+        return (span, buffer.contents[span[0]:span[1]])
+
     def get_lines_iterator(self, skip_blanks=False):
         """
         Creates an iterator that returns the lines of a file or view.
         """
-        for line in read_file_iter(self.file_name, skip_blanks):
-            yield line
+        return self.get_file_buffer().iter_lines(skip_blanks=skip_blanks)
 
     def get_lines_from_iterator(self, point, reverse=False, skip_blanks=False):
         """
@@ -228,24 +251,11 @@ class RingFile(object, metaclass=MiniPluginMeta):
         skip_blanks - If true, do not return empty lines.
 
         """
-        if reverse:
-            prev_lines = []
-        line_start = line_end = 0
-
-        for line in self.get_lines_iterator(skip_blanks):
-            if reverse:
-                prev_lines.append(line)
-            else:
-                yield line
-
-            line_start = line_end
-            line_end = line_start + len(line)
-            if (line_start <= point) and (line_end >= point):
-                break
-
-        if reverse:
-            for line in reversed(prev_lines):
-                yield line
+        buffer = self.get_file_buffer()
+        row = buffer.get_row(point)
+        if row is None:
+            return iter(())
+        return buffer.iter_lines(row, reverse, skip_blanks)
 
 
 class FocusFile(RingFile, FocusCompatibility):
@@ -299,9 +309,14 @@ class FocusFile(RingFile, FocusCompatibility):
 
         # logger.info('Using %s for Translate command', partial_path)
 
-        return ring.run_file(partial_path=partial_path,
-                             parameters=self.file_name,
-                             separate_process=separate_process)
+        result = ring.run_file(partial_path=partial_path,
+                               parameters=self.file_name,
+                               separate_process=separate_process,
+                               name=self.get_job_name('Translate'),
+                               timeout=get_process_timeout() or None)
+        if not separate_process:
+            ring.refresh_object_index(self.file_name)
+        return result
 
         # else:
         #     partial_path = os.path.join(
@@ -391,7 +406,9 @@ class FocusFile(RingFile, FocusCompatibility):
         logger.info('Formatting file: %s', self.file_name)
 
         return ring.run_file(partial_path=partial_path,
-                             parameters=self.file_name)
+                             parameters=self.file_name,
+                             name=self.get_job_name('Format'),
+                             timeout=get_process_timeout() or None)
 
     def is_includable(self):
         l = self.file_name.lower()
@@ -410,10 +427,37 @@ class FocusFile(RingFile, FocusCompatibility):
 
         return False
 
-    def get_include_files(self, current_file=True):
-        """Returns a list of the include files in the file"""
+    def parse_include_files(self):
+        """
+        Returns a list of the files in the file's #Include translator that
+        exist in the ring. Use get_include_files, which caches this.
+
+        """
         logger.debug('Getting include files for ' + self.file_name)
 
+        partial_paths = self.parse_include_partial_paths()
+        if not partial_paths:
+            return []
+
+        resolved = self.ring.resolve_many(partial_paths)
+        return [resolved[p] for p in partial_paths if resolved[p] is not None]
+
+    def parse_include_folders(self):
+        """
+        Returns a set of the folders the files in the file's #Include
+        translator are looked for in.
+
+        """
+        return set(os.path.dirname(path) for p in
+                   self.parse_include_partial_paths() for k, path in
+                   self.ring.candidate_paths(p))
+
+    def parse_include_partial_paths(self):
+        """
+        Returns a list of the paths, relative to the ring, of the files in
+        the file's #Include translator.
+
+        """
         if self.ring is None:
             return []
 
@@ -423,7 +467,7 @@ class FocusFile(RingFile, FocusCompatibility):
         if not include_source:
             return []
 
-        files = []
+        partial_paths = []
 
         for m in FocusFile.INCLUDE_CONTENT_MATCHER.finditer(include_source):
             if m.group('source'):
@@ -434,37 +478,61 @@ class FocusFile(RingFile, FocusCompatibility):
                 file_ = m.group('filename')
 
             if folder and file_:
-                include = self.ring.get_file_path(
-                    os.path.join('PgmSource', folder, file_))
-                if include is not None:
-                    files.append(include)
-                    yield include
-                folder = file_ = include = None
+                partial_paths.append(os.path.join('PgmSource', folder, file_))
+                folder = file_ = None
+
+        return partial_paths
+
+    def get_include_files(self, current_file=True):
+        """
+        Returns a list of the include files in the file.
+
+        Keyword arguments:
+        current_file - If False, the files included by the include files are
+            returned too, in the order they are searched.
+
+        """
+        if current_file:
+            return list(IncludeFileClosures.get_direct_includes(
+                self.file_name))
+        return list(IncludeFileClosures.get_closure(self.file_name).files)
+
+    def get_external_pageset_files(self, current_file=True):
+        """
+        Returns a list of the External PageSets in a file.
+
+        Keyword arguments:
+        current_file - If False, the External PageSets of the files it
+            includes are returned too.
 
+        """
+        pagesets = list(self.parse_external_pageset_files())
         if not current_file:
-            for f in files:
+            seen = set(pagesets)
+            for f in self.get_include_files(current_file=False):
                 inc_file = RingFile.get_ring_file(f)
                 if inc_file is None:
                     continue
 
-                for i in inc_file.get_include_files(current_file):
-                    if i not in files:
-                        files.append(i)
-                        yield i
+                for p in inc_file.parse_external_pageset_files():
+                    if p not in seen:
+                        seen.add(p)
+                        pagesets.append(p)
 
-        return
-
-    def get_external_pageset_files(self, current_file=True):
-        """Returns a list of the External PageSets in a file."""
+        return pagesets
 
+    def parse_external_pageset_files(self):
+        """Yields the External PageSets in the file's ScreenPages."""
         if self.ring is None:
-            return []
+            return
 
         screenpage_source = '\n'.join(
             [s[1] for s in self.get_translator_sections('ScreenPage')])
 
         if not screenpage_source:
-            return []
+            return
+
+        partial_paths = []
 
         for m in FocusFile.PAGESET_CONTENT_MATCHER.finditer(
                 screenpage_source):
@@ -476,20 +544,39 @@ class FocusFile(RingFile, FocusCompatibility):
                 source = m.group('source') + '.focus'
 
             if codebase and source:
-                pageset = self.ring.get_file_path(
+                partial_paths.append(
                     os.path.join('PgmSource', codebase, source))
-                if pageset is not None:
-                    yield pageset
-                codebase = source = pageset = None
+                codebase = source = None
+
+        resolved = self.ring.resolve_many(partial_paths)
+        for partial_path in partial_paths:
+            pageset = resolved[partial_path]
+            if pageset is not None:
+                yield pageset
 
-        if not current_file:
-            for f in self.get_include_files(current_file=False):
-                inc_file = RingFile.get_ring_file(f)
-                if inc_file is None:
-                    continue
 
-                for i in inc_file.get_include_files(False):
-                    yield i
+def parse_include_files(file_name):
+    """Returns the include files of a file, or [] if it isn't Focus."""
+    ring_file = get_ring_file(file_name)
+    if not isinstance(ring_file, FocusFile):
+        return []
+    return ring_file.parse_include_files()
+
+
+def parse_include_folders(file_name):
+    """
+    Returns the folders a file's includes are looked for in, or [] if it
+    isn't Focus.
+
+    """
+    ring_file = get_ring_file(file_name)
+    if not isinstance(ring_file, FocusFile):
+        return []
+    return ring_file.parse_include_folders()
+
+
+IncludeFileClosures = IncludeClosures(parse_include_files,
+                                      get_folders=parse_include_folders)
 
 
 class FSFile(RingFile, FSCompatibility):
@@ -520,7 +607,9 @@ class FSFile(RingFile, FSCompatibility):
 
         logger.info('Translating file: %s', self.file_name)
 
-        return ring.run_file(full_path=full_path, parameters=self.file_name)
+        return ring.run_file(full_path=full_path, parameters=self.file_name,
+                             name=self.get_job_name('Translate'),
+                             timeout=get_process_timeout() or None)
 
     def is_runnable(self):
         if not super(FSFile, self).is_runnable():
@@ -537,14 +626,17 @@ class FSFile(RingFile, FSCompatibility):
             return False
 
         path = self.get_compiled_path()
-        return ring.run_file(full_path=path)
+        return ring.run_file(full_path=path, detached=True)
 
     def get_compiled_path(self):
-        leading = os.path.splitext(self.file_name)[0]
+        # The folder's cached listing is checked instead of statting each
+        # possible compiled file
+        folder, name = os.path.split(os.path.splitext(self.file_name)[0])
+        names = list_directory(folder)
         for ext in FSFile.COMPILED_EXTENSIONS:
-            result = leading + '.' + ext
-            if os.path.isfile(result):
-                return result
+            result = name + '.' + ext
+            if os.path.normcase(result) in names:
+                return os.path.join(folder, result)
 
         return None
 
@@ -585,7 +677,9 @@ class XMLFile(RingFile):
         logger.info('Translating file: %s', self.file_name)
 
         return ring.run_file(partial_path=partial_path,
-                             parameters=self.file_name)
+                             parameters=self.file_name,
+                             name=self.get_job_name('Translate'),
+                             timeout=get_process_timeout() or None)
 
 
 class InvalidFileFormat(Exception):
@@ -619,3 +713,7 @@ class InvalidFileFormat(Exception):
 
     def __str__(self):
         return self.description
+
+
+register_with_file_watcher(
+    'ring_files', lambda w: w.subscribe('ring_files', RingFile.files_changed))
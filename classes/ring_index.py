@@ -0,0 +1,407 @@
+import functools
+import logging
+import os
+import re
+import threading
+
+from .analysis import FolderResolver, get_includes
+from .completion_store import CompactCompletions
+from .include_closure import IncludeClosures
+from .source_tree import get_source_tree
+from ..tools.general import LimitedSizeDict, get_file_version, string_search
+from ..tools.mls import get_alias_lookup, read_records
+
+logger = logging.getLogger(__name__)
+
+
+# The parsing below doesn't need Sublime Text, so the same code indexes
+# files in the analysis server and backs FocusCompatibility in the plugin.
+
+Object_Load_Reg_Exes = {}
+ALL_OBJECT_KEYWORDS = ('Object', 'LongLock', 'Mutex', 'File', 'Record', 'Key',
+                       'Field', 'Index', 'IndexKey')
+
+
+def get_object_load_reg_ex(type_):
+    def format_reg_ex(*args):
+        keys = '|'.join(args)
+        return (r"^[ \t]*:(?P<keyword>{keyword})[ \t]+"
+                r"(?P<entity>.+?)[ \t]*$").format(keyword=keys)
+
+    try:
+        return Object_Load_Reg_Exes[type_]
+    except KeyError:
+        pass
+
+    if type_ == 'All':
+        keys = ALL_OBJECT_KEYWORDS
+    else:
+        keys = ['Object']
+
+        if type_ == 'IndexKey':
+            keys.append('Index')
+
+        if type_ == 'Element':
+            keys.append('Key')
+            keys.append('Field')
+        else:
+            keys.append(type_)
+
+    reg_ex = re.compile(format_reg_ex(*keys), re.MULTILINE)
+    Object_Load_Reg_Exes[type_] = reg_ex
+    return reg_ex
+
+
+def iter_translator_sections(contents, translator, include_end_space=True):
+    """
+    Yields a tuple of the span and contents of each section of a translator.
+
+    Keyword arguments:
+    contents - The contents of the file.
+    translator - The name of the translator, with or without the leading #.
+    include_end_space - If True, the blank lines at the end of a section are
+        part of it.
+
+    """
+    if translator.startswith('#'):
+        translator = translator[1:]
+
+    contents = contents + "\n#END"
+
+    regex = r"^((//[ -=+*_]+\n)?#{translator}\n.+?".format(
+        translator=translator)
+    if include_end_space:
+        regex += r")(//[ -=+*_]+\n)?^#[A-Za-z]+$"
+    else:
+        regex += r"\n)\n*(//[ -=+*_]+\n)?^#[A-Za-z]+$"
+
+    for m in re.finditer(regex, contents, re.MULTILINE | re.DOTALL):
+        yield (m.span(1), m.group(1))
+
+
+def get_defined_objects(contents, type_='All', for_completions=False):
+    """
+    Returns a dict mapping each Datadef keyword (Object, Record, Field...) to
+    the set of names defined for it in the #DataDef sections of contents.
+    Keys and Fields are also listed under Element.
+
+    Keyword arguments:
+    contents - The contents of the file.
+    type_ - The keyword to load, or All.
+    for_completions - If True, each name is a 1-tuple.
+
+    """
+    object_dict = {}
+
+    def add_to_dict(keyword, value):
+        try:
+            object_dict[keyword].add(value)
+        except KeyError:
+            object_dict[keyword] = set()
+            object_dict[keyword].add(value)
+
+        if keyword in ('Key', 'Field'):
+            add_to_dict('Element', value)
+
+    compiled_reg_ex = get_object_load_reg_ex(type_)
+    object_ = ''
+    index = ''
+
+    for t_span, t_string in iter_translator_sections(contents, 'DataDef'):
+        for m in compiled_reg_ex.finditer(t_string):
+            keyword = m.group('keyword')
+            value = m.group('entity')
+
+            if keyword == 'Object':
+                object_ = value
+            elif keyword == 'IndexKey':
+                value = index + '.' + value
+            else:
+                value = object_ + '.' + value
+                if keyword == 'Index':
+                    index = value
+
+            if for_completions:
+                value = (value,)
+
+            add_to_dict(keyword, value)
+
+    return object_dict
+
+
+def find_member(contents, name):
+    """Returns the span of the name of the :Code or :List called name."""
+    reg_ex = r"^ *:(Code|List) +({name}) *$".format(name=re.escape(name))
+    return string_search(contents, reg_ex, match_group=2,
+                         flags=re.MULTILINE).span
+
+
+def find_alias_definition(contents, alias):
+    """
+    Returns the span of the definition of an alias, or of the subroutine
+    that defines it for an :EntryPoint alias.
+
+    Keyword arguments:
+    contents - The contents of the file.
+    alias - The name of the alias, without the @@ and arguments.
+
+    """
+    reg_ex = (r"^([ \t]*:|:EntryPoint[ \t]+(?P<subroutine>\S+)\s+)"
+              r"Alias[ \t]+(?P<alias>{name}) *$").format(name=re.escape(alias))
+
+    match = re.search(reg_ex, contents, re.MULTILINE)
+    if match is None:
+        return None
+
+    subroutine = match.group("subroutine")
+    if (subroutine is None) or (subroutine == ''):
+        return match.span('alias')
+    else:
+        return find_member(contents, subroutine)
+
+
+ALIAS_DEFINITION_MATCHER = re.compile(
+    r"^([ \t]*:|:EntryPoint[ \t]+(?P<subroutine>\S+)\s+)"
+    r"Alias[ \t]+(?P<alias>\S+) *$", re.MULTILINE)
+
+
+def read_contents(file_name):
+    with open(file_name, 'r') as f:
+        return f.read()
+
+
+def never_cancelled():
+    pass
+
+
+class RingIndex(object):
+    """
+    Indexes of the files in rings: the aliases in alias lists, the objects
+    defined by Datadef files, the Include files in PgmSource folders, and
+    the include graph and members of each file.
+
+    Each file is parsed once per version and the results are kept, so a
+    query only reads the files that changed since the last one. The methods
+    that read many files take a check_cancelled function, which is called
+    between files and raises to stop a query that is no longer needed.
+
+    """
+
+    def __init__(self):
+        super(RingIndex, self).__init__()
+        self._lock = threading.Lock()
+        self._files = LimitedSizeDict(size_limit=10000)
+        self._closures = dict()
+
+    def _get_file(self, kind, file_name, parse):
+        """
+        Returns parse(file_name), parsing the file again only if it has
+        changed since it was last parsed for kind.
+
+        """
+        key = (kind, os.path.normcase(file_name))
+        version = get_file_version(file_name)
+        with self._lock:
+            try:
+                cached_version, value = self._files[key]
+            except KeyError:
+                pass
+            else:
+                if cached_version == version:
+                    return value
+
+        value = parse(file_name)
+        with self._lock:
+            self._files[key] = (version, value)
+        return value
+
+    def get_aliases(self, alias_list_path):
+        """
+        Returns a dict mapping each alias in an alias list to a tuple of the
+        folder and file of the subroutine that defines it.
+
+        """
+        return self._get_file(
+            'aliases', alias_list_path,
+            lambda f: get_alias_lookup(read_records(f)))
+
+    def get_objects(self, datadefs_path, check_cancelled=never_cancelled):
+        """
+        Returns a dict mapping each Datadef keyword to a CompactCompletions of
+        the names defined for it by the Datadef files in a folder. The dict
+        is empty if there are none.
+
+        The names of each file are packed as soon as it is parsed and the
+        packed files are merged, so the names of a whole ring are never held
+        as separate strings.
+
+        """
+        if not os.path.isdir(datadefs_path):
+            return {}
+
+        def parse(file_name):
+            objects = get_defined_objects(read_contents(file_name))
+            return {k: CompactCompletions(v) for k, v in objects.items()}
+
+        sets = dict()
+        for f in os.listdir(datadefs_path):
+            if not f.lower().endswith('.focus'):
+                continue
+
+            check_cancelled()
+            objects = self._get_file('objects', os.path.join(datadefs_path, f),
+                                     parse)
+            for key, value in objects.items():
+                sets.setdefault(key, []).append(value)
+        return {k: CompactCompletions.merge(v) for k, v in sets.items()}
+
+    def get_include_files(self, pgmsource_path,
+                          check_cancelled=never_cancelled):
+        """
+        Returns a tuple of the names of the Include and Datadef files, and of
+        the External PageSet files, in a PgmSource folder and its
+        subfolders.
+
+        """
+        include_files = []
+        external_pagesets = []
+        for path, dirs, files in os.walk(pgmsource_path):
+            check_cancelled()
+            for f in files:
+                f_lower = f.lower()
+                if (f_lower.endswith('.i.focus') or
+                        f_lower.endswith('.d.focus')):
+                    include_files.append(f)
+                elif f_lower.endswith('.e.focus'):
+                    external_pagesets.append(f)
+        return (include_files, external_pagesets)
+
+    def get_include_closure(self, file_name, search_paths):
+        """
+        Returns the Closure of the files a file includes, with includes
+        resolved against search_paths.
+
+        """
+        key = tuple(search_paths)
+        with self._lock:
+            try:
+                closures = self._closures[key]
+            except KeyError:
+                closures = self._closures[key] = IncludeClosures(
+                    functools.partial(self._get_direct_includes,
+                                      FolderResolver(*search_paths)))
+        return closures.get_closure(file_name)
+
+    def _get_direct_includes(self, resolve_many, file_name):
+        partial_paths = [p for p, span in get_includes(
+            get_source_tree(read_contents(file_name)))]
+        resolved = resolve_many(partial_paths)
+        return [resolved[p] for p in partial_paths if resolved[p] is not None]
+
+    def get_members(self, file_name):
+        """
+        Returns a dict mapping the name of each :Code and :List in a file to
+        the span of the first one with that name.
+
+        """
+        def parse(file_name):
+            contents = read_contents(file_name)
+            members = dict()
+            for member in get_source_tree(contents).members:
+                if ((member.keyword in (':Code', ':List')) and
+                        (member.name not in members)):
+                    start = contents.find(
+                        member.name, member.header[0] + len(member.keyword))
+                    members[member.name] = (start, start + len(member.name))
+            return members
+
+        return self._get_file('members', file_name, parse)
+
+    def find_member(self, file_name, name, search_paths,
+                    check_cancelled=never_cancelled):
+        """
+        Returns a tuple of the file and span of the first :Code or :List
+        called name in the files file_name includes, in the order they are
+        searched, or None.
+
+        """
+        for f in self.get_include_closure(file_name, search_paths).files:
+            check_cancelled()
+            try:
+                return (f, self.get_members(f)[name])
+            except KeyError:
+                pass
+        return None
+
+    def get_alias_definitions(self, file_name):
+        """
+        Returns a dict mapping each alias defined in a file to the span of
+        its definition, or of the subroutine that defines it for an
+        :EntryPoint alias.
+
+        """
+        def parse(file_name):
+            contents = read_contents(file_name)
+            definitions = dict()
+            for match in ALIAS_DEFINITION_MATCHER.finditer(contents):
+                alias = match.group('alias')
+                if alias in definitions:
+                    continue
+
+                subroutine = match.group('subroutine')
+                if subroutine:
+                    definitions[alias] = find_member(contents, subroutine)
+                else:
+                    definitions[alias] = match.span('alias')
+            return definitions
+
+        return self._get_file('alias definitions', file_name, parse)
+
+    def find_alias(self, alias, file_name, alias_list_path, search_paths,
+                   check_cancelled=never_cancelled):
+        """
+        Returns a tuple of the file and span of the definition of an alias,
+        or None. An alias in the alias list is looked for in the file the
+        list names; any other alias is looked for in the files file_name
+        includes.
+
+        Keyword arguments:
+        alias - The name of the alias, without the @@ and arguments.
+        file_name - The file the alias is used in.
+        alias_list_path - The ring's alias list, or None.
+        search_paths - The folders partial paths are resolved against.
+
+        """
+        entry = None
+        if alias_list_path is not None:
+            entry = self.get_aliases(alias_list_path).get(alias)
+
+        if entry is not None:
+            folder, file_ = entry
+            partial_path = os.path.join('PgmSource', folder, file_ + '.focus')
+            files = [FolderResolver(*search_paths)([partial_path])[
+                partial_path]]
+        else:
+            files = self.get_include_closure(file_name, search_paths).files
+
+        for f in files:
+            if f is None:
+                continue
+
+            check_cancelled()
+            span = self.get_alias_definitions(f).get(alias)
+            if span is not None:
+                return (f, span)
+        return None
+
+_ring_index = None
+_ring_index_lock = threading.Lock()
+
+
+def get_ring_index():
+    """Returns the RingIndex of this process, creating it the first time."""
+    global _ring_index
+    with _ring_index_lock:
+        if _ring_index is None:
+            _ring_index = RingIndex()
+        return _ring_index
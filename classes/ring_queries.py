@@ -0,0 +1,175 @@
+"""
+Queries about rings for the completion loaders and DocLinks. They are
+answered by the analysis server when analysis_server_python is set, so the
+indexes stay warm across plugin reloads and the work is done outside of the
+plugin host, and by a RingIndex in the plugin host otherwise.
+
+"""
+
+import concurrent.futures
+import logging
+import threading
+
+import sublime
+
+from .analysis_server import get_analysis_client, stop_analysis_client
+from .completion_store import CompactCompletions
+from .loader_scheduler import get_loader_scheduler
+from .ring_index import get_ring_index
+from ..tools.settings import get_analysis_server_python
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds to wait for the analysis server
+SERVER_TIMEOUT = 30
+
+# Seconds between checks that a request is still needed
+POLL_INTERVAL = 0.25
+
+# The pending server request for each key
+PendingRequests = dict()
+_pending_lock = threading.Lock()
+
+
+def check_cancelled():
+    """
+    Raises concurrent.futures.CancelledError if the completion load running
+    on this thread is no longer needed by any view.
+
+    """
+    if get_loader_scheduler().load_cancelled():
+        raise concurrent.futures.CancelledError()
+
+
+def query(method, local, key=None, **params):
+    """
+    Returns the result of a request to the analysis server, or of local if
+    the server isn't used.
+
+    The request is cancelled if it takes longer than SERVER_TIMEOUT, if the
+    completion load it was made for is no longer needed, or if another
+    request is made with the same key.
+
+    Keyword arguments:
+    method - The server method.
+    local - Called with no arguments to answer the query in the plugin host.
+    key - If specified, a request still pending for the same key is
+        cancelled first; e.g., an earlier lookup for the same view.
+    params - The parameters of the request.
+
+    Raises AnalysisServerError if the server fails, and
+    concurrent.futures.CancelledError or concurrent.futures.TimeoutError if
+    the request is cancelled.
+
+    """
+    python = get_analysis_server_python()
+    if not python:
+        # The server isn't needed once analysis_server_python is cleared
+        stop_analysis_client()
+        return local()
+
+    client = get_analysis_client(python, sublime.packages_path())
+    future = client.request(method, **params)
+    if key is not None:
+        with _pending_lock:
+            previous = PendingRequests.get(key)
+            PendingRequests[key] = future
+        if previous is not None:
+            client.cancel(previous)
+
+    try:
+        for i in range(int(SERVER_TIMEOUT / POLL_INTERVAL)):
+            try:
+                return future.result(POLL_INTERVAL)
+            except concurrent.futures.TimeoutError:
+                check_cancelled()
+
+        logger.warning('Analysis server timed out on %s', method)
+        return future.result(0)
+    except (concurrent.futures.CancelledError,
+            concurrent.futures.TimeoutError):
+        client.cancel(future)
+        raise
+    finally:
+        if key is not None:
+            with _pending_lock:
+                if PendingRequests.get(key) is future:
+                    del PendingRequests[key]
+
+
+def get_aliases(ring):
+    """Returns the names of the aliases in the ring's alias list."""
+    return query('aliases',
+                 lambda: list(get_ring_index().get_aliases(
+                     ring.alias_list_path)),
+                 aliasListPath=ring.alias_list_path)
+
+
+def get_objects(ring):
+    """
+    Returns a dict mapping each Datadef keyword to a CompactCompletions of
+    the names defined for it by the ring's Datadef files.
+
+    """
+    objects = query('objects',
+                    lambda: get_ring_index().get_objects(
+                        ring.datadefs_path, check_cancelled),
+                    datadefsPath=ring.datadefs_path)
+    return {k: v if isinstance(v, CompactCompletions) else
+            CompactCompletions.from_state(v) for k, v in objects.items()}
+
+
+def get_include_files(ring):
+    """
+    Returns a tuple of the names of the Include and Datadef files, and of
+    the External PageSet files, in the ring's PgmSource folder.
+
+    """
+    include_files, external_pagesets = query(
+        'includeFiles',
+        lambda: get_ring_index().get_include_files(ring.pgmsource_path,
+                                                   check_cancelled),
+        pgmsourcePath=ring.pgmsource_path)
+    return (include_files, external_pagesets)
+
+
+def find_member(ring_file, name, key=None):
+    """
+    Returns a tuple of the file and span of the first :Code or :List called
+    name in the files ring_file includes, or None.
+
+    """
+    search_paths = ring_file.ring.get_search_paths()
+    result = query('findMember',
+                   lambda: get_ring_index().find_member(
+                       ring_file.file_name, name, search_paths),
+                   key=key, fileName=ring_file.file_name, name=name,
+                   searchPaths=search_paths)
+    if result is None:
+        return None
+    return (result[0], tuple(result[1]))
+
+
+def find_alias(ring_file, alias, key=None):
+    """
+    Returns a tuple of the file and span of the definition of an alias used
+    in ring_file, from the ring's alias list or the files ring_file
+    includes, or None.
+
+    Keyword arguments:
+    alias - The name of the alias, without the @@ and arguments.
+
+    """
+    ring = ring_file.ring
+    search_paths = ring.get_search_paths()
+    result = query('findAlias',
+                   lambda: get_ring_index().find_alias(
+                       alias, ring_file.file_name, ring.alias_list_path,
+                       search_paths),
+                   key=key, alias=alias, fileName=ring_file.file_name,
+                   aliasListPath=ring.alias_list_path,
+                   searchPaths=search_paths)
+    if result is None:
+        return None
+    return (result[0], tuple(result[1]))
@@ -2,30 +2,43 @@ from abc import abstractmethod
 import itertools
 import logging
 import os
-import re
 import shutil
-import subprocess
 
 logger = logging.getLogger(__name__)
 
+from .file_watcher import (
+    LOCAL_INTERVAL,
+    SERVER_INTERVAL,
+    register_with_file_watcher
+)
 from .metaclasses import MiniPluginMeta
+from .prefetch import Prefetcher
+from .process_supervisor import (
+    FINISHED,
+    get_process_supervisor,
+    log_job_exit
+)
+from .tool_index import ToolIndex
 from ..tools.focus import (
     CACHE_ROOT,
     parse_ring_path,
     convert_to_focus_lists,
+    get_root_table,
     get_translated_path,
-    read_ini,
-    read_mls
+    read_ini
 )
 from ..tools.general import (
+    DirectoryListing,
     get_env,
+    list_directory,
     merge_paths,
     create_folder
 )
+from ..tools.mls import get_alias_lookup, read_records
 from ..tools.settings import (
-    get_server_access,
     get_default_ring,
-    get_tool_file_names
+    get_process_timeout,
+    get_snapshot
 )
 from ..tools.sublime import strip_alias
 
@@ -72,6 +85,7 @@ class Ring(object, metaclass=MiniPluginMeta):
             raise InvalidRingError(universe_name, ring_name, path)
 
         Ring.Rings[self.key] = self
+        register_with_file_watcher(('rings', self.key), self.watch_folders)
 
     def __str__(self):
         return '{0}.Universe\\{1}.Ring'.format(self.universe_name,
@@ -291,6 +305,33 @@ class Ring(object, metaclass=MiniPluginMeta):
     def get_alias_list_path(self):
         return None
 
+    def get_poll_interval(self, path):
+        """
+        Returns the number of seconds between polls of a folder in the ring
+        by the file watcher. Folders on the server are polled less often.
+
+        """
+        if (is_local_ring(self) or
+                ((self.cache_path is not None) and
+                 path.lower().startswith(self.cache_path.lower()))):
+            return LOCAL_INTERVAL
+        return SERVER_INTERVAL
+
+    def watch_folders(self, watcher):
+        """
+        Registers the ring's source folders with a FileWatcher. Only the
+        application folders are checked on the server; the files in them are
+        checked in the local cache and in local rings.
+
+        """
+        if self.pgm_cache_path is not None:
+            watcher.watch(self.pgm_cache_path,
+                          self.get_poll_interval(self.pgm_cache_path), 2)
+        if self.pgmsource_path is not None:
+            interval = self.get_poll_interval(self.pgmsource_path)
+            watcher.watch(self.pgmsource_path, interval,
+                          1 if interval == LOCAL_INTERVAL else 0)
+
     def possible_paths(self):
         paths = [p for p in (
                  ('Local Cache', self.pgm_cache_path),
@@ -302,20 +343,34 @@ class Ring(object, metaclass=MiniPluginMeta):
                  if p[1] is not None]
         return paths
 
-    def check_file_existence(self, partial_path, multiple_matches=False):
+    def get_search_paths(self):
+        """
+        Returns a list of the folders that partial paths are resolved
+        against, in order of precedence, leaving out the System folders that
+        are searched by file name only.
+
+        """
+        return [v for k, v in self.possible_paths() if
+                k not in ('System Programs', 'System PgmObject')]
+
+    def candidate_paths(self, partial_path):
+        """
+        Yields a (location, path) tuple for each place partial_path could be
+        found, in order of precedence.
+
+        """
         file_name = os.path.basename(partial_path)
-        if multiple_matches:
-            results = []
-            result_set = set()
         for k, v in self.possible_paths():
-
-            if k == 'System Programs':
-                path = merge_paths(v, file_name)
-            elif k == 'System PgmObject':
-                path = merge_paths(v, file_name)
+            if k in ('System Programs', 'System PgmObject'):
+                yield (k, merge_paths(v, file_name))
             else:
-                path = merge_paths(v, partial_path)
+                yield (k, merge_paths(v, partial_path))
 
+    def check_file_existence(self, partial_path, multiple_matches=False):
+        if multiple_matches:
+            results = []
+            result_set = set()
+        for k, path in self.candidate_paths(partial_path):
             if os.path.exists(path):
                 if multiple_matches:
                     if path not in result_set:
@@ -329,6 +384,45 @@ class Ring(object, metaclass=MiniPluginMeta):
         else:
             return None
 
+    def resolve_many(self, partial_paths):
+        """
+        Returns a dictionary mapping each partial path to its full path, or
+        to None if it can't be found. Paths are resolved with the same
+        precedence as get_file_path. The candidate paths are grouped by
+        folder first, so each folder is only checked once for the whole
+        batch; that costs a stat, and a listdir if the folder has changed
+        since it was last listed.
+
+        Keyword arguments:
+        partial_paths - An iterable of paths relative to the ring; e.g.,
+            PgmSource\\Hha\\HhaZ.Tools.I.focus
+
+        """
+        candidates = dict()
+        folders = dict()
+        for partial_path in partial_paths:
+            if partial_path in candidates:
+                continue
+
+            paths = candidates[partial_path] = []
+            for k, path in self.candidate_paths(partial_path):
+                folder, name = os.path.split(path)
+                folders[folder] = None
+                paths.append((folder, os.path.normcase(name), path))
+
+        for folder in folders:
+            folders[folder] = list_directory(folder)
+
+        results = dict()
+        for partial_path, paths in candidates.items():
+            results[partial_path] = None
+            for folder, name, path in paths:
+                if name in folders[folder]:
+                    results[partial_path] = path
+                    break
+
+        return results
+
     def get_file_path(self, partial_path):
         possible_paths = self.check_file_existence(partial_path)
         if possible_paths:
@@ -340,23 +434,48 @@ class Ring(object, metaclass=MiniPluginMeta):
         else:
             return None
 
+    def get_object_folders(self, file_path):
+        """
+        Returns the folders that may contain the compiled object for a Focus
+        file, in order of precedence.
+
+        """
+        app, name = self.get_app_and_filename(file_path)
+        possible_paths = [p[1] for p in self.possible_paths()]
+        folders = [os.path.join(p, f, app) for p, f in
+                   itertools.product(possible_paths, ('PgmSource', 'PgmObject'))]
+        logger.debug('object folders = %s', folders)
+        return folders
+
     def get_translated_path(self, file_path):
         name, ext = os.path.splitext(file_path)
         ext = ext.lower()
 
         if ext == '.focus':
-            app, name = self.get_app_and_filename(file_path)
-            possible_paths = [p[1] for p in self.possible_paths()]
-            focus_possible_paths = []
-            for p, f in itertools.product(possible_paths,
-                                          ('PgmSource', 'PgmObject')):
-                focus_possible_paths.append(os.path.join(p, f, app))
-                logger.debug('focus_possible_paths = %s', focus_possible_paths)
+            focus_possible_paths = self.get_object_folders(file_path)
         else:
             focus_possible_paths = None
 
         return get_translated_path(file_path, focus_possible_paths)
 
+    def refresh_object_index(self, file_path):
+        """
+        Drops the cached listings of the folders searched for the compiled
+        object of file_path, so the object from a translation that just
+        finished is found even if the folders' modification times haven't
+        changed.
+
+        """
+        name, ext = os.path.splitext(file_path)
+        if ext.lower() != '.focus':
+            DirectoryListing.invalidate(os.path.dirname(file_path))
+            return
+
+        for folder in self.get_object_folders(file_path):
+            DirectoryListing.invalidate(folder)
+        DirectoryListing.invalidate(
+            os.path.dirname(file_path).replace('PgmSource', 'PgmObject'))
+
     def get_app_and_filename(self, file_path):
         a, n = os.path.split(file_path)
         unused, a = os.path.split(a)
@@ -373,9 +492,25 @@ class Ring(object, metaclass=MiniPluginMeta):
         return (self.magic_path is not None)
 
     def run_file(self, partial_path=None, full_path=None,
-                 parameters=None, separate_process=True, use_cache=False):
+                 parameters=None, separate_process=True, use_cache=False,
+                 name=None, timeout=None, detached=False):
         """
-        Runs a file in the Ring by calling it as an argument to magic.exe.
+        Runs a file in the Ring by calling it as an argument to magic.exe,
+        through the ProcessSupervisor. Returns the command, or None if the
+        file couldn't be run.
+
+        Keyword arguments:
+        separate_process - If True, magic.exe is queued with the other
+            background jobs and isn't waited for. If False, it's queued and
+            waited for, and None is returned if it didn't finish.
+        detached - If True, a separate process is started right away as a
+            detached job instead of being queued, for interactive runs that
+            the user is waiting to see.
+        name - The description of the job shown in the jobs panel.
+        timeout - Seconds after which magic.exe is stopped. When waiting
+            for it, this includes the time spent queued, and if None the
+            process_timeout setting is used.
+
         """
 
         if not self.allow_running():
@@ -402,11 +537,21 @@ class Ring(object, metaclass=MiniPluginMeta):
 
             logger.debug('Running cmd = %s', cmd)
 
+            if name is None:
+                name = os.path.basename(path)
+
+            supervisor = get_process_supervisor()
             if separate_process:
-                logger.debug('separate_process = True')
-                subprocess.Popen(cmd)
+                supervisor.submit(cmd, name=name, timeout=timeout,
+                                  on_exit=log_job_exit, detached=detached)
             else:
-                subprocess.call(cmd)
+                logger.debug('separate_process = False')
+                if timeout is None:
+                    timeout = get_process_timeout() or None
+                job = supervisor.run(cmd, name=name, wait_timeout=timeout,
+                                     on_exit=log_job_exit)
+                if job.state != FINISHED:
+                    return None
 
         return cmd
 
@@ -416,6 +561,7 @@ class Ring(object, metaclass=MiniPluginMeta):
         """
         Runs a file in the Ring using FocZ.TextPad.Run.P. If called
         with parameters, Omnilaunch is used because it supports arguments.
+        A separate process is started right away as a detached job.
         """
 
         if not self.allow_running():
@@ -440,14 +586,53 @@ class Ring(object, metaclass=MiniPluginMeta):
                 run_parameters += ' ' + parameters
             logger.debug('run_parameters = %s', run_parameters)
 
-            return self.run_file(partial_path=run_path,
-                                 parameters=run_parameters,
-                                 separate_process=separate_process)
+            return self.run_file(
+                partial_path=run_path, parameters=run_parameters,
+                separate_process=separate_process, detached=True,
+                name='{0} {1}'.format(cmd.title(), os.path.basename(path)))
 
     def open_kingdom(self):
         if self.system_path:
             path = self.get_file_path('KingdomNice.mps')
-            return self.run_file(full_path=path)
+            return self.run_file(full_path=path, detached=True)
+
+    def get_tool_index(self, folder='RTTools'):
+        """
+        Returns the ToolIndex for a System tools folder, such as RTTools or
+        TTTools, or None if the ring doesn't have the folder. The index is
+        expired whenever the file watcher reports a change in the folder.
+
+        """
+        try:
+            tool_indexes = self._tool_indexes
+        except AttributeError:
+            tool_indexes = self._tool_indexes = dict()
+
+        try:
+            return tool_indexes[folder]
+        except KeyError:
+            pass
+
+        index = None
+        if self.system_path is not None:
+            path = os.path.join(self.system_path, folder)
+            if os.path.isdir(path):
+                index = ToolIndex(path)
+                self.watch_tool_index(index)
+
+        tool_indexes[folder] = index
+        return index
+
+    def watch_tool_index(self, index):
+        """Expires a ToolIndex when its folder changes."""
+        key = ('tool_index', self.key, index.path)
+        interval = self.get_poll_interval(index.path)
+
+        def register(watcher):
+            watcher.watch(index.path, interval)
+            watcher.subscribe(key, lambda events: index.expire(), index.path)
+
+        register_with_file_watcher(key, register, start=True)
 
     @property
     def alias_lookup(self):
@@ -529,7 +714,7 @@ class Ring(object, metaclass=MiniPluginMeta):
             return self.get_shell_cmd_direct(full_path, parameters)
         elif self == target_ring:
             name = os.path.basename(full_path)
-            if name.lower() in [x.lower() for x in get_tool_file_names()]:
+            if get_snapshot().is_tool_file_name(name):
                 return self.get_shell_cmd_direct(full_path, parameters)
             else:
                 return self.get_shell_cmd_tool(full_path, parameters)
@@ -639,7 +824,7 @@ class Ring(object, metaclass=MiniPluginMeta):
         logger.debug(".get_shell_cmd_tool: run_path = %s", run_path)
         name = os.path.basename(full_path)
         tool_cmd = 'RUN'
-        if name.lower() in [x.lower() for x in get_tool_file_names()]:
+        if get_snapshot().is_tool_file_name(name):
             tool_cmd = 'RUNRING'
 
         shell_cmd = self.format_shell_cmd_for_tool(run_path, tool_cmd,
@@ -659,7 +844,7 @@ class Ring(object, metaclass=MiniPluginMeta):
         logger.debug("'.get_shell_cmd_tool: run_path = %s", run_path)
         name = os.path.basename(full_path)
         tool_cmd = 'RUNTOOL'
-        if name.lower() in [x.lower() for x in get_tool_file_names()]:
+        if get_snapshot().is_tool_file_name(name):
             tool_cmd = 'RUNRINGTOOL'
 
         shell_cmd = self.format_shell_cmd_for_tool(run_path, tool_cmd,
@@ -717,15 +902,8 @@ class HomeCareRing(Ring):
             return
 
         logger.info('Loading aliases for %s', self.name)
-        with open(self.alias_list_path, 'r') as f:
-            contents = f.read()
-
-        matches = re.findall(
-            r'{start}(.+?){sep}.+?{sep}(.+?){sep}(.+?)({sep}.*?)?{end}'.format(
-                start=chr(1), sep=chr(3), end=chr(2)),
-            contents)
-
-        self._alias_lookup = {a[0]: (a[2], a[1]) for a in matches}
+        self._alias_lookup = get_alias_lookup(
+            read_records(self.alias_list_path))
         logger.info('Aliases loaded for %s', self.name)
 
     def find_alias_definition(self, alias):
@@ -825,8 +1003,7 @@ class LocalRing(HomeCareRing):
             omnilaunch = self.get_file_path('Omnilaunch.mps')
             if omnilaunch:
                 name = os.path.basename(full_path)
-                if name.lower() not in [x.lower() for x in
-                                        get_tool_file_names()]:
+                if not get_snapshot().is_tool_file_name(name):
                     if parameters is None:
                         parameters = full_path
                         run_path = target_ring.get_file_path(
@@ -896,13 +1073,10 @@ class ServerRing(Ring):
                               'UniverseHCIS from Signon.ini: %s'), self)
             return None
 
-        if not unv_server_drive.endswith(':'):
-            for d in get_server_access():
-                if unv_server_drive.lower() == d.lower():
-                    break
-            else:
-                logger.info('No access defined for drive %s', unv_server_drive)
-                return None
+        if not (unv_server_drive.endswith(':') or
+                get_snapshot().has_server_drive_access(unv_server_drive)):
+            logger.info('No access defined for drive %s', unv_server_drive)
+            return None
 
         root_table_path = os.path.join(unv_server_drive,
                                        self.universe_name + '.Universe',
@@ -912,19 +1086,16 @@ class ServerRing(Ring):
                                        'Root Table.mls')
         logger.debug("root table path=%s", root_table_path)
 
-        if not os.path.isfile(root_table_path):
+        root_table = get_root_table(root_table_path)
+        if root_table is None:
             logger.info('Root table does not exist: %s', root_table_path)
             return None
 
-        root_table = read_mls(root_table_path)
         logger.debug("root_table: %s", root_table)
         ring_root = root_table[('Ring', '')][0]
         logger.debug("ring_root=%s", ring_root)
 
-        for d in get_server_access():
-            if ring_root.lower().startswith(d.lower()):
-                break
-        else:
+        if not get_snapshot().has_server_path_access(ring_root):
             logger.info('No access defined for drive %s', ring_root)
             return None
 
@@ -941,6 +1112,62 @@ class ServerRing(Ring):
                 shutil.copyfile(source, dest)
                 return dest
 
+    @property
+    def prefetcher(self):
+        """
+        The Prefetcher that copies server files into the cache, or None if
+        the ring has no server path or cache.
+
+        """
+        try:
+            return self._prefetcher
+        except AttributeError:
+            if (self.server_path is None) or (self.pgm_cache_path is None):
+                self._prefetcher = None
+            else:
+                self._prefetcher = Prefetcher(self.server_path,
+                                              self.pgm_cache_path)
+            return self._prefetcher
+
+    def prefetch_to_cache(self, files, max_workers=4):
+        """
+        Copies files from the server into the cache ahead of time, and
+        returns a list of PrefetchResults.
+
+        Keyword arguments:
+        files - An iterable of full paths of files in the ring.
+        max_workers - The maximum number of files to copy at once.
+
+        """
+        if self.prefetcher is None:
+            return []
+
+        partial_paths = []
+        seen = set()
+        for f in files:
+            partial_path = self.partial_path(f)
+            if (partial_path is not None) and (partial_path.lower() not in
+                                               seen):
+                seen.add(partial_path.lower())
+                partial_paths.append(partial_path)
+
+        logger.info('Prefetching %s files for %s', len(partial_paths), self)
+        return self.prefetcher.prefetch(partial_paths, max_workers)
+
+    def refresh_cached_file(self, file_name):
+        """
+        Copies a prefetched file from the server again if it has changed
+        there and hasn't been edited in the cache. Returns True if the
+        cached file was replaced.
+
+        """
+        if ((self.prefetcher is None) or
+                (not file_name.lower().startswith(
+                    self.pgm_cache_path.lower()))):
+            return False
+
+        return self.prefetcher.refresh(self.partial_path(file_name))
+
     def file_exists_in_cache(self, source):
         result = False
         logger.debug('source: %s', source)
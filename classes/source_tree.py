@@ -0,0 +1,286 @@
+from collections import namedtuple
+import bisect
+import hashlib
+import itertools
+import logging
+import re
+
+from ..tools.general import LimitedSizeDict
+from .translator_tree import MAGIC_KEYWORDS
+
+logger = logging.getLogger(__name__)
+
+
+# All spans are (start, end) tuples of offsets into the contents. Empty
+# regions are represented by a span with equal start and end.
+
+# A :Keyword entry in a translator section other than #Magic, such as a :Name
+# in #Locals. attributes is a tuple of Entries for the attribute lines (such
+# as "Scope Local") that follow it, which have no attributes of their own.
+Entry = namedtuple('Entry', ['keyword', 'value', 'span', 'value_span',
+                             'attributes'])
+
+# A //:Doc section in the documentation of a member.
+DocSection = namedtuple('DocSection', ['name', 'span'])
+
+# A :Code, :List, :EntryPoint or :Icon member.
+Member = namedtuple('Member', ['keyword', 'name', 'span', 'header', 'doc',
+                               'declaration', 'body', 'doc_sections'])
+
+# A #Translator section. entries is empty for #Magic, whose contents are
+# members instead.
+Translator = namedtuple('Translator', ['name', 'span', 'entries'])
+
+
+def get_source_tree(contents):
+    return SourceTree.get_source_tree(contents)
+
+
+class SourceTree(object):
+    """
+    The structure of a Focus or FS file: its translator sections, the
+    members of #Magic and the entries of the other translators.
+
+    Trees are parsed without Sublime Text, so the same tree can be used for
+    views and RingFiles. Parsed trees are cached by a hash of the contents,
+    so anything asking about the same contents shares one parse.
+
+    """
+
+    Trees = LimitedSizeDict(size_limit=64)
+
+    HEADER_MATCHER = re.compile(r"(#[A-Za-z]+|:[A-Za-z]+) *(.+)?$")
+    MEMBER_NAME_MATCHER = re.compile(r"(:[A-Za-z]+)[ \t]*(.*?)[ \t]*$")
+    SEPARATOR_MATCHER = re.compile(r"//[ -=+*_]+$")
+    DOC_HEADER_MATCHER = re.compile(r"\s*//\s*:Doc\s*(.+?)\s*$")
+    DECLARATION_MATCHER = re.compile(r"[Vv]ar:")
+    ENTRY_MATCHER = re.compile(
+        r"[ \t]*(:[A-Za-z][A-Za-z0-9]*)(?:[ \t]+(.*?))?[ \t]*$")
+    ATTRIBUTE_MATCHER = re.compile(
+        r"[ \t]+([A-Za-z][A-Za-z0-9]*)(?:[ \t]+(.*?))?[ \t]*$")
+
+    def __init__(self, contents):
+        super(SourceTree, self).__init__()
+        self.size = len(contents)
+        self._lines = contents.split('\n')
+        self._offsets = [0]
+        self._offsets.extend(
+            itertools.accumulate(len(l) + 1 for l in self._lines))
+
+        self.translators = []
+        self.members = []
+        self._parse()
+        self._member_starts = [m.span[0] for m in self.members]
+
+        # The lines are only needed while parsing
+        del self._lines
+        del self._offsets
+
+    @classmethod
+    def get_source_tree(cls, contents):
+        """
+        Returns the tree for contents, parsing it if the same contents have
+        not been parsed recently.
+
+        """
+        key = hashlib.sha1(contents.encode('utf-8')).hexdigest()
+        try:
+            return cls.Trees[key]
+        except KeyError:
+            tree = cls.Trees[key] = cls(contents)
+            return tree
+
+    def _line_span(self, row):
+        return (self._offsets[row], self._offsets[row + 1] - 1)
+
+    def _last_content_row(self, start_row, end_row, skip_separators=False):
+        """
+        Returns the last row before end_row that is not empty, and is not a
+        separator comment if skip_separators is True. Returns start_row if
+        there are no other rows.
+
+        """
+        row = end_row - 1
+        while row > start_row:
+            line = self._lines[row]
+            if (line == '') or (skip_separators and
+                                self.SEPARATOR_MATCHER.match(line)):
+                row -= 1
+            else:
+                break
+        return row
+
+    def _parse(self):
+        lines = self._lines
+        headers = [(row, m.group(1)) for row, m in
+                   ((i, self.HEADER_MATCHER.match(l)) for i, l in
+                    enumerate(lines)) if m is not None]
+        headers.append((len(lines), None))
+
+        translators = [(row, h) for row, h in headers if
+                       (h is None) or h.startswith('#')]
+        for (row, name), (next_row, _) in zip(translators, translators[1:]):
+            end_row = self._last_content_row(row, next_row,
+                                             skip_separators=True)
+            span = (self._offsets[row], self._line_span(end_row)[1])
+            if name == '#Magic':
+                entries = ()
+            else:
+                entries = tuple(self._parse_entries(row + 1, end_row + 1))
+            self.translators.append(Translator(name, span, entries))
+
+        for (row, keyword), (next_row, _) in zip(headers, headers[1:]):
+            if keyword in MAGIC_KEYWORDS:
+                self.members.append(self._parse_member(row, keyword,
+                                                       next_row))
+
+    def _parse_entries(self, start_row, end_row):
+        rows = [row for row in range(start_row, end_row) if
+                self.ENTRY_MATCHER.match(self._lines[row])]
+        rows.append(end_row)
+
+        for row, next_row in zip(rows, rows[1:]):
+            last_row = self._last_content_row(row, next_row)
+            keyword, value, value_span = self._parse_entry_line(
+                row, self.ENTRY_MATCHER)
+
+            attributes = []
+            for attribute_row in range(row + 1, last_row + 1):
+                if self.ATTRIBUTE_MATCHER.match(self._lines[attribute_row]):
+                    name, attribute_value, attribute_span = \
+                        self._parse_entry_line(attribute_row,
+                                               self.ATTRIBUTE_MATCHER)
+                    attributes.append(Entry(
+                        name, attribute_value,
+                        self._line_span(attribute_row), attribute_span, ()))
+
+            yield Entry(keyword, value,
+                        (self._offsets[row], self._line_span(last_row)[1]),
+                        value_span, tuple(attributes))
+
+    def _parse_entry_line(self, row, matcher):
+        """Returns the keyword, value and value span of a line."""
+        match = matcher.match(self._lines[row])
+        start = self._offsets[row]
+        if match.group(2) is None:
+            end = start + match.end(1)
+            return (match.group(1), '', (end, end))
+
+        value_span = match.span(2)
+        return (match.group(1), match.group(2),
+                (start + value_span[0], start + value_span[1]))
+
+    def _parse_member(self, row, keyword, next_row):
+        lines = self._lines
+        header = self._line_span(row)
+        name = self.MEMBER_NAME_MATCHER.match(lines[row]).group(2)
+
+        # A member ends at the last non-empty line before the next
+        # translator or keyword, or at the end of the file.
+        if next_row == len(lines):
+            end_row = next_row - 1
+            end = self.size
+        else:
+            end_row = self._last_content_row(row, next_row)
+            end = self._line_span(end_row)[1]
+
+        doc_sections = []
+        current_row = row + 1
+        while ((current_row <= end_row) and
+               lines[current_row].lstrip().startswith('//')):
+            match = self.DOC_HEADER_MATCHER.match(lines[current_row])
+            if match is not None:
+                doc_sections.append((match.group(1), current_row))
+            current_row += 1
+
+        if current_row == row + 1:
+            doc_start = min(header[1] + 1, end)
+            doc = (doc_start, doc_start)
+        else:
+            doc = (self._offsets[row + 1],
+                   self._line_span(current_row - 1)[1])
+
+        doc_sections.append((None, current_row))
+        doc_sections = tuple(
+            DocSection(section_name, (self._offsets[section_row],
+                                      self._line_span(next_section_row - 1)[1]))
+            for (section_name, section_row), (_, next_section_row) in
+            zip(doc_sections, doc_sections[1:]))
+
+        if ((current_row <= end_row) and
+                self.DECLARATION_MATCHER.match(lines[current_row])):
+            declaration = self._line_span(current_row)
+            current_row += 1
+        else:
+            declaration_start = min(self._offsets[current_row], end)
+            declaration = (declaration_start, declaration_start)
+
+        body_start = min(self._offsets[current_row], end)
+        body = (body_start, end)
+
+        return Member(keyword, name, (header[0], end), header, doc,
+                      declaration, body, doc_sections)
+
+    def get_translators(self, name):
+        """
+        Returns a list of the sections for a translator.
+
+        Keyword arguments:
+        name - The name of the translator, with or without the leading #.
+
+        """
+        if not name.startswith('#'):
+            name = '#' + name
+        return [t for t in self.translators if t.name == name]
+
+    def get_entries(self, translator, keyword=None):
+        """
+        Returns a list of the entries in all the sections of a translator.
+
+        Keyword arguments:
+        translator - The name of the translator, with or without the
+            leading #.
+        keyword - If specified, only entries for this keyword are returned;
+            e.g., :Name.
+
+        """
+        return [e for t in self.get_translators(translator) for e in
+                t.entries if (keyword is None) or (e.keyword == keyword)]
+
+    def get_member(self, name, keywords=None):
+        """
+        Returns the first member with the given name, or None.
+
+        Keyword arguments:
+        name - The name of the member.
+        keywords - If specified, only members starting with one of these
+            keywords are considered.
+
+        """
+        for member in self.members:
+            if ((member.name == name) and
+                    ((keywords is None) or (member.keyword in keywords))):
+                return member
+        return None
+
+    def get_member_at(self, point):
+        """Returns the member containing point, or None."""
+        index = bisect.bisect_right(self._member_starts, point) - 1
+        if index < 0:
+            return None
+
+        member = self.members[index]
+        if member.span[1] >= point:
+            return member
+        return None
+
+    def get_member_region(self, point):
+        """
+        Returns a tuple of the start and end of the member containing point,
+        or None if point is not within a member.
+
+        """
+        member = self.get_member_at(point)
+        if member is None:
+            return None
+        return member.span
@@ -0,0 +1,120 @@
+from collections import namedtuple
+import logging
+import os
+import re
+import threading
+
+from ..tools.general import FileBuffer, get_file_version
+
+logger = logging.getLogger(__name__)
+
+
+TOOL_FILE_MATCHER = re.compile(r'[a-wz].*\.fs$')
+TOOL_CODE_MATCHER = re.compile(r'^ *:Code +(([A-Za-z]).*)', re.MULTILINE)
+
+# A tool such as @aB, the file it's defined in and the span of the name on
+# its :Code line.
+ToolEntry = namedtuple('ToolEntry', ['name', 'file_name', 'span'])
+
+
+def parse_tool_file(file_name, contents):
+    """
+    Returns a list of the ToolEntries defined in the contents of a tool
+    file. The first letter of each tool is the first letter of the file, and
+    the second is the first letter of the :Code member defining it.
+
+    """
+    first_letter = os.path.basename(file_name)[0]
+    entries = []
+    for match in TOOL_CODE_MATCHER.finditer(contents):
+        name = '@' + first_letter + match.group(2)
+        entries.append(ToolEntry(name, file_name, match.span(1)))
+    return entries
+
+
+class ToolIndex(object):
+    """
+    An index of the RT or TT tools defined in a System tools folder.
+
+    The folder is scanned once, and is only checked again after expire is
+    called, such as when the file watcher reports a change in it. Then only
+    the files whose modification time or size has changed are read again.
+    When a tool is defined more than once, the first definition, in file
+    name order, is used.
+
+    Keyword arguments:
+    path - The tools folder, such as System\\RTTools.
+
+    """
+
+    def __init__(self, path):
+        super(ToolIndex, self).__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        self._files = dict()
+        self._tools = dict()
+        self._current = False
+
+    def __len__(self):
+        return len(self.get_tools())
+
+    def expire(self):
+        """Makes the next lookup check the tool files for changes."""
+        with self._lock:
+            self._current = False
+
+    def get_tool(self, name):
+        """Returns the ToolEntry for a tool name such as @aB, or None."""
+        return self.get_tools().get(name)
+
+    def get_tools(self):
+        """Returns a dictionary mapping each tool name to its ToolEntry."""
+        with self._lock:
+            if not self._current:
+                self._current = True
+                self._refresh()
+            return self._tools
+
+    def _list_files(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(os.path.join(self.path, n) for n in names if
+                      TOOL_FILE_MATCHER.match(n))
+
+    def _refresh(self):
+        files = dict()
+        changed = False
+        for file_name in self._list_files():
+            version = get_file_version(file_name)
+            if version is None:
+                continue
+
+            try:
+                cached_version, entries = self._files[file_name]
+            except KeyError:
+                changed = True
+            else:
+                if cached_version == version:
+                    files[file_name] = (cached_version, entries)
+                    continue
+                changed = True
+
+            logger.debug('Indexing tools in %s', file_name)
+            try:
+                contents = FileBuffer(file_name).contents
+            except (OSError, UnicodeDecodeError):
+                logger.warning('Could not read tool file: %s', file_name)
+                entries = []
+            else:
+                entries = parse_tool_file(file_name, contents)
+            files[file_name] = (version, entries)
+
+        if changed or (len(files) != len(self._files)):
+            tools = dict()
+            for file_name in sorted(files):
+                for entry in files[file_name][1]:
+                    tools.setdefault(entry.name, entry)
+            self._tools = tools
+        self._files = files
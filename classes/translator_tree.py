@@ -0,0 +1,161 @@
+import logging
+import re
+
+from ..tools.general import diff_lines
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC_KEYWORDS = (':Code', ':List', ':EntryPoint', ':Icon')
+
+
+class TranslatorTree(object):
+    """
+    Incremental model of the indentation based structure of a Focus file.
+
+    Each line is parsed once into (indent, token, marker, separator, value).
+    Lines starting with a translator (#) or keyword (:) are linked to the
+    closest preceding line with a smaller indent, so the translator tree for
+    a line is a walk up those links instead of a reverse scan of the file.
+
+    Only the parsing is incremental: update is given the full contents,
+    which are split and compared with the previous lines to find the rows
+    that changed, so each update is still linear in the size of the file.
+    Sublime Text 3 doesn't report the regions an edit changed, so there is
+    nothing smaller to update from.
+
+    """
+
+    LINE_MATCHER = re.compile(
+        r'^(\s*)((:|#)[A-Za-z0-9]*|[A-Za-z0-9]+)(\s*)(.*)$')
+
+    def __init__(self, contents=''):
+        super(TranslatorTree, self).__init__()
+        self._lines = []
+        self._entries = []
+        self._previous = []
+        self._enclosing = []
+        self.update(contents)
+
+    def __len__(self):
+        return len(self._lines)
+
+    @classmethod
+    def parse_line(cls, line):
+        """
+        Returns a tuple of (indent, token, marker, separator, value) for a
+        line, or None if the line does not start with a translator, keyword
+        or attribute.
+
+        """
+        match = cls.LINE_MATCHER.match(line)
+        if match is None:
+            return None
+        return (len(match.group(1)), match.group(2), match.group(3),
+                match.group(4), match.group(5))
+
+    def update(self, contents):
+        """
+        Updates the model to match contents. Returns a tuple of the first
+        and last (exclusive) rows that were reparsed, or None if nothing
+        changed.
+
+        Keyword arguments:
+        contents - The full contents of the file.
+
+        """
+        lines = contents.split('\n')
+        diff = diff_lines(self._lines, lines)
+        if diff is None:
+            return None
+
+        start, old_end, new_end = diff
+        self._entries[start:old_end] = [self.parse_line(l) for l in
+                                        lines[start:new_end]]
+        self._lines = lines
+
+        # Links after the edit may point across it, so they are rebuilt
+        # lazily the next time a row past the edit is looked up.
+        del self._previous[start:]
+        del self._enclosing[start:]
+
+        logger.debug('Reparsed rows %s to %s', start, new_end)
+        return (start, new_end)
+
+    def _is_keyword(self, row):
+        entry = self._entries[row]
+        return (entry is not None) and (entry[2] is not None)
+
+    def _find(self, max_indent, row):
+        """
+        Returns the closest keyword line at or before row with an indent
+        no greater than max_indent.
+
+        """
+        if max_indent < 0:
+            return None
+        while (row is not None) and (self._entries[row][0] > max_indent):
+            row = self._enclosing[row]
+        return row
+
+    def _link(self, row):
+        """Builds the links for all lines up to and including row."""
+        for i in range(len(self._previous), row + 1):
+            if i == 0:
+                previous = None
+            elif self._is_keyword(i - 1):
+                previous = i - 1
+            else:
+                previous = self._previous[i - 1]
+            self._previous.append(previous)
+
+            if self._is_keyword(i):
+                self._enclosing.append(
+                    self._find(self._entries[i][0] - 1, previous))
+            else:
+                self._enclosing.append(None)
+
+    def get_tree(self, row, trim_containers=False):
+        """
+        Returns a list of (Translator option, Value) tuples from the
+        translator down to the line at row.
+
+        Keyword arguments:
+        row - The line number to build the tree for.
+        trim_containers - If True, only include the innermost :Container.
+
+        """
+        row = max(0, min(row, len(self._lines) - 1))
+        self._link(row)
+
+        translator_tree = list()
+        found_container = False
+
+        if self._entries[row] is None:
+            translator_tree.append(('', ''))
+            current = self._previous[row]
+        else:
+            current = row
+
+        while current is not None:
+            indent, token, marker, separator, value = self._entries[current]
+
+            # Only include the last container block since they can be nested
+            if trim_containers and (token == ':Container'):
+                if not found_container:
+                    translator_tree.append((token, value))
+                    found_container = True
+            elif (separator == '') and (value != ''):
+                translator_tree.append(('', token + value))
+            else:
+                translator_tree.append((token, value))
+                if token in MAGIC_KEYWORDS:
+                    translator_tree.append(('#Magic', ''))
+                    break
+
+            if marker == '#':
+                break
+            current = self._find(indent - 2, self._previous[current])
+
+        translator_tree.reverse()
+        return translator_tree
@@ -0,0 +1,605 @@
+from collections import namedtuple, OrderedDict
+import concurrent.futures
+import hashlib
+import logging
+import os
+import re
+
+from .source_tree import get_source_tree
+from ..tools.general import LimitedSizeDict
+
+logger = logging.getLogger(__name__)
+
+
+UNIT_TEST_LOG_TEMPLATE = '[{message}@CallSub(UnitTestTemplate_LogMessage)]'
+LOG_MESSAGE_MATCHER = re.compile(r" *// *Unit Test Log: *(.+)",
+                                 re.IGNORECASE)
+
+
+class Subroutine(object):
+    """Represents a subroutine containing unit tests"""
+
+    MatTemplate = ('{{":Code {subroutine}"}}'
+                   '@CallSub(UnitTestTemplate_LogResults),')
+
+    def __init__(self, subroutine_name, unit_test_text, code=None):
+        super(Subroutine, self).__init__()
+        self.subroutine_name = subroutine_name
+        # Source of the subroutine, including its header and documentation
+        self.code = code
+        # List of strings extracted from documentation
+        self.unit_test_text = unit_test_text
+
+        self.unit_tests = []
+        self.errors = []
+
+        for t in unit_test_text:
+            try:
+                self.unit_tests.append(UnitTest(subroutine_name, t))
+            except IncompleteUnitTestException as e:
+                self.errors.append(e)
+
+    def format_for_unit_test(self):
+        text = self.MatTemplate.format(subroutine=self.subroutine_name)
+        for t in self.unit_tests:
+            text += '\n' + t.format_for_unit_test()
+        for e in self.errors:
+            text += '\n' + e.format_for_unit_test()
+
+        return text
+
+
+class UnitTest(object):
+    """Object to represent an M-AT Unit Test."""
+
+    TestNameMatcher = re.compile(r"// *:Test *(.+)")
+    InputMatcher = re.compile(r"// *Input *(.+)", re.IGNORECASE)
+    OutputMatcher = re.compile(r"// *Output *(.+)", re.IGNORECASE)
+    SetupMatcher = re.compile(r"// *Setup *(.+)", re.IGNORECASE)
+    CleanupMatcher = re.compile(r"// *Cleanup *(.+)", re.IGNORECASE)
+    CompareMatcher = re.compile(r"// *Compare *(.+)", re.IGNORECASE)
+
+    # MatTemplate = ('{setup},{{"{name}",{input}^I,{output},'
+    #                '[@MT^T]I@CallSub({subroutine_name}),@MT-T,{compare}}}'
+    #                '@CallSub(UnitTestTemplate_FormatResults),{cleanup},')
+
+    MatTemplate = ('{{"{name}"}}{setup},{{"{name}",{input},{output}}}'
+                   '[@{{,@MT,|1@CallSub({subroutine_name}),@MT}}@JV'
+                   '@{{|0,|1,|2,|4,@{{|5,|3}}@-,{compare}}}'
+                   '@CallSub(UnitTestTemplate_FormatResults)]$2[{cleanup}],')
+    CompareTemplate = (
+        '@{{|0,|1,|4,@CallSub(UnitTestTemplate_GetLogMessages)}}{compare}')
+
+    def __init__(self, subroutine_name, test):
+        super(UnitTest, self).__init__()
+        self.subroutine_name = subroutine_name
+        self.text = test
+
+        match = self.TestNameMatcher.match(test)
+        if match is None:
+            raise IncompleteUnitTestException(subroutine_name, 'UNKNOWN',
+                                              "Missing name")
+        else:
+            self.name = match.group(1)
+
+        self.input = None
+        self.output = None
+        self.setup = None
+        self.cleanup = None
+        self.compare = None
+
+        for l in test.split('\n'):
+            if self.input is None:
+                match = self.InputMatcher.match(l)
+                if match is not None:
+                    self.input = match.group(1)
+                    continue
+
+            if self.output is None:
+                match = self.OutputMatcher.match(l)
+                if match is not None:
+                    self.output = match.group(1)
+                    if self.output == 'False':
+                        self.output = '"False"'
+                    elif self.output == 'True':
+                        self.output = '"True"'
+                    continue
+
+            if self.setup is None:
+                match = self.SetupMatcher.match(l)
+                if match is not None:
+                    self.setup = match.group(1)
+                    continue
+
+            if self.cleanup is None:
+                match = self.CleanupMatcher.match(l)
+                if match is not None:
+                    self.cleanup = match.group(1)
+                    continue
+
+            if self.compare is None:
+                match = self.CompareMatcher.match(l)
+                if match is not None:
+                    self.compare = match.group(1)
+                    continue
+
+        if self.input is None:
+            raise IncompleteUnitTestException(subroutine_name, self.name,
+                                              "Missing input")
+        if (self.output is None) and (self.compare is None):
+            raise IncompleteUnitTestException(subroutine_name, self.name,
+                                              "Missing output")
+        if self.setup is None:
+            self.setup = '""'
+        if self.cleanup is None:
+            self.cleanup = '""'
+        if self.compare is None:
+            self.compare = '""'
+        else:
+            self.compare = self.CompareTemplate.format(compare=self.compare)
+
+    def str(self):
+        return "Test: {0}\n  Input: {1}\n  Output {2}".format(
+            self.name, self.input, self.output)
+
+    def format_for_unit_test(self):
+        return self.MatTemplate.format(**self.__dict__)
+
+
+class IncompleteUnitTestException(Exception):
+    """Exception thrown if the unit test is incomplete. For example, if it is
+    missing its input or output."""
+
+    DescriptionTemplate = 'Incomplete unit test: {0} - {1}; Problem: {2}'
+    MatTemplate = ('{{"     Unit Test: {unit_test_name} - Incomplete",'
+                   '"          Problem:             {problem}",""}}'
+                   '@CallSub(UnitTestTemplate_LogResults),')
+
+    def __init__(self, subroutine_name, unit_test_name, problem):
+        super(IncompleteUnitTestException, self).__init__()
+        self.subroutine_name = subroutine_name
+        self.unit_test_name = unit_test_name
+        self.problem = problem
+        self.description = self.DescriptionTemplate.format(subroutine_name,
+                                                           unit_test_name,
+                                                           problem)
+
+    def format_for_unit_test(self):
+        return self.MatTemplate.format(unit_test_name=self.unit_test_name,
+                                       problem=self.problem)
+
+
+UNIT_TEST_PARSER = re.compile(r"(// *:Test *([\s\S]*?))\n(?=// *:Test *|END)")
+
+
+CALL_SUB_MATCHER = re.compile(r"@CallSub\(([^)]+)\)")
+
+
+def get_code_members(contents):
+    """
+    Returns an OrderedDict mapping the name of each :Code member in contents
+    to the source of the member.
+
+    """
+    members = OrderedDict()
+    for member in get_source_tree(contents).members:
+        if member.keyword == ':Code':
+            members[member.name] = contents[member.span[0]:member.span[1]]
+
+    return members
+
+
+def get_unit_test_subroutines(contents):
+    """
+    Returns a list of Subroutines for the :Code members in contents that
+    have a //:Doc Unit Test section containing at least one test.
+
+    Keyword arguments:
+    contents - The contents of a Focus file.
+
+    """
+    subroutines = []
+    for member in get_source_tree(contents).members:
+        if member.keyword != ':Code':
+            continue
+
+        for section in member.doc_sections:
+            if section.name == 'Unit Test':
+                break
+        else:
+            continue
+
+        body = contents[section.span[0]:section.span[1]].split('\n', 1)[1:]
+        unit_tests = [t for t, _ in
+                      UNIT_TEST_PARSER.findall('\n'.join(body) + '\nEND')]
+        if unit_tests:
+            subroutines.append(Subroutine(
+                member.name, unit_tests,
+                contents[member.span[0]:member.span[1]]))
+
+    return subroutines
+
+
+# Translators copied whole into a Unit Test file
+UNIT_TEST_TRANSLATORS = ('#Include', '#ImportExport', '#Locals', '#Lock',
+                         '#DataDef')
+
+
+def filter_source(lines):
+    """
+    Filters the lines of a Focus file down to the sections needed to run
+    its code from a Unit Test file. #Alias sections only keep the local
+    aliases, and :EntryPoint members and :Code Main are dropped.
+
+    Keyword arguments:
+    lines - An iterable of the lines in the file.
+
+    """
+    contents = '\n'.join(lines)
+    tree = get_source_tree(contents)
+
+    def substr(span):
+        return contents[span[0]:span[1]]
+
+    sections = []
+    for translator in tree.translators:
+        if translator.name in UNIT_TEST_TRANSLATORS:
+            sections.append(substr(translator.span))
+        elif translator.name == '#Alias':
+            sections.append('#Alias')
+            for entry in translator.entries:
+                if any((a.keyword == 'Scope') and ('Local' in a.value) for
+                       a in entry.attributes):
+                    sections.append(substr(entry.span))
+        elif translator.name == '#Magic':
+            sections.append('#Magic')
+            for member in tree.members:
+                if not (translator.span[0] <= member.span[0] <=
+                        translator.span[1]):
+                    continue
+                elif (member.keyword == ':EntryPoint') or (
+                        (member.keyword == ':Code') and (member.name == 'Main')):
+                    continue
+
+                code = []
+                for line in substr(member.span).split('\n'):
+                    match = LOG_MESSAGE_MATCHER.match(line)
+                    if match is not None:
+                        line = UNIT_TEST_LOG_TEMPLATE.format(
+                            message=match.group(1))
+                    code.append(line)
+                sections.append('\n'.join(code) + '\n')
+
+    return '\n'.join(sections)
+
+
+def get_unit_test_file_name(pgm_cache_path, file_name):
+    """
+    Returns the path of the Unit Test file generated for a Focus file.
+
+    Keyword arguments:
+    pgm_cache_path - The PgmCache path of the ring.
+    file_name - The path of the Focus file being tested.
+
+    """
+    path, name = os.path.split(file_name)
+    first_folder = os.path.basename(path)
+    match = re.match(r"(.+?)(\.[A-Z])?\.focus", name)
+
+    return os.path.join(pgm_cache_path,
+                        'PgmSource',
+                        first_folder,
+                        '{0}.UnitTest.P.focus'.format(match.group(1)))
+
+
+UnitTestJob = namedtuple('UnitTestJob', ['file_name', 'unit_test_file_name',
+                                         'results_file_name'])
+
+
+class UnitTestResults(object):
+    """
+    Results of running the Unit Test file for a single Focus file, read
+    from the file written by UnitTestTemplate_WriteResults.
+
+    """
+
+    SummaryMatcher = re.compile(
+        r"^Passed: *(\d+)/(\d+) +Failed: *(\d+)/(\d+)", re.MULTILINE)
+
+    def __init__(self, file_name, text=None, error=None):
+        super(UnitTestResults, self).__init__()
+        self.file_name = file_name
+        self.text = text
+        self.error = error
+        self.passed = 0
+        self.failed = 0
+
+        if text is not None:
+            match = self.SummaryMatcher.search(text)
+            if match is None:
+                self.error = 'Results file is incomplete'
+            else:
+                self.passed = int(match.group(1))
+                self.failed = int(match.group(3))
+
+    @property
+    def total(self):
+        return self.passed + self.failed
+
+    @property
+    def succeeded(self):
+        return (self.error is None) and (self.failed == 0)
+
+    def format(self):
+        if self.error is None:
+            return self.text.rstrip('\n')
+        return 'Unit Test Results: {0}\nError:  {1}'.format(self.file_name,
+                                                           self.error)
+
+
+def run_unit_test_job(job, translate, run, cleanup=None):
+    """
+    Translates and runs a single Unit Test file and returns its results.
+
+    Keyword arguments:
+    job - A UnitTestJob.
+    translate - A callable taking the Unit Test file name that translates it
+        and returns True if it translated.
+    run - A callable taking the Unit Test file name that runs it and waits
+        for it to finish.
+    cleanup - If specified, a callable taking the job that is called once
+        the results have been read.
+
+    """
+    try:
+        logger.debug('Translating %s', job.unit_test_file_name)
+        if not translate(job.unit_test_file_name):
+            return UnitTestResults(job.file_name,
+                                   error='Translating Unit Test file failed')
+
+        logger.debug('Running %s', job.unit_test_file_name)
+        run(job.unit_test_file_name)
+
+        with open(job.results_file_name, 'r') as f:
+            return UnitTestResults(job.file_name, text=f.read())
+    except OSError as e:
+        logger.error('Running Unit Test for %s failed: %s', job.file_name, e)
+        return UnitTestResults(job.file_name, error=str(e))
+    finally:
+        if cleanup is not None:
+            cleanup(job)
+
+
+def run_unit_test_jobs(jobs, translate, run, cleanup=None, max_workers=4):
+    """
+    Runs UnitTestJobs on a bounded pool of worker threads and returns a list
+    of UnitTestResults in the same order as jobs.
+
+    Keyword arguments:
+    jobs - An iterable of UnitTestJobs.
+    translate - See run_unit_test_job.
+    run - See run_unit_test_job.
+    cleanup - See run_unit_test_job.
+    max_workers - The maximum number of Unit Test files to translate and run
+        at once.
+
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers) as executor:
+        futures = [executor.submit(run_unit_test_job, job, translate, run,
+                                   cleanup)
+                   for job in jobs]
+        return [f.result() for f in futures]
+
+
+def format_summary(results):
+    """
+    Merges a list of UnitTestResults into a single report with the overall
+    pass and fail counts at the top.
+
+    """
+    passed = sum(r.passed for r in results)
+    failed = sum(r.failed for r in results)
+    total = passed + failed
+    errors = sum(1 for r in results if r.error is not None)
+
+    lines = ['Unit Test Summary: {0} files'.format(len(results)),
+             'Passed:  {0}/{1}     Failed:  {2}/{1}'.format(passed, total,
+                                                             failed)]
+    if errors:
+        lines.append('Errors:  {0}'.format(errors))
+    elif failed == 0:
+        lines.append('**All Tests Passed**')
+    lines.append('')
+
+    for r in results:
+        lines.append(r.format())
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+RESULTS_SUBROUTINE_MATCHER = re.compile(r"^:Code (.+)$", re.MULTILINE)
+RESULTS_PASSED_MATCHER = re.compile(r"Unit Test: (.+?) - Passed")
+RESULTS_FAILED_MATCHER = re.compile(r"Unit Test: (.+?) - Failed")
+
+
+def split_results(text):
+    """
+    Splits the text of a results file into an OrderedDict mapping each
+    subroutine name to the block of results logged for it.
+
+    """
+    blocks = OrderedDict()
+    matches = list(RESULTS_SUBROUTINE_MATCHER.finditer(text))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        end = len(text) if next_match is None else next_match.start()
+        blocks[match.group(1).strip()] = text[match.start():end].rstrip('\n')
+    return blocks
+
+
+def format_results(file_name, blocks):
+    """
+    Builds the text of a results file, in the format written by
+    UnitTestTemplate_WriteResults, from blocks of subroutine results.
+
+    """
+    text = '\n'.join(blocks)
+    passed = len(RESULTS_PASSED_MATCHER.findall(text))
+    failed = len(RESULTS_FAILED_MATCHER.findall(text))
+    total = passed + failed
+
+    lines = ['Unit Test Results: {0}'.format(file_name),
+             'Passed:  {0}/{1}     Failed:  {2}/{1}'.format(passed, total,
+                                                             failed)]
+    if failed == 0:
+        lines.append('**All Tests Passed**')
+    lines.append('')
+    for b in blocks:
+        lines.append(b)
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+_file_hashes = LimitedSizeDict(size_limit=500)
+
+
+def hash_file(file_name):
+    """
+    Returns a hash of the contents of a file. Hashes are reused until the
+    modified time or size of the file changes.
+
+    """
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return ''
+
+    key = (file_name.lower(), stat.st_mtime, stat.st_size)
+    try:
+        return _file_hashes[key]
+    except KeyError:
+        pass
+
+    with open(file_name, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    _file_hashes[key] = digest
+    return digest
+
+
+class UnitTestResultCache(object):
+    """
+    Caches the results logged for each subroutine by a Unit Test run. The
+    key covers everything that can change the results of a subroutine:
+    its source, the source of the subroutines it calls in the same file,
+    the rest of the file outside of its :Code members, the code generated
+    for its tests and the contents of the files it includes.
+
+    """
+
+    Results = LimitedSizeDict(size_limit=1000)
+
+    @classmethod
+    def get_keys(cls, contents, subroutines, include_hashes=()):
+        """
+        Returns a dictionary mapping each subroutine name to its cache key.
+
+        Keyword arguments:
+        contents - The contents of the Focus file.
+        subroutines - The Subroutines from the file with Unit Tests.
+        include_hashes - Hashes of the files included by the Focus file.
+
+        """
+        members = get_code_members(contents)
+        environment = contents
+        for code in members.values():
+            environment = environment.replace(code, '')
+
+        shared = hashlib.sha1(environment.encode('utf-8'))
+        for h in include_hashes:
+            shared.update(h.encode('utf-8'))
+
+        keys = dict()
+        for s in subroutines:
+            key = shared.copy()
+            key.update(s.format_for_unit_test().encode('utf-8'))
+
+            called = [s.subroutine_name]
+            for name in called:
+                code = members.get(name)
+                if code is None:
+                    continue
+                key.update(code.encode('utf-8'))
+                for m in CALL_SUB_MATCHER.finditer(code):
+                    if m.group(1) not in called:
+                        called.append(m.group(1))
+
+            keys[s.subroutine_name] = key.hexdigest()
+
+        return keys
+
+    @classmethod
+    def get(cls, key):
+        try:
+            return cls.Results[key]
+        except KeyError:
+            return None
+
+    @classmethod
+    def add(cls, key, block):
+        cls.Results[key] = block
+
+
+class UnitTestPlan(object):
+    """
+    Works out which subroutines in a Focus file need their Unit Tests run,
+    using the results in the UnitTestResultCache for everything else.
+
+    """
+
+    def __init__(self, file_name, contents, include_hashes=()):
+        super(UnitTestPlan, self).__init__()
+        self.file_name = file_name
+        self.subroutines = get_unit_test_subroutines(contents)
+        self.keys = UnitTestResultCache.get_keys(contents, self.subroutines,
+                                                 include_hashes)
+
+        self.cached = dict()
+        self.pending = []
+        for s in self.subroutines:
+            block = UnitTestResultCache.get(self.keys[s.subroutine_name])
+            if block is None:
+                self.pending.append(s)
+            else:
+                self.cached[s.subroutine_name] = block
+
+        logger.debug('%s: %s cached, %s to run', file_name,
+                     len(self.cached), len(self.pending))
+
+    def get_results(self, results=None):
+        """
+        Returns UnitTestResults for every subroutine in the file, combining
+        the cached results with those from running the pending subroutines.
+        Results for the pending subroutines are added to the cache.
+
+        Keyword arguments:
+        results - The UnitTestResults from running the pending subroutines.
+
+        """
+        blocks = dict(self.cached)
+        if results is not None:
+            if results.error is not None:
+                return results
+
+            for name, block in split_results(results.text).items():
+                blocks[name] = block
+                if name in self.keys:
+                    UnitTestResultCache.add(self.keys[name], block)
+
+        return UnitTestResults(
+            self.file_name,
+            text=format_results(self.file_name,
+                                [blocks[s.subroutine_name] for s in
+                                 self.subroutines if
+                                 s.subroutine_name in blocks]))
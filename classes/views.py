@@ -7,7 +7,10 @@ import sublime
 
 from .metaclasses import MiniPluginMeta
 from .code_blocks import CodeBlock, InvalidCodeBlockError
+from .codeblock_analysis import CodeBlockAnalysisCache
 from .compatibility import FSCompatibility, FocusCompatibility
+from .member_map import MemberMap
+from .translator_tree import TranslatorTree
 from ..tools.sublime import scope_from_view
 
 
@@ -77,6 +80,69 @@ class RingView(object, metaclass=MiniPluginMeta):
         else:
             return self.view.name()
 
+    @property
+    def codeblock_analysis(self):
+        try:
+            return self._codeblock_analysis
+        except AttributeError:
+            self._codeblock_analysis = CodeBlockAnalysisCache(self.view)
+            return self._codeblock_analysis
+
+    @property
+    def member_map(self):
+        """
+        Returns the MemberMap for the view, updated to the current contents
+        if the view has been modified since it was last used. Only the lines
+        that changed are reparsed.
+
+        """
+        change_count = self.view.change_count()
+        try:
+            member_map = self._member_map
+        except AttributeError:
+            member_map = self._member_map = MemberMap()
+            self._member_map_change_count = None
+
+        if self._member_map_change_count != change_count:
+            member_map.update(self.get_contents())
+            self._member_map_change_count = change_count
+
+        return member_map
+
+    def get_source_tree(self):
+        """
+        Returns the SourceTree for the view. The contents are only hashed
+        again if the view has been modified since it was last used.
+
+        """
+        change_count = self.view.change_count()
+        try:
+            if self._source_tree_change_count == change_count:
+                return self._source_tree
+        except AttributeError:
+            pass
+
+        self._source_tree = super(RingView, self).get_source_tree()
+        self._source_tree_change_count = change_count
+        return self._source_tree
+
+    def get_member_region(self, point):
+        if isinstance(point, tuple):
+            point = point[0]
+        return self.member_map.get_member_region(point)
+
+    def get_member_regions(self, keywords=None):
+        """
+        Returns a list of (start, end) tuples for the members in the view.
+
+        Keyword arguments:
+        keywords - If specified, only members starting with one of these
+            keywords are returned.
+
+        """
+        return [(start, end) for keyword, start, end in
+                self.member_map.members if
+                (keywords is None) or (keyword in keywords)]
 
     def get_contents(self):
         return self.view.substr(sublime.Region(0, self.view.size()))
@@ -169,6 +235,35 @@ class FocusView(RingView, FocusCompatibility):
                            self.file_name, row, col)
             return None
 
+    @property
+    def translator_tree(self):
+        """
+        Returns the TranslatorTree for the view, updated to the current
+        contents if the view has been modified since it was last used. The
+        whole view is read and compared on each change, and only the lines
+        that differ are parsed again.
+
+        """
+        change_count = self.view.change_count()
+        try:
+            tree = self._translator_tree
+        except AttributeError:
+            tree = self._translator_tree = TranslatorTree()
+            self._translator_tree_change_count = None
+
+        if self._translator_tree_change_count != change_count:
+            tree.update(self.get_contents())
+            self._translator_tree_change_count = change_count
+
+        return tree
+
+    def build_translator_tree(self, point, trim_containers=False):
+        """Builds a list of (Translator option, Value)"""
+        row, _ = self.view.rowcol(point)
+        translator_tree = self.translator_tree.get_tree(row, trim_containers)
+        logger.debug('translator_tree = %s', translator_tree)
+        return translator_tree
+
     def extract_fs_function(self, point=None):
         return super(FocusView, self).extract_fs_function(point)
 
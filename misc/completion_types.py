@@ -8,6 +8,7 @@ CT_EXTERNAL_PAGESET = 'ExternalPageSet'
 CT_STATE = 'State'
 CT_SYSTEM = 'System'
 CT_SUBROUTINE_LOCAL = 'Subroutine Local'
+CT_RT_TOOL = 'RT Tool'
 
 CT_OBJECT = "Object"
 CT_RECORD = "Record"
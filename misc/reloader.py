@@ -32,20 +32,40 @@ mod_prefix = 'MTFocusCommon.'
 
 mods_load_order = [
     'tools.general',
+    'tools.mls',
     'tools.focus',
     'tools.load_translator_completions',
     'tools.settings',
     'tools.snippets',
+    'tools.scanner',
     'tools.sublime',
     'tools',
 
     'classes',
+    'classes.translator_tree',
+    'classes.member_map',
+    'classes.source_tree',
+    'classes.include_closure',
+    'classes.analysis',
+    'classes.ring_index',
     'classes.compatibility',
     'classes.metaclasses',
+    'classes.codeblock_analysis',
     'classes.code_blocks',
+    'classes.completion_store',
+    'classes.file_watcher',
+    'classes.include_summary',
+    'classes.loader_scheduler',
+    'classes.ring_queries',
+    # classes.analysis_server isn't reloaded, so its server keeps running
+    # classes.process_supervisor isn't reloaded, so running jobs stay listed
+    'classes.manifest',
+    'classes.prefetch',
+    'classes.tool_index',
     'classes.rings',
     'classes.ring_files',
     'classes.views',
+    'classes.unit_tests',
 
     'Lib.bs4'
 ]
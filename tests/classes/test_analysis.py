@@ -0,0 +1,103 @@
+from ...classes import analysis
+from ...classes.analysis import (
+    ERROR,
+    WARNING,
+    FolderResolver,
+    analyze,
+    analyze_file,
+    format_diagnostic
+)
+
+
+SOURCE = """#Include
+  :Source
+    Folder    Hha
+    File      HhaZ.Tools.I.focus
+  :Source
+    Folder    Hha
+    File      HhaZ.Missing.I.focus
+
+#Locals
+  :Name                           Total
+  // Running total
+
+  :Name                           Count
+
+#Magic
+:Code Main
+@GetLocal(Total)@PutLocal(Count),
+@PutLocal(Undeclared),
+// @GetLocal(Commented)
+@CallSub(Used),
+@FileBatchesWhile(Obj,Batch);
+
+:Code Used
+@Nil;
+
+:Code Batch
+@Nil;
+
+:Code Unused
+@Nil;
+"""
+
+
+def codes(diagnostics):
+    return [(d.code, SOURCE[d.span[0]:d.span[1]]) for d in diagnostics]
+
+
+def test_analyze():
+    assert codes(analyze(SOURCE, 'HhaZ.Test.S.focus')) == [
+        ('undocumented-local', 'Count'),
+        ('undeclared-local', 'Undeclared'),
+        ('uncalled-subroutine', 'Unused'),
+    ]
+
+
+def test_analyze_severities():
+    severities = {d.code: d.severity for d in analyze(SOURCE)}
+    assert severities['undeclared-local'] == ERROR
+    assert severities['uncalled-subroutine'] == WARNING
+
+
+def test_analyze_include_file():
+    assert 'uncalled-subroutine' not in [
+        d.code for d in analyze(SOURCE, 'HhaZ.Test.I.focus')]
+
+
+def test_analyze_includes():
+    def resolve_many(partial_paths):
+        return {p: (p if 'Tools' in p else None) for p in partial_paths}
+
+    assert ('missing-include', 'HhaZ.Missing.I.focus') in codes(
+        analyze(SOURCE, resolve_many=resolve_many))
+
+
+def test_analyze_cached(monkeypatch):
+    analyze(SOURCE, 'HhaZ.Cached.S.focus')
+
+    def fail(*args):
+        raise AssertionError('Checked cached contents again')
+
+    monkeypatch.setattr(analysis, 'check_locals', fail)
+    assert len(analyze(SOURCE, 'HhaZ.Cached.S.focus')) == 3
+
+
+def test_format_diagnostic():
+    diagnostic = analyze(SOURCE)[1]
+    assert format_diagnostic('Test.focus', SOURCE, diagnostic) == (
+        'Test.focus:18:11: error undeclared-local: '
+        'Local Undeclared is not declared in #Locals')
+
+
+def test_analyze_file(tmpdir):
+    ring = tmpdir.mkdir('DEV.Ring')
+    ring.mkdir('PgmSource').mkdir('Hha').join('HhaZ.Tools.I.focus').write('')
+    file_name = str(ring.join('PgmSource', 'Hha', 'HhaZ.Test.S.focus'))
+    with open(file_name, 'w') as f:
+        f.write(SOURCE)
+
+    lines = analyze_file(file_name, FolderResolver(str(ring)))
+    assert len(lines) == 4
+    assert all(l.startswith(file_name + ':') for l in lines)
+    assert 'HhaZ.Missing.I.focus does not exist' in lines[0]
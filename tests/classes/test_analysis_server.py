@@ -0,0 +1,110 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+from ...classes import analysis_server
+from ...classes.analysis_server import (
+    METHOD_NOT_FOUND,
+    REQUEST_CANCELLED,
+    AnalysisClient,
+    AnalysisServer,
+    AnalysisServerError
+)
+from .test_analysis import SOURCE
+
+
+INCLUDE = """#Magic
+:Code Tool
+@Nil;
+"""
+
+
+def serve(*messages):
+    input_stream = io.StringIO(
+        '\n'.join(json.dumps(m) for m in messages) + '\n')
+    output_stream = io.StringIO()
+    AnalysisServer(input_stream, output_stream, max_workers=1).serve()
+    responses = [json.loads(l) for l in
+                 output_stream.getvalue().splitlines()]
+    return {r['id']: r for r in responses}
+
+
+@pytest.fixture
+def ring(tmpdir):
+    ring = tmpdir.mkdir('DEV.Ring')
+    hha = ring.mkdir('PgmSource').mkdir('Hha')
+    hha.join('HhaZ.Test.S.focus').write(SOURCE)
+    hha.join('HhaZ.Tools.I.focus').write(INCLUDE)
+    return ring
+
+
+def test_analyze():
+    responses = serve({'id': 1, 'method': 'analyze',
+                       'params': {'contents': SOURCE}})
+    assert [d['code'] for d in responses[1]['result']] == [
+        'undocumented-local', 'undeclared-local', 'uncalled-subroutine']
+
+
+def test_ring_queries(ring):
+    hha = ring.join('PgmSource', 'Hha')
+    file_name = str(hha.join('HhaZ.Test.S.focus'))
+    responses = serve(
+        {'id': 1, 'method': 'includeFiles',
+         'params': {'pgmsourcePath': str(ring.join('PgmSource'))}},
+        {'id': 2, 'method': 'findMember',
+         'params': {'fileName': file_name, 'name': 'Tool',
+                    'searchPaths': [str(ring)]}},
+        {'id': 3, 'method': 'findAlias',
+         'params': {'alias': 'Missing', 'fileName': file_name,
+                    'aliasListPath': None, 'searchPaths': [str(ring)]}})
+    assert responses[1]['result'] == [['HhaZ.Tools.I.focus'], []]
+    assert responses[2]['result'] == [str(hha.join('HhaZ.Tools.I.focus')),
+                                      [13, 17]]
+    assert responses[3]['result'] is None
+
+
+def test_unknown_method():
+    responses = serve({'id': 1, 'method': 'format'})
+    assert responses[1]['error']['code'] == METHOD_NOT_FOUND
+
+
+def test_cancel():
+    server = AnalysisServer(io.StringIO(), io.StringIO())
+    server._pending.add(1)
+    server.cancel(1)
+    server.handle({'id': 1, 'method': 'analyze',
+                   'params': {'contents': SOURCE}})
+    response = json.loads(server.output_stream.getvalue())
+    assert response['error']['code'] == REQUEST_CANCELLED
+
+
+def test_shutdown():
+    responses = serve({'id': 1, 'method': 'shutdown'},
+                      {'id': 2, 'method': 'analyze',
+                       'params': {'contents': SOURCE}})
+    assert list(responses) == [1]
+
+
+def test_client(ring):
+    package_folder = os.path.dirname(os.path.dirname(
+        os.path.dirname(os.path.abspath(analysis_server.__file__))))
+    client = AnalysisClient(
+        [sys.executable, '-m', analysis_server.__name__], cwd=package_folder)
+    try:
+        file_name = str(ring.join('PgmSource', 'Hha', 'HhaZ.Test.S.focus'))
+        future = client.request('analyze', contents=SOURCE,
+                                fileName=file_name, searchPaths=[str(ring)])
+        missing = [d['message'] for d in future.result(10) if
+                   d['code'] == 'missing-include']
+        assert len(missing) == 1
+        assert 'HhaZ.Missing.I.focus' in missing[0]
+
+        with pytest.raises(AnalysisServerError):
+            client.request('format').result(10)
+    finally:
+        client.close()
+
+    assert not client.is_alive()
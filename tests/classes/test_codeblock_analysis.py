@@ -0,0 +1,124 @@
+import re
+
+from ...classes.codeblock_analysis import CodeBlockAnalysisCache
+
+
+CODE = """^{A,B},
+IF{A>B A;B}^Total,
+"Count"^C,
+@Nil^Sum,
+@Z1^A,
+@a12^B,
+// Skipped
+Total+Sum"""
+
+
+class FakeRegion(object):
+
+    def __init__(self, begin, end):
+        self._begin = begin
+        self._end = end
+
+    def begin(self):
+        return self._begin
+
+    def end(self):
+        return self._end
+
+
+class FakeView(object):
+    """
+    A view whose scopes mark every word outside of strings and comments as
+    a variable, which is close enough to the Focus syntax for these tests.
+
+    """
+
+    NOT_VARIABLE_MATCHER = re.compile(r'"[^"]*"|//.*|IF')
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.changes = 0
+        self.scope_checks = 0
+
+    def change_count(self):
+        return self.changes
+
+    def substr(self, region):
+        return self.contents[region.begin():region.end()]
+
+    def match_selector(self, point, selector):
+        self.scope_checks += 1
+        assert selector == 'meta.variable.other'
+        return not any(m.start() <= point < m.end() for m in
+                       self.NOT_VARIABLE_MATCHER.finditer(self.contents))
+
+    def edit(self, contents):
+        self.contents = contents
+        self.changes += 1
+
+
+def get_code_region(view, code=CODE):
+    start = view.contents.index(code)
+    return FakeRegion(start, start + len(code))
+
+
+def test_arguments():
+    view = FakeView(CODE)
+    arguments, _, _ = CodeBlockAnalysisCache(view).get(get_code_region(view))
+    assert arguments == {'A', 'B'}
+
+    view = FakeView('^A,\nA+1')
+    arguments, _, _ = CodeBlockAnalysisCache(view).get(get_code_region(
+        view, view.contents))
+    assert arguments == {'A'}
+
+
+def test_variables():
+    view = FakeView(CODE)
+    _, variables, _ = CodeBlockAnalysisCache(view).get(get_code_region(view))
+    names = [v for v, start, end in variables]
+
+    assert set(names) == {'A', 'B', 'C', 'Total', 'Sum'}
+    assert names.count('Total') == 2
+    assert 'Count' not in names
+    assert 'Nil' not in names
+    assert 'Skipped' not in names
+
+    for name, start, end in variables:
+        assert CODE[start:end] == name
+
+
+def test_sets():
+    view = FakeView(CODE)
+    _, _, sets = CodeBlockAnalysisCache(view).get(get_code_region(view))
+    assert [(s, CODE[start:end]) for s, start, end in sets] == [
+        ('@Z1', '@Z1'), ('@a12', '@a12')]
+
+
+def test_reused_after_edit_elsewhere():
+    view = FakeView('#Magic\n:Code Add\n' + CODE)
+    cache = CodeBlockAnalysisCache(view)
+    first = cache.get(get_code_region(view))
+    checks = view.scope_checks
+
+    view.edit('#Magic\n:Code Other\n@Nil;\n\n:Code Add\n' + CODE)
+    region = get_code_region(view)
+    assert cache.get(region) is first
+    assert view.scope_checks == checks
+
+    # Results are relative to the region, so they still line up
+    _, variables, _ = first
+    name, start, end = variables[0]
+    assert view.substr(FakeRegion(region.begin() + start,
+                                  region.begin() + end)) == name
+
+
+def test_edit_within_code():
+    view = FakeView(CODE)
+    cache = CodeBlockAnalysisCache(view)
+    first = cache.get(get_code_region(view))
+
+    view.edit(CODE.replace('Total+Sum', 'Total+Sum+D'))
+    second = cache.get(get_code_region(view, view.contents))
+    assert second is not first
+    assert 'D' in [v for v, start, end in second[1]]
@@ -0,0 +1,138 @@
+import gc
+import json
+import tracemalloc
+
+import pytest
+
+from ...classes.completion_store import (
+    CompactCompletions,
+    match_completions
+)
+
+
+NAMES = ['HhaPat.Name', 'HhaPat.Age', 'HhaPat.Main.Urn', 'Visit', 'HhaAdm.Urn']
+
+
+def test_iterate():
+    completions = CompactCompletions(NAMES)
+    assert len(completions) == 5
+    assert set(completions) == set((n,) for n in NAMES)
+    assert completions.get_names() == sorted(NAMES)
+
+
+def test_formats():
+    completions = CompactCompletions(['Tools', 'Add'], '@@{0}()', '{0}()')
+    assert set(completions) == {('@@Tools()', 'Tools()'),
+                                ('@@Add()', 'Add()')}
+    assert ('@@Add()', 'Add()') in completions
+    assert ('@@Add()', 'Other()') not in completions
+    assert ('Add',) not in completions
+    assert None not in completions
+
+
+def test_set_operations():
+    completions = CompactCompletions(NAMES)
+    assert completions == set((n,) for n in NAMES)
+    assert (completions | {('Other',)}) == set(
+        (n,) for n in NAMES + ['Other'])
+    assert isinstance(completions & {('Visit',)}, set)
+
+
+def test_match():
+    completions = CompactCompletions(NAMES, '{0}\tInclude', '{0}')
+    assert completions.match('HhaPat.') == [
+        ('HhaPat.Age\tInclude', 'HhaPat.Age'),
+        ('HhaPat.Main.Urn\tInclude', 'HhaPat.Main.Urn'),
+        ('HhaPat.Name\tInclude', 'HhaPat.Name')]
+    assert len(completions.match('Hha', limit=2)) == 2
+    assert completions.match('Zzz') == []
+    assert completions.match('hhapat.n') == [
+        ('HhaPat.Name\tInclude', 'HhaPat.Name')]
+
+
+def test_merge():
+    completions = CompactCompletions.merge(
+        [CompactCompletions(['HhaPat.Name', 'Visit']),
+         CompactCompletions(['HhaPat.Age', 'HhaPat.Name', 'alpha'])],
+        '@@{0}()', '{0}()')
+    assert completions.get_names() == ['alpha', 'HhaPat.Age', 'HhaPat.Name',
+                                       'Visit']
+    assert ('@@Visit()', 'Visit()') in completions
+
+
+def test_state():
+    completions = CompactCompletions(NAMES)
+    state = json.loads(json.dumps(completions.get_state()))
+    assert CompactCompletions.from_state(state) == completions
+
+
+def test_match_completions():
+    completions = {'Object': CompactCompletions(['HhaPat', 'HhaAdm']),
+                   'Field': CompactCompletions(['HhaPat.Name'])}
+    assert match_completions(completions, ['Object', 'Field'], 'HhaP',
+                             10) == [('HhaPat',), ('HhaPat.Name',)]
+    assert match_completions(completions, ['Object'], 'Hha', 1) == [
+        ('HhaAdm',)]
+    assert match_completions({'Object': {('HhaPat',)}}, ['Object'], '',
+                             10) is None
+
+
+def test_empty():
+    completions = CompactCompletions()
+    assert len(completions) == 0
+    assert list(completions) == []
+    assert completions.match('') == []
+
+
+def measure(build):
+    """
+    Returns the result of build and the memory it still holds after every
+    completion in it has been iterated and a few have been matched.
+
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        for completion in result:
+            pass
+        if isinstance(result, CompactCompletions):
+            result.match('Hha', 500)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+@pytest.mark.parametrize('count', [200000])
+def test_memory_benchmark(count):
+    """
+    Compares the memory held by a CompactCompletions with the sets of
+    tuples the loaders used to build, for Datadef elements and aliases.
+
+    """
+    objects = ['HhaObject%d' % i for i in range(count // 20)]
+
+    def object_names():
+        return (o + '.' + 'Field%d' % j for o in objects for j in range(20))
+
+    old_objects, old_size = measure(
+        lambda: set((n,) for n in object_names()))
+    new_objects, new_size = measure(
+        lambda: CompactCompletions(object_names()))
+    assert len(new_objects) == len(old_objects)
+    assert new_size * 4 < old_size, (
+        'Datadef elements: %d bytes as tuples, %d bytes compact' %
+        (old_size, new_size))
+
+    aliases = ['HhaAlias%d' % i for i in range(count // 2)]
+    old_aliases, old_size = measure(
+        lambda: set(('@@%s()' % a, '%s()' % a) for a in aliases))
+    new_aliases, new_size = measure(
+        lambda: CompactCompletions(aliases, '@@{0}()', '{0}()'))
+    assert new_aliases == old_aliases
+    assert new_size * 4 < old_size, (
+        'Aliases: %d bytes as tuples, %d bytes compact' %
+        (old_size, new_size))
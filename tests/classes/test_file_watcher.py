@@ -0,0 +1,156 @@
+import os
+
+from ...classes import file_watcher
+from ...tools.general import DirectoryListing
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def touch(path, offset=10):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + offset))
+
+
+def events(watcher):
+    return sorted((os.path.relpath(e.path, watcher.root), e.kind) for e in
+                  watcher.poll())
+
+
+def make_watcher(tmpdir):
+    watcher = file_watcher.FileWatcher(clock=Clock())
+    watcher.root = str(tmpdir)
+    return watcher
+
+
+def test_poll(tmpdir):
+    app = tmpdir.mkdir('Hha')
+    app.join('HhaA.S.focus').write('A')
+    app.join('HhaB.S.focus').write('B')
+
+    watcher = make_watcher(tmpdir)
+    watcher.watch(str(tmpdir), interval=2, depth=1)
+    assert events(watcher) == []
+
+    app.join('HhaC.S.focus').write('C')
+    app.join('HhaA.S.focus').remove()
+    app.join('HhaB.S.focus').write('Longer')
+    assert events(watcher) == []
+
+    watcher.clock.now = 2
+    changes = events(watcher)
+    assert (os.path.join('Hha', 'HhaA.S.focus'), 'removed') in changes
+    assert (os.path.join('Hha', 'HhaB.S.focus'), 'modified') in changes
+    assert (os.path.join('Hha', 'HhaC.S.focus'), 'added') in changes
+
+
+def test_depth(tmpdir):
+    app = tmpdir.mkdir('Hha')
+    app.join('HhaA.S.focus').write('A')
+
+    watcher = make_watcher(tmpdir)
+    watcher.watch(str(tmpdir), interval=1)
+    events(watcher)
+
+    app.join('HhaA.S.focus').write('Changed')
+    touch(str(app.join('HhaA.S.focus')))
+    watcher.clock.now = 1
+    assert events(watcher) == []
+
+    app.join('HhaB.S.focus').write('B')
+    touch(str(app))
+    watcher.clock.now = 2
+    assert events(watcher) == [('Hha', 'modified')]
+
+
+def test_tiered_intervals(tmpdir):
+    fast = tmpdir.mkdir('fast')
+    slow = tmpdir.mkdir('slow')
+    watcher = make_watcher(tmpdir)
+    watcher.watch(str(fast), interval=2)
+    watcher.watch(str(slow), interval=30)
+    events(watcher)
+
+    fast.join('a').write('a')
+    slow.join('b').write('b')
+    watcher.clock.now = 2
+    assert events(watcher) == [(os.path.join('fast', 'a'), 'added')]
+    watcher.clock.now = 30
+    assert events(watcher) == [(os.path.join('slow', 'b'), 'added')]
+
+
+def test_unreachable_folder(tmpdir):
+    folder = tmpdir.mkdir('server')
+    folder.join('a').write('a')
+    watcher = make_watcher(tmpdir)
+    watcher.watch(str(folder), interval=1)
+    events(watcher)
+
+    folder.rename(tmpdir.join('gone'))
+    watcher.clock.now = 1
+    assert events(watcher) == []
+
+    tmpdir.join('gone').rename(folder)
+    watcher.clock.now = 2
+    assert events(watcher) == []
+
+
+def test_subscribers(tmpdir):
+    first = tmpdir.mkdir('first')
+    second = tmpdir.mkdir('firstsecond')
+    watcher = make_watcher(tmpdir)
+    for folder in (first, second):
+        watcher.watch(str(folder), interval=1)
+    events(watcher)
+
+    received = {}
+    watcher.subscribe('all', lambda e: received.setdefault('all', e))
+    watcher.subscribe('first', lambda e: received.setdefault('first', e),
+                      str(first))
+    watcher.subscribe('failing', lambda e: 1 / 0)
+
+    first.join('a').write('a')
+    second.join('b').write('b')
+    watcher.clock.now = 1
+    watcher.poll()
+    assert len(received['all']) == 2
+    assert [e.path for e in received['first']] == [str(first.join('a'))]
+
+
+def test_invalidate_listings(tmpdir):
+    folder = tmpdir.mkdir('Hha')
+    folder.join('HhaA.S.focus').write('A')
+    listing = DirectoryListing.get_listing(str(folder))
+    assert DirectoryListing.get_listing(str(folder)) is listing
+
+    file_watcher.invalidate_listings([file_watcher.ChangeEvent(
+        str(folder.join('HhaB.S.focus')), file_watcher.ADDED)])
+    assert DirectoryListing.get_listing(str(folder)) is not listing
+
+
+def test_registrations_survive_restart(tmpdir):
+    file_watcher.stop_file_watcher()
+    registered = []
+    file_watcher.register_with_file_watcher(
+        'test', lambda w: w.watch(str(tmpdir)) or registered.append(w))
+    try:
+        assert file_watcher._file_watcher is None
+        assert registered == []
+
+        first = file_watcher.get_file_watcher()
+        assert first.is_watched(str(tmpdir))
+
+        file_watcher.stop_file_watcher()
+        second = file_watcher.get_file_watcher()
+        assert second is not first
+        assert second.is_watched(str(tmpdir))
+        assert registered == [first, second]
+    finally:
+        file_watcher._registrations.pop('test', None)
+        file_watcher.stop_file_watcher()
@@ -0,0 +1,127 @@
+import pytest
+
+from ...classes.include_closure import IncludeClosures
+
+
+class Graph(object):
+    """An include graph with versions that tests can change."""
+
+    def __init__(self, edges):
+        self.edges = edges
+        self.versions = dict()
+        self.parsed = []
+
+    def get_includes(self, file_name):
+        self.parsed.append(file_name)
+        return self.edges.get(file_name, [])
+
+    def get_version(self, file_name):
+        return self.versions.get(file_name, 1)
+
+    def get_folders(self, file_name):
+        # Each file's includes are looked for in a folder named after it
+        return [file_name + 'Includes']
+
+    def closures(self):
+        return IncludeClosures(self.get_includes, self.get_version,
+                               self.get_folders)
+
+
+@pytest.fixture
+def diamond():
+    return Graph({'A': ['B', 'C'],
+                  'B': ['D', 'E'],
+                  'C': ['D', 'F'],
+                  'D': ['G']})
+
+
+def test_order(diamond):
+    closure = diamond.closures().get_closure('A')
+    assert closure.files == ('B', 'C', 'D', 'E', 'G', 'F')
+    assert closure.cycles == ()
+
+
+def test_shared_subclosures(diamond):
+    closures = diamond.closures()
+    closures.get_closure('A')
+    assert sorted(diamond.parsed) == ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
+    diamond.parsed = []
+    assert closures.get_closure('C').files == ('D', 'F', 'G')
+    assert closures.get_closure('A').files == ('B', 'C', 'D', 'E', 'G', 'F')
+    assert diamond.parsed == []
+
+
+def test_changed_file(diamond):
+    closures = diamond.closures()
+    closures.get_closure('A')
+
+    diamond.parsed = []
+    diamond.edges['G'] = ['H']
+    diamond.versions['G'] = 2
+    assert closures.get_closure('A').files == (
+        'B', 'C', 'D', 'E', 'G', 'H', 'F')
+    assert diamond.parsed == ['G', 'H']
+
+
+def test_invalidate(diamond):
+    closures = diamond.closures()
+    closures.get_closure('A')
+    diamond.parsed = []
+    closures.invalidate()
+    closures.get_closure('A')
+    assert len(diamond.parsed) == 7
+
+
+def test_invalidate_folders(diamond):
+    closures = diamond.closures()
+    closures.get_closure('A')
+    closures.get_closure('E')
+
+    diamond.parsed = []
+    closures.invalidate_folders(['DIncludes'])
+    assert closures.get_closure('E').files == ()
+    assert diamond.parsed == []
+    assert closures.get_closure('A').files == ('B', 'C', 'D', 'E', 'G', 'F')
+    assert diamond.parsed == ['D']
+
+
+def test_direct_includes(diamond):
+    closures = diamond.closures()
+    assert closures.get_direct_includes('A') == ('B', 'C')
+    assert closures.get_direct_includes('A') == ('B', 'C')
+    assert diamond.parsed == ['A']
+
+
+def test_cycle():
+    graph = Graph({'A': ['B'], 'B': ['C'], 'C': ['A', 'D']})
+    closures = graph.closures()
+    closure = closures.get_closure('A')
+    assert closure.files == ('B', 'C', 'D')
+    assert closure.cycles == (('A', 'B', 'C', 'A'),)
+
+    # B's closure reuses A's, so the cycle is reported as found from A
+    closure = closures.get_closure('B')
+    assert closure.files == ('C', 'A', 'D')
+    assert closure.cycles == (('A', 'B', 'C', 'A'),)
+
+    # The closures of B and C were cut short by the cycle, so they weren't
+    # kept while computing A's
+    closure = graph.closures().get_closure('B')
+    assert closure.files == ('C', 'A', 'D')
+    assert closure.cycles == (('B', 'C', 'A', 'B'),)
+
+
+def test_cycle_logged_once(caplog):
+    closures = Graph({'A': ['B'], 'B': ['A']}).closures()
+    closures.get_closure('A')
+    closures.get_closure('A')
+    assert len([r for r in caplog.records if
+                r.getMessage().startswith('Include cycle')]) == 1
+
+
+def test_self_include():
+    graph = Graph({'A': ['A', 'B']})
+    closure = graph.closures().get_closure('A')
+    assert closure.files == ('B',)
+    assert closure.cycles == (('A', 'A'),)
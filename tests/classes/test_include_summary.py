@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from ...classes.include_summary import (
+    IncludeSummaryCache,
+    summarize_include
+)
+
+
+class FakeIncludeFile(object):
+
+    def get_defined_aliases(self):
+        return {'Tools'}
+
+    def get_used_locals(self):
+        return {'Total'}
+
+    def get_defined_locals(self):
+        return {'Count'}
+
+    def get_defined_objects(self):
+        return {'Object': {'HhaPat'}, 'Field': {'HhaPat.Name'}}
+
+    def get_defined_subroutines(self):
+        return {'Add'}
+
+    def get_defined_lists(self):
+        return {'Values'}
+
+
+class Builder(object):
+
+    def __init__(self):
+        self.built = []
+        self.versions = dict()
+
+    def build(self, file_name):
+        self.built.append(file_name)
+        return summarize_include(FakeIncludeFile())
+
+    def get_version(self, file_name):
+        return self.versions.get(file_name, 1)
+
+
+@pytest.fixture
+def builder():
+    return Builder()
+
+
+@pytest.fixture
+def cache(builder):
+    return IncludeSummaryCache(builder.build, builder.get_version)
+
+
+def test_summarize_include():
+    summary = summarize_include(FakeIncludeFile())
+    assert summary.aliases == {'Tools'}
+    assert summary.locals == {'Total', 'Count'}
+    assert summary.objects['Field'] == {'HhaPat.Name'}
+    assert summary.subroutines == {'Add'}
+    assert summary.lists == {'Values'}
+
+
+def test_shared(cache, builder):
+    cache.acquire(1, ['A.I.focus'])
+    cache.acquire(2, ['A.I.focus'])
+    assert cache.get('A.I.focus') is cache.get('A.I.focus')
+    assert builder.built == ['A.I.focus']
+
+
+def test_rebuilt_on_change(cache, builder):
+    cache.acquire(1, ['A.I.focus'])
+    first = cache.get('A.I.focus')
+    builder.versions['A.I.focus'] = 2
+    assert cache.get('A.I.focus') is not first
+    assert builder.built == ['A.I.focus', 'A.I.focus']
+
+
+def test_evicted_when_released(cache, builder):
+    cache.acquire(1, ['A.I.focus', 'B.I.focus'])
+    cache.acquire(2, ['A.I.focus'])
+    cache.get('A.I.focus')
+    cache.get('B.I.focus')
+    assert len(cache) == 2
+
+    cache.release(1)
+    assert len(cache) == 1
+    cache.get('A.I.focus')
+    assert builder.built == ['A.I.focus', 'B.I.focus']
+
+    cache.release(2)
+    assert len(cache) == 0
+
+
+def test_not_kept_without_holder(cache, builder):
+    cache.acquire(1, ['A.I.focus'])
+    cache.get('B.I.focus')
+    assert len(cache) == 0
+    cache.get('B.I.focus')
+    assert builder.built == ['B.I.focus', 'B.I.focus']
+
+
+def test_acquire_replaces(cache):
+    cache.acquire(1, ['A.I.focus', 'B.I.focus'])
+    cache.get('A.I.focus')
+    cache.get('B.I.focus')
+    cache.acquire(1, ['A.I.focus'])
+    assert len(cache) == 1
+
+
+def test_concurrent_builds(builder):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_build(file_name):
+        started.set()
+        release.wait(5)
+        return builder.build(file_name)
+
+    cache = IncludeSummaryCache(slow_build, builder.get_version)
+    cache.acquire(1, ['A.I.focus'])
+    threads = [threading.Thread(target=cache.get, args=('A.I.focus',)) for
+               i in range(5)]
+    for t in threads:
+        t.start()
+    started.wait(5)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert builder.built == ['A.I.focus']
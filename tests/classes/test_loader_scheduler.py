@@ -0,0 +1,148 @@
+import concurrent.futures
+import threading
+
+import pytest
+
+from ...classes.loader_scheduler import LoaderScheduler, format_stats
+
+
+class Gate(object):
+    """A load that blocks until it is released."""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.released.wait(5)
+        return self.result
+
+
+def test_run():
+    scheduler = LoaderScheduler()
+    assert scheduler.run(('Loader', 'path'), lambda: {1, 2}) == {1, 2}
+    assert scheduler.get_stats().completed == 1
+
+
+def test_deduplicate():
+    scheduler = LoaderScheduler(max_workers=1)
+    gate = Gate('loaded')
+    first = scheduler.submit(('Loader', 'path'), gate)
+    second = scheduler.submit(('Loader', 'path'), lambda: 'again')
+    assert second is first
+
+    gate.released.set()
+    assert first.result(5) == 'loaded'
+    stats = scheduler.get_stats()
+    assert (stats.completed, stats.deduplicated) == (1, 1)
+
+
+def test_submit_after_result():
+    scheduler = LoaderScheduler(max_workers=1)
+    for i in range(100):
+        assert scheduler.run(('Loader', 'path'), lambda: i) == i
+    assert scheduler.get_stats().deduplicated == 0
+
+
+def test_active_view_first():
+    scheduler = LoaderScheduler(max_workers=1)
+    blocker = Gate()
+    scheduler.submit('blocker', blocker)
+    blocker.started.wait(5)
+
+    order = []
+    scheduler.register_view(1, 'background')
+    scheduler.register_view(2, 'active')
+    background = scheduler.submit('background',
+                                  lambda: order.append('background'))
+    active = scheduler.submit('active', lambda: order.append('active'))
+    scheduler.set_active_view(2)
+
+    blocker.released.set()
+    concurrent.futures.wait([background, active], 5)
+    assert order == ['active', 'background']
+
+
+def test_release_view():
+    scheduler = LoaderScheduler(max_workers=1)
+    blocker = Gate()
+    scheduler.submit('blocker', blocker)
+    blocker.started.wait(5)
+
+    scheduler.register_view(1, 'closed')
+    scheduler.register_view(1, 'shared')
+    scheduler.register_view(2, 'shared')
+    closed = scheduler.submit('closed', lambda: 'closed')
+    shared = scheduler.submit('shared', lambda: 'shared')
+
+    assert scheduler.release_view(1) == 1
+    blocker.released.set()
+    assert shared.result(5) == 'shared'
+    with pytest.raises(concurrent.futures.CancelledError):
+        closed.result(5)
+    assert scheduler.get_stats().cancelled == 1
+
+
+def test_release_running_view():
+    scheduler = LoaderScheduler(max_workers=1)
+    checks = []
+
+    def load():
+        gate()
+        checks.append(scheduler.load_cancelled())
+        if checks[-1]:
+            raise concurrent.futures.CancelledError()
+        return 'loaded'
+
+    gate = Gate()
+    scheduler.register_view(1, 'running')
+    running = scheduler.submit('running', load)
+    gate.started.wait(5)
+    scheduler.release_view(1)
+    gate.released.set()
+    with pytest.raises(concurrent.futures.CancelledError):
+        running.result(5)
+    assert checks == [True]
+    assert not scheduler.load_cancelled()
+
+    # A view that needs the load again keeps it going
+    gate = Gate()
+    scheduler.register_view(1, 'running')
+    running = scheduler.submit('running', load)
+    gate.started.wait(5)
+    scheduler.release_view(1)
+    scheduler.register_view(2, 'running')
+    gate.released.set()
+    assert running.result(5) == 'loaded'
+    assert checks == [True, False]
+
+
+def test_failure():
+    def fail():
+        raise ValueError('Bad datadef')
+
+    scheduler = LoaderScheduler()
+    with pytest.raises(ValueError):
+        scheduler.run('failing', fail)
+    assert scheduler.run('failing', lambda: 'retried') == 'retried'
+
+
+def test_wait_times():
+    now = [0]
+    scheduler = LoaderScheduler(max_workers=1, clock=lambda: now[0])
+    blocker = Gate()
+    scheduler.submit('blocker', blocker)
+    blocker.started.wait(5)
+
+    queued = scheduler.submit('queued', lambda: None)
+    assert scheduler.get_stats().queued == 1
+    now[0] = 3
+    blocker.released.set()
+    queued.result(5)
+
+    stats = scheduler.get_stats()
+    assert stats.max_wait == 3
+    assert stats.average_wait == 1.5
+    assert '3.00s max' in format_stats(stats)
@@ -0,0 +1,85 @@
+import os
+import time
+
+from ...classes import manifest
+
+
+def write_ring(root, files):
+    for path, contents in files.items():
+        full_path = root.join(*path.split('/'))
+        full_path.dirpath().ensure(dir=True)
+        full_path.write(contents)
+    return str(root)
+
+
+def test_diff(tmpdir):
+    left = write_ring(tmpdir.join('DEV'), {
+        'Hha/HhaA.S.focus': 'A',
+        'Hha/HhaB.S.focus': 'B',
+        'Hha/HhaC.S.focus': 'C',
+        'Foc/FocD.S.focus': 'D'})
+    right = write_ring(tmpdir.join('QA'), {
+        'Hha/HhaA.S.focus': 'A',
+        'Hha/HhaB.S.focus': 'B2',
+        'Foc/FocD.S.focus': 'D',
+        'Foc/FocE.S.focus': 'E'})
+
+    left_manifest = manifest.SourceManifest.build(left, max_workers=2)
+    right_manifest = manifest.SourceManifest.build(right, max_workers=2)
+    assert len(left_manifest) == 4
+
+    diff = left_manifest.diff(right_manifest)
+    assert diff.added == [os.path.join('Foc', 'FocE.S.focus')]
+    assert diff.removed == [os.path.join('Hha', 'HhaC.S.focus')]
+    assert diff.changed == [os.path.join('Hha', 'HhaB.S.focus')]
+    assert right_manifest.get_path(diff.changed[0]) == os.path.join(
+        right, 'Hha', 'HhaB.S.focus')
+
+    report = manifest.format_report(diff, 'DEV', 'QA')
+    assert report.startswith('Source Differences: DEV -> QA\n'
+                             'Added:  1     Removed:  1     Changed:  1\n')
+    assert 'Removed in QA:\n    ' + diff.removed[0] in report
+
+
+def test_hashes_are_cached(tmpdir, monkeypatch):
+    root = write_ring(tmpdir, {'Hha/HhaA.S.focus': 'A',
+                               'Hha/HhaB.S.focus': 'B'})
+    manifest.SourceManifest.Hashes.clear()
+    first = manifest.SourceManifest.build(root)
+
+    changed = tmpdir.join('Hha', 'HhaB.S.focus')
+    changed.write('Changed')
+    stat = os.stat(str(changed))
+    os.utime(str(changed), (stat.st_atime, stat.st_mtime + 10))
+
+    opened = []
+    real_open = open
+    monkeypatch.setattr(manifest, 'open',
+                        lambda f, *args: opened.append(f) or
+                        real_open(f, *args), raising=False)
+    second = manifest.SourceManifest.build(root)
+    assert opened == [str(changed)]
+    assert first.diff(second).changed == [os.path.join('Hha',
+                                                       'HhaB.S.focus')]
+
+
+def test_build_benchmark(tmpdir):
+    """Hashing a cached manifest again only stats the files."""
+    root = tmpdir.mkdir('PgmSource')
+    for app in range(20):
+        folder = root.mkdir('App%s' % app)
+        for i in range(100):
+            folder.join('File%s.S.focus' % i).write('x' * 2000)
+
+    manifest.SourceManifest.Hashes.clear()
+    start = time.perf_counter()
+    first = manifest.SourceManifest.build(str(root))
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    second = manifest.SourceManifest.build(str(root))
+    warm = time.perf_counter() - start
+
+    assert first.hashes == second.hashes
+    assert warm < 2, '2000 files: cold {0:.3f}s, warm {1:.3f}s'.format(
+        cold, warm)
@@ -0,0 +1,33 @@
+import pytest
+
+from ...classes.member_map import MemberMap
+from .test_source_tree import MEMBERS, legacy_member_region, load_resources
+
+
+@pytest.mark.parametrize('contents', load_resources())
+def test_get_member_region(contents):
+    member_map = MemberMap(contents)
+    for point in range(len(contents) + 1):
+        assert (member_map.get_member_region(point) ==
+                legacy_member_region(contents, point)), point
+
+
+def test_members():
+    member_map = MemberMap(MEMBERS)
+    assert [(k, MEMBERS[s:e]) for k, s, e in member_map.members] == [
+        (':Code', ':Code First\n//:Doc Purpose\n//     Test\n@Nil;'),
+        (':List', ':List Second\nA\nB'),
+        (':EntryPoint', ':EntryPoint Third\n@Nil;\n')]
+
+
+def test_update():
+    member_map = MemberMap(MEMBERS)
+    assert member_map.update(MEMBERS) is None
+
+    contents = MEMBERS.replace(':Name Other', ':Code Other')
+    assert member_map.update(contents) == (11, 12)
+    assert [m[0] for m in member_map.members] == [
+        ':Code', ':List', ':Code', ':EntryPoint']
+    point = contents.index('Other')
+    assert member_map.get_member_region(point) == (
+        point - 6, point + len('Other'))
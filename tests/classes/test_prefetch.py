@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from ...classes import prefetch
+
+
+@pytest.fixture
+def ring(tmpdir):
+    server = tmpdir.mkdir('server')
+    cache = tmpdir.mkdir('cache').mkdir('Sys').mkdir('PgmCache').mkdir('Ring')
+    source = server.mkdir('PgmSource').mkdir('Hha')
+    for i in range(10):
+        source.join('HhaFile%s.S.focus' % i).write('File %s\n' % i)
+    return str(server), str(cache)
+
+
+def partial(i):
+    return os.path.join('PgmSource', 'Hha', 'HhaFile%s.S.focus' % i)
+
+
+def touch(path, contents):
+    stat = os.stat(path)
+    with open(path, 'w') as f:
+        f.write(contents)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+def statuses(results):
+    return [r.status for r in results]
+
+
+def test_prefetch(ring):
+    server, cache = ring
+    prefetcher = prefetch.Prefetcher(server, cache)
+    paths = [partial(i) for i in range(10)] + [partial(99)]
+    assert statuses(prefetcher.prefetch(paths, max_workers=3)) == (
+        [prefetch.COPIED] * 10 + [prefetch.MISSING])
+
+    cached = os.path.join(cache, partial(3))
+    with open(cached) as f:
+        assert f.read() == 'File 3\n'
+    assert not os.path.exists(cached + '.prefetch')
+
+    # The manifest is reloaded by a new Prefetcher
+    prefetcher = prefetch.Prefetcher(server, cache)
+    assert statuses(prefetcher.prefetch(paths[:3])) == [prefetch.CURRENT] * 3
+
+    touch(os.path.join(server, partial(0)), 'Changed\n')
+    touch(os.path.join(cache, partial(1)), 'Edited\n')
+    touch(os.path.join(server, partial(1)), 'Changed\n')
+    assert statuses(prefetcher.prefetch(paths[:3])) == [
+        prefetch.COPIED, prefetch.MODIFIED, prefetch.CURRENT]
+    with open(os.path.join(cache, partial(1))) as f:
+        assert f.read() == 'Edited\n'
+
+
+def test_existing_cache_files_are_skipped(ring):
+    server, cache = ring
+    dest = os.path.join(cache, partial(0))
+    os.makedirs(os.path.dirname(dest))
+    with open(dest, 'w') as f:
+        f.write('Mine\n')
+
+    prefetcher = prefetch.Prefetcher(server, cache)
+    assert statuses(prefetcher.prefetch([partial(0)])) == [prefetch.SKIPPED]
+    assert not prefetcher.refresh(partial(0))
+
+
+def test_refresh(ring):
+    server, cache = ring
+    prefetcher = prefetch.Prefetcher(server, cache)
+    prefetcher.prefetch([partial(0)])
+    assert not prefetcher.refresh(partial(0))
+
+    touch(os.path.join(server, partial(0)), 'Changed\n')
+    assert prefetcher.refresh(partial(0))
+    with open(os.path.join(cache, partial(0))) as f:
+        assert f.read() == 'Changed\n'
+
+    os.remove(os.path.join(server, partial(0)))
+    assert not prefetcher.refresh(partial(0))
+    assert prefetcher.manifest.get(partial(0)) is None
+
+
+def test_copy_verified(tmpdir, monkeypatch):
+    source = tmpdir.join('source.focus')
+    source.write('Source\n')
+    dest = str(tmpdir.join('copy', 'dest.focus'))
+
+    monkeypatch.setattr(prefetch, 'hash_contents', lambda f: 'corrupt')
+    with pytest.raises(prefetch.PrefetchError):
+        prefetch.copy_verified(str(source), dest)
+    assert os.listdir(str(tmpdir.join('copy'))) == []
+
+
+def test_summarize():
+    results = [prefetch.PrefetchResult('a', prefetch.COPIED),
+               prefetch.PrefetchResult('b', prefetch.FAILED),
+               prefetch.PrefetchResult('c', prefetch.COPIED)]
+    assert prefetch.summarize(results) == '2 copied, 1 failed'
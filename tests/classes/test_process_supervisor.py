@@ -0,0 +1,189 @@
+import io
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from ...classes.process_supervisor import (
+    CANCELLED,
+    FAILED,
+    FINISHED,
+    QUEUED,
+    RUNNING,
+    TIMED_OUT,
+    ProcessSupervisor,
+    format_job,
+    format_jobs
+)
+
+
+def stub(script):
+    """Returns a command that runs a Python script as a stub executable."""
+    return [sys.executable, '-c', script]
+
+
+SLEEP = stub('import time; time.sleep(30)')
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = ProcessSupervisor(max_workers=2)
+    yield supervisor
+    supervisor.cancel_all()
+
+
+def test_exit_code_and_output(supervisor):
+    streamed = []
+    job = supervisor.run(
+        stub('import sys; print("translating"); print("1 error", '
+             'file=sys.stderr); sys.exit(3)'),
+        name='Translate',
+        on_output=lambda j, s, l: streamed.append((s, l)))
+
+    assert job.state == FINISHED
+    assert job.returncode == 3
+    assert not job.succeeded
+    assert job.get_output('stdout') == ['translating']
+    assert job.get_output('stderr') == ['1 error']
+    assert sorted(streamed) == [('stderr', '1 error'),
+                                ('stdout', 'translating')]
+    assert str(job) == '#1 Translate'
+
+
+def test_on_exit(supervisor):
+    ended = []
+    job = supervisor.submit(stub('pass'), on_exit=ended.append)
+    assert job.wait(10)
+    assert ended == [job]
+    assert job.succeeded
+
+
+def test_timeout(supervisor):
+    job = supervisor.run(SLEEP, timeout=0.5)
+    assert job.state == TIMED_OUT
+    assert job.returncode is not None
+
+
+def test_cancel_running(supervisor):
+    started = threading.Event()
+    job = supervisor.submit(
+        stub('import time; print("started", flush=True); time.sleep(30)'),
+        on_output=lambda j, s, l: started.set())
+    assert started.wait(10)
+    assert job.state == RUNNING
+    assert supervisor.cancel(job)
+    assert job.wait(10)
+    assert job.state == CANCELLED
+    assert not supervisor.cancel(job)
+
+
+def test_bounded_and_cancel_queued(supervisor):
+    running = [supervisor.submit(SLEEP) for i in range(2)]
+    queued = supervisor.submit(stub('pass'))
+    assert queued.state == QUEUED
+    assert len(supervisor.get_active_jobs()) == 3
+
+    assert supervisor.cancel(queued)
+    assert queued.done
+    assert queued.state == CANCELLED
+    assert queued.started is None
+
+    for job in running:
+        supervisor.cancel(job)
+        assert job.wait(10)
+    assert supervisor.get_active_jobs() == []
+    assert supervisor.get_jobs()[0].state == CANCELLED
+
+
+def test_queued_job_runs_when_slot_frees(supervisor):
+    first = supervisor.submit(SLEEP)
+    second = supervisor.submit(SLEEP)
+    third = supervisor.submit(stub('pass'))
+    supervisor.cancel(first)
+    assert third.wait(10)
+    assert third.succeeded
+    supervisor.cancel(second)
+
+
+def test_detached_starts_right_away(supervisor):
+    running = [supervisor.submit(SLEEP) for i in range(2)]
+    detached = supervisor.submit(stub('pass'), detached=True)
+    assert detached.wait(10)
+    assert detached.succeeded
+    assert detached in supervisor.get_jobs()
+
+    for job in running:
+        supervisor.cancel(job)
+
+
+def test_run_wait_includes_queue_time(supervisor):
+    running = [supervisor.submit(SLEEP) for i in range(2)]
+    job = supervisor.run(stub('pass'), wait_timeout=0.5)
+    assert job.state == CANCELLED
+    assert job.started is None
+
+    for job in running:
+        supervisor.cancel(job)
+
+
+def test_child_holding_output():
+    supervisor = ProcessSupervisor(stop_timeout=0.5)
+    start = time.time()
+    job = supervisor.run(stub(
+        'import subprocess, sys; '
+        'subprocess.Popen([sys.executable, "-c", '
+        '"import time; time.sleep(5)"]); print("started")'))
+    assert time.time() - start < 4
+    assert job.state == FINISHED
+    assert job.returncode == 0
+
+
+class UnstoppableProcess(object):
+    """A process that ignores kill until it's released."""
+
+    def __init__(self, args, **kwargs):
+        self.stdout = io.BytesIO()
+        self.stderr = io.BytesIO()
+        self.released = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self.released.wait(timeout):
+            raise subprocess.TimeoutExpired('unstoppable', timeout)
+        return -9
+
+    def kill(self):
+        pass
+
+
+def test_run_stop_timeout():
+    processes = []
+
+    def popen(args, **kwargs):
+        processes.append(UnstoppableProcess(args, **kwargs))
+        return processes[-1]
+
+    supervisor = ProcessSupervisor(popen=popen, stop_timeout=0.2)
+    job = supervisor.run(['unstoppable'], wait_timeout=0.2)
+    assert not job.done
+    assert job.state == RUNNING
+
+    processes[0].released.set()
+    assert job.wait(10)
+    assert job.state == CANCELLED
+
+
+def test_failed_to_start(supervisor):
+    job = supervisor.run(['focus-supervisor-missing-executable'])
+    assert job.state == FAILED
+    assert job.error
+    assert 'failed' in format_job(job, job.finished)
+
+
+def test_format_jobs(supervisor):
+    job = supervisor.run(stub('print("done")'), name='Format HhaPat.focus')
+    text = format_jobs([job], job.finished)
+    assert text.startswith('#1 finished (exit code 0), ')
+    assert text.endswith(': Format HhaPat.focus\n    done')
+    assert format_jobs([], 0) == 'No jobs'
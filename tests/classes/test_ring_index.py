@@ -0,0 +1,171 @@
+import concurrent.futures
+import os
+
+import pytest
+
+from ...classes import ring_index
+from ...classes.ring_index import RingIndex, find_alias_definition
+from ...tools import mls
+
+
+SOURCE = """#Include
+  :Source
+    Folder    Hha
+    File      HhaZ.Tools.I.focus
+
+#Magic
+:Code Main
+@CallSub(Tool),
+@@Listed(),
+@@Included();
+"""
+
+TOOLS = """#Include
+  :Source
+    Folder    Hha
+    File      HhaZ.Second.I.focus
+
+#Magic
+:Code Tool
+@Nil;
+"""
+
+SECOND = """#Alias
+  :Alias    Included
+
+#Magic
+:List    Tool
+A
+
+:Code Other
+@Nil;
+"""
+
+LISTED = """#Magic
+:EntryPoint Entry
+  Alias Listed
+
+:Code Entry
+@Nil;
+"""
+
+DATADEF = """#DataDef
+:Object HhaZ
+:Record Main
+:Field Name
+:Index ByName
+:IndexKey Name
+
+#Magic
+:Code Unused
+@Nil;
+"""
+
+
+def write_record(fields):
+    return mls.START + mls.SEPARATOR.join(fields) + mls.END
+
+
+@pytest.fixture
+def ring(tmpdir):
+    ring = tmpdir.mkdir('DEV.Ring')
+    hha = ring.mkdir('PgmSource').mkdir('Hha')
+    hha.join('HhaZ.Test.S.focus').write(SOURCE)
+    hha.join('HhaZ.Tools.I.focus').write(TOOLS)
+    hha.join('HhaZ.Second.I.focus').write(SECOND)
+    hha.join('HhaZ.Listed.S.focus').write(LISTED)
+    hha.join('HhaZ.Page.E.focus').write('')
+    ring.mkdir('DataDefs').join('HhaZ.focus').write(DATADEF)
+    ring.join('AliasList.mls').write(
+        write_record(['Listed', 'Entry', 'HhaZ.Listed.S', 'Hha']))
+    return ring
+
+
+def test_get_objects(ring, monkeypatch):
+    parsed = []
+    get_defined_objects = ring_index.get_defined_objects
+
+    def count(contents):
+        parsed.append(contents)
+        return get_defined_objects(contents)
+
+    monkeypatch.setattr(ring_index, 'get_defined_objects', count)
+    index = RingIndex()
+    objects = index.get_objects(str(ring.join('DataDefs')))
+    assert {k: v.get_names() for k, v in objects.items()} == {
+        'Object': ['HhaZ'],
+        'Record': ['HhaZ.Main'],
+        'Field': ['HhaZ.Name'],
+        'Element': ['HhaZ.Name'],
+        'Index': ['HhaZ.ByName'],
+        'IndexKey': ['HhaZ.ByName.Name']}
+
+    assert index.get_objects(str(ring.join('DataDefs'))) == objects
+    assert len(parsed) == 1
+    assert index.get_objects(str(ring.join('Missing'))) == {}
+
+
+def test_get_include_files(ring):
+    include_files, external_pagesets = RingIndex().get_include_files(
+        str(ring.join('PgmSource')))
+    assert sorted(include_files) == ['HhaZ.Second.I.focus',
+                                     'HhaZ.Tools.I.focus']
+    assert external_pagesets == ['HhaZ.Page.E.focus']
+
+
+def test_find_member(ring):
+    hha = ring.join('PgmSource', 'Hha')
+    index = RingIndex()
+    file_name, span = index.find_member(
+        str(hha.join('HhaZ.Test.S.focus')), 'Tool', [str(ring)])
+    assert file_name == str(hha.join('HhaZ.Tools.I.focus'))
+    assert TOOLS[span[0]:span[1]] == 'Tool'
+
+    file_name, span = index.find_member(
+        str(hha.join('HhaZ.Test.S.focus')), 'Other', [str(ring)])
+    assert file_name == str(hha.join('HhaZ.Second.I.focus'))
+    assert SECOND[span[0]:span[1]] == 'Other'
+
+    assert index.find_member(str(hha.join('HhaZ.Test.S.focus')), 'Main',
+                             [str(ring)]) is None
+
+
+def test_find_alias(ring):
+    hha = ring.join('PgmSource', 'Hha')
+    file_name = str(hha.join('HhaZ.Test.S.focus'))
+    alias_list = str(ring.join('AliasList.mls'))
+    index = RingIndex()
+
+    listed_file, span = index.find_alias('Listed', file_name, alias_list,
+                                         [str(ring)])
+    assert listed_file == str(hha.join('HhaZ.Listed.S.focus'))
+    assert span == find_alias_definition(LISTED, 'Listed')
+    assert LISTED[span[0]:span[1]] == 'Entry'
+
+    included_file, span = index.find_alias('Included', file_name, None,
+                                           [str(ring)])
+    assert included_file == str(hha.join('HhaZ.Second.I.focus'))
+    assert SECOND[span[0]:span[1]] == 'Included'
+
+    assert index.find_alias('Missing', file_name, alias_list,
+                            [str(ring)]) is None
+
+
+def test_check_cancelled(ring):
+    def check_cancelled():
+        raise concurrent.futures.CancelledError()
+
+    with pytest.raises(concurrent.futures.CancelledError):
+        RingIndex().get_include_files(str(ring.join('PgmSource')),
+                                      check_cancelled)
+
+
+def test_reparse_changed_file(ring):
+    hha = ring.join('PgmSource', 'Hha')
+    index = RingIndex()
+    tools = str(hha.join('HhaZ.Tools.I.focus'))
+    assert list(index.get_members(tools)) == ['Tool']
+
+    hha.join('HhaZ.Tools.I.focus').write(TOOLS + '\n:Code Added\n@Nil;\n')
+    os.utime(tools, (0, 0))
+    assert list(index.get_members(tools)) == ['Tool', 'Added']
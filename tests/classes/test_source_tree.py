@@ -0,0 +1,191 @@
+import os
+import re
+
+import pytest
+
+from ...classes.source_tree import SourceTree, get_source_tree
+from ...classes.translator_tree import MAGIC_KEYWORDS
+
+
+RESOURCES = os.path.join(os.path.dirname(__file__), '..', '..', 'resources')
+
+
+SOURCE = """#Include
+  :Source
+    Folder    Hha
+    File      HhaZ.Tools.I.focus
+
+//------------------------------------------------------------------------------
+#Locals
+  :Name                           Total
+  // Running total
+
+  :Name                           Count
+
+#Alias
+  :Alias                          LocalAlias
+    Scope                         Local
+  :Alias                          GlobalAlias
+    Scope                         Global
+
+#Magic
+:Code Add
+//:Doc Purpose
+//     Adds two numbers
+//:Doc Arguments
+//     {A - First
+//     |B - Second}
+Var: Sum
+^{A,B},
+A+B^Sum;
+
+:List Values
+A
+B
+
+:EntryPoint Start
+@Nil;
+"""
+
+
+def substr(span):
+    return SOURCE[span[0]:span[1]]
+
+
+MEMBERS = """#Magic
+:Code First
+//:Doc Purpose
+//     Test
+@Nil;
+
+
+:List Second
+A
+B
+
+:Name Other
+
+:EntryPoint Third
+@Nil;
+"""
+
+HEADER_MATCHER = re.compile(r"(#[A-Za-z]+|:[A-Za-z]+) *(.+)?$")
+
+
+def legacy_member_region(contents, point):
+    """
+    Reference implementation of FSCompatibility.get_member_region, which
+    walks the lines before and after point.
+
+    """
+    lines = contents.split('\n')
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+    row = max(i for i in range(len(lines)) if offsets[i] <= point)
+
+    for start_row in range(row, -1, -1):
+        match = HEADER_MATCHER.match(lines[start_row])
+        if match and match.group(1) in MAGIC_KEYWORDS:
+            break
+    else:
+        return None
+
+    end_row = None
+    for i in range(start_row + 1, len(lines)):
+        if lines[i] == '':
+            continue
+        if HEADER_MATCHER.match(lines[i]):
+            break
+        end_row = i
+    else:
+        end = offsets[-1] - 1
+        return (offsets[start_row], end) if end >= point else None
+
+    end = offsets[(end_row if end_row is not None else start_row) + 1] - 1
+    return (offsets[start_row], end) if end >= point else None
+
+
+def load_resources():
+    contents = [MEMBERS]
+    for name in sorted(os.listdir(RESOURCES)):
+        if name.endswith('.focus'):
+            with open(os.path.join(RESOURCES, name)) as f:
+                contents.append(f.read())
+    return contents
+
+
+def test_translators():
+    tree = SourceTree(SOURCE)
+    assert [t.name for t in tree.translators] == [
+        '#Include', '#Locals', '#Alias', '#Magic']
+
+    include, locals_, alias, magic = tree.translators
+    assert substr(include.span).endswith('HhaZ.Tools.I.focus')
+    assert substr(locals_.span).endswith(':Name                           Count')
+    assert substr(magic.span).endswith('@Nil;')
+    assert magic.entries == ()
+
+    source, = include.entries
+    assert source.keyword == ':Source'
+    assert [(a.keyword, a.value) for a in source.attributes] == [
+        ('Folder', 'Hha'), ('File', 'HhaZ.Tools.I.focus')]
+    assert substr(source.attributes[1].value_span) == 'HhaZ.Tools.I.focus'
+
+    assert [(e.value, substr(e.value_span)) for e in
+            tree.get_entries('Locals', ':Name')] == [
+        ('Total', 'Total'), ('Count', 'Count')]
+    assert substr(locals_.entries[0].span).endswith('// Running total')
+
+    assert [e.value for e in tree.get_entries('#Alias') if
+            e.attributes[0].value == 'Local'] == ['LocalAlias']
+
+
+def test_members():
+    tree = SourceTree(SOURCE)
+    assert [(m.keyword, m.name) for m in tree.members] == [
+        (':Code', 'Add'), (':List', 'Values'), (':EntryPoint', 'Start')]
+
+    code = tree.get_member('Add')
+    assert substr(code.header) == ':Code Add'
+    assert substr(code.doc).startswith('//:Doc Purpose')
+    assert substr(code.doc).endswith('|B - Second}')
+    assert substr(code.declaration) == 'Var: Sum'
+    assert substr(code.body) == '^{A,B},\nA+B^Sum;'
+    assert [(d.name, substr(d.span)) for d in code.doc_sections] == [
+        ('Purpose', '//:Doc Purpose\n//     Adds two numbers'),
+        ('Arguments', '//:Doc Arguments\n//     {A - First\n'
+                      '//     |B - Second}')]
+
+    values = tree.get_member('Values', (':List',))
+    assert values.doc[0] == values.doc[1] == values.header[1] + 1
+    assert values.declaration == (values.doc[0], values.doc[0])
+    assert substr(values.body) == 'A\nB'
+
+    start = tree.get_member('Start')
+    assert start.span[1] == len(SOURCE)
+    assert tree.get_member('Start', (':Code',)) is None
+
+
+@pytest.mark.parametrize('contents', load_resources() + [SOURCE])
+def test_get_member_region(contents):
+    tree = SourceTree(contents)
+    for point in range(len(contents) + 1):
+        assert (tree.get_member_region(point) ==
+                legacy_member_region(contents, point)), point
+
+
+def test_member_spans():
+    tree = SourceTree(MEMBERS)
+    assert [(m.keyword, MEMBERS[m.span[0]:m.span[1]]) for m in
+            tree.members] == [
+        (':Code', ':Code First\n//:Doc Purpose\n//     Test\n@Nil;'),
+        (':List', ':List Second\nA\nB'),
+        (':EntryPoint', ':EntryPoint Third\n@Nil;\n')]
+
+
+def test_get_source_tree_cache():
+    SourceTree.Trees.clear()
+    tree = get_source_tree(SOURCE)
+    assert get_source_tree(SOURCE) is tree
+    assert get_source_tree(SOURCE + '\n') is not tree
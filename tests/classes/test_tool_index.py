@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from ...classes import tool_index
+from ...classes.tool_index import ToolIndex, parse_tool_file
+
+
+A_TOOLS = """\
+:Code Bigger
+//  Returns the bigger value
+ ^A,IF{A>B A;B}
+:Code add
+ A+B
+"""
+
+B_TOOLS = """\
+:Code Copy
+ ""
+"""
+
+
+def write(path, contents, mtime=None):
+    with open(path, 'w') as f:
+        f.write(contents)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def tools_path(tmpdir):
+    write(str(tmpdir.join('aTools.fs')), A_TOOLS, 1000)
+    write(str(tmpdir.join('bTools.fs')), B_TOOLS, 1000)
+    write(str(tmpdir.join('Xternal.fs')), ':Code Skipped\n', 1000)
+    write(str(tmpdir.join('aNotes.txt')), ':Code Skipped\n', 1000)
+    return str(tmpdir)
+
+
+def test_parse_tool_file():
+    entries = parse_tool_file(os.path.join('RTTools', 'aTools.fs'), A_TOOLS)
+    assert [e.name for e in entries] == ['@aB', '@aa']
+    span = entries[0].span
+    assert A_TOOLS[span[0]:span[1]] == 'Bigger'
+
+
+def test_get_tool(tools_path):
+    index = ToolIndex(tools_path)
+    assert sorted(index.get_tools()) == ['@aB', '@aa', '@bC']
+
+    entry = index.get_tool('@bC')
+    assert entry.file_name == os.path.join(tools_path, 'bTools.fs')
+    assert index.get_tool('@xS') is None
+
+
+def test_first_definition_wins(tools_path):
+    write(os.path.join(tools_path, 'aMore.fs'), ':Code Bottom\n', 1000)
+    index = ToolIndex(tools_path)
+    entry = index.get_tool('@aB')
+    assert os.path.basename(entry.file_name) == 'aMore.fs'
+
+
+def test_refresh(tools_path, monkeypatch):
+    index = ToolIndex(tools_path)
+    first = index.get_tools()
+
+    read = []
+    original = parse_tool_file
+
+    def counting_parse(file_name, contents):
+        read.append(os.path.basename(file_name))
+        return original(file_name, contents)
+
+    monkeypatch.setattr(tool_index, 'parse_tool_file', counting_parse)
+
+    write(os.path.join(tools_path, 'bTools.fs'), ':Code Delete\n', 2000)
+    assert index.get_tools() is first
+    assert read == []
+
+    index.expire()
+    tools = index.get_tools()
+    assert read == ['bTools.fs']
+    assert '@bD' in tools
+    assert '@bC' not in tools
+
+    os.remove(os.path.join(tools_path, 'bTools.fs'))
+    index.expire()
+    assert sorted(index.get_tools()) == ['@aB', '@aa']
+
+
+def test_missing_folder(tmpdir):
+    index = ToolIndex(str(tmpdir.join('RTTools')))
+    assert index.get_tools() == {}
+    assert len(index) == 0
@@ -0,0 +1,143 @@
+import os
+import random
+import re
+
+import pytest
+
+from ...classes.translator_tree import MAGIC_KEYWORDS, TranslatorTree
+
+
+RESOURCES = os.path.join(os.path.dirname(__file__), '..', '..', 'resources')
+
+SCREEN = """//------------------------------------------------------------------------------
+#ScreenPage
+  :Name                           Main
+  :Region
+    :Container                    Outer
+      :Container                  Inner
+        :Field
+          Prompt                  Hello
+          DisplayWidth            10
+
+        :Button
+          Text                    Ok
+  :Code OnLoad
+@Nil;
+#Include
+  :Code(Broken)
+"""
+
+
+def legacy_tree(lines, row, trim_containers=False):
+    """
+    Reference implementation of FocusCompatibility.build_translator_tree,
+    operating on a list of lines. A trailing blank line is appended so the
+    first line of the file is processed like every other line.
+
+    """
+    translator_tree = list()
+    found_container = False
+    iterator = iter(lines[row::-1] + [''])
+    line = next(iterator)
+
+    pattern = r'^(\s*)((:|#)[A-Za-z0-9]*|[A-Za-z0-9]+)(\s*)(.*)$'
+    match = re.match(pattern, line)
+
+    if match is None:
+        translator_tree.append(('', ''))
+        pattern = r"^(\s*)((:|#)[A-Za-z0-9]*)(\s*)(.*)$"
+
+    for line in iterator:
+        if match is not None:
+            if (trim_containers and (match.group(2) == ':Container')):
+                if not found_container:
+                    translator_tree.append((match.group(2), match.group(5)))
+                    found_container = True
+            else:
+                if ((match.group(4) == '') and (match.group(5) != '')):
+                    translator_tree.append(
+                        ('', match.group(2) + match.group(5)))
+                else:
+                    translator_tree.append((match.group(2), match.group(5)))
+                    if match.group(2) in MAGIC_KEYWORDS:
+                        translator_tree.append(('#Magic', ''))
+                        break
+
+            if match.group(3) == '#':
+                break
+            else:
+                pattern = r"^(\s{0,%s})((:|#)[A-Za-z0-9]*)(\s*)(.*)$" % (
+                    len(match.group(1)) - 2)
+
+        match = re.match(pattern, line)
+
+    translator_tree.reverse()
+    return translator_tree
+
+
+def assert_matches_legacy(tree, contents):
+    lines = contents.split('\n')
+    for row in range(len(lines)):
+        for trim in (False, True):
+            assert (tree.get_tree(row, trim) ==
+                    legacy_tree(lines, row, trim)), (row, lines[row])
+
+
+def load_resources():
+    contents = [SCREEN]
+    for name in sorted(os.listdir(RESOURCES)):
+        if name.endswith('.focus'):
+            with open(os.path.join(RESOURCES, name)) as f:
+                contents.append(f.read())
+    return contents
+
+
+@pytest.mark.parametrize('contents', load_resources())
+def test_get_tree(contents):
+    assert_matches_legacy(TranslatorTree(contents), contents)
+
+
+def test_get_tree_values():
+    tree = TranslatorTree(SCREEN)
+    assert tree.get_tree(8) == [('#ScreenPage', ''), (':Region', ''),
+                                (':Container', 'Outer'),
+                                (':Container', 'Inner'), (':Field', ''),
+                                ('DisplayWidth', '10')]
+    assert tree.get_tree(8, trim_containers=True) == [
+        ('#ScreenPage', ''), (':Region', ''), (':Container', 'Inner'),
+        (':Field', ''), ('DisplayWidth', '10')]
+    assert tree.get_tree(13) == [('#Magic', ''), (':Code', 'OnLoad'),
+                                 ('', '')]
+    assert tree.get_tree(15) == [('#Include', ''), ('', ':Code(Broken)')]
+
+
+def test_update_reparses_changed_lines():
+    tree = TranslatorTree(SCREEN)
+    assert tree.update(SCREEN) is None
+
+    lines = SCREEN.split('\n')
+    lines[9] = '        :List'
+    assert tree.update('\n'.join(lines)) == (9, 10)
+
+    lines.insert(4, '  :Region')
+    assert tree.update('\n'.join(lines)) == (4, 5)
+    assert_matches_legacy(tree, '\n'.join(lines))
+
+
+def test_random_edits():
+    rand = random.Random(26)
+    contents = load_resources()
+    pool = [l for c in contents for l in c.split('\n')]
+    lines = contents[0].split('\n')
+    tree = TranslatorTree('\n'.join(lines))
+
+    for _ in range(100):
+        start = rand.randrange(len(lines))
+        end = min(len(lines), start + rand.randrange(4))
+        lines[start:end] = rand.sample(pool, rand.randrange(4))
+        if not lines:
+            lines = ['']
+        tree.update('\n'.join(lines))
+        for _ in range(5):
+            row = rand.randrange(len(lines))
+            assert tree.get_tree(row) == legacy_tree(lines, row)
@@ -0,0 +1,245 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from ...classes import unit_tests
+
+
+SOURCE = """#Magic
+:Code Add
+//:Doc Purpose
+//     Adds two numbers
+//:Doc Unit Test
+//     :Test Simple
+//     Input {1,2}
+//     Output 3
+//     :Test Missing
+//     Output 3
+//:Doc Returns
+//     Sum
+^{A,B},
+A+B;
+
+:Code NoTests
+//:Doc Purpose
+//     Nothing to test
+@Nil;
+
+:Code Main
+// Unit Test Log: "Main"
+@Nil;
+"""
+
+# Stub for magic.exe. Translating fails for files containing "Broken".
+# Running finds the results file in the Unit Test file and writes canned
+# results for each subroutine.
+STUB_MAGIC = r'''
+import re
+import sys
+
+action, path = sys.argv[1:3]
+with open(path) as f:
+    contents = f.read()
+
+if action == 'translate':
+    sys.exit(1 if 'Broken' in contents else 0)
+
+file_name, results = re.search(
+    r'\{"(.+?)","(.+?)"\}@CallSub\(UnitTestTemplate_WriteResults\)',
+    contents).groups()
+tests = re.findall(r'\{"([^"]+)"\}""', contents)
+failed = [t for t in tests if 'Fail' in t]
+with open(results, 'w') as f:
+    f.write('Unit Test Results: %s\n' % file_name)
+    f.write('Passed:  %s/%s     Failed:  %s/%s\n' % (
+        len(tests) - len(failed), len(tests), len(failed), len(tests)))
+    for t in tests:
+        f.write('    Unit Test: %s - %s\n' % (
+            t, 'Failed' if t in failed else 'Passed'))
+'''
+
+MAIN_TEMPLATE = """#Magic
+:Code Main
+{tests}
+{{"{file_name}","{results_file}"}}@CallSub(UnitTestTemplate_WriteResults),
+"";
+"""
+
+
+def test_get_unit_test_subroutines():
+    subroutines = unit_tests.get_unit_test_subroutines(SOURCE)
+    assert len(subroutines) == 1
+
+    subroutine = subroutines[0]
+    assert subroutine.subroutine_name == 'Add'
+    assert [t.name for t in subroutine.unit_tests] == ['Simple']
+    assert subroutine.unit_tests[0].input == '{1,2}'
+    assert subroutine.unit_tests[0].output == '3'
+    assert [e.unit_test_name for e in subroutine.errors] == ['Missing']
+
+
+def test_filter_source():
+    filtered = unit_tests.filter_source(SOURCE.split('\n'))
+    assert ':Code Add' in filtered
+    assert ':Code Main' not in filtered
+    assert '"Main"' not in filtered
+
+
+def test_get_unit_test_file_name():
+    assert unit_tests.get_unit_test_file_name(
+        os.path.join('Cache'),
+        os.path.join('Source', 'Hha', 'HhaTest.Thing.S.focus')) == \
+        os.path.join('Cache', 'PgmSource', 'Hha',
+                     'HhaTest.Thing.UnitTest.P.focus')
+
+
+def write_job(tmpdir, name, tests):
+    unit_test_file_name = str(tmpdir.join(name + '.UnitTest.P.focus'))
+    results_file_name = str(tmpdir.join(name + '.txt'))
+    test_lines = '\n'.join('{{"{0}"}}""'.format(t) for t in tests)
+    with open(unit_test_file_name, 'w') as f:
+        f.write(MAIN_TEMPLATE.format(tests=test_lines,
+                                     file_name=name + '.P.focus',
+                                     results_file=results_file_name))
+    return unit_tests.UnitTestJob(name + '.P.focus', unit_test_file_name,
+                                  results_file_name)
+
+
+@pytest.fixture
+def magic(tmpdir):
+    stub = tmpdir.join('magic.py')
+    stub.write(STUB_MAGIC)
+
+    def translate(path):
+        return subprocess.call(
+            [sys.executable, str(stub), 'translate', path]) == 0
+
+    def run(path):
+        subprocess.call([sys.executable, str(stub), 'run', path])
+
+    return translate, run
+
+
+def test_run_unit_test_jobs(tmpdir, magic):
+    translate, run = magic
+    jobs = [write_job(tmpdir, 'File%s' % i, ['Test%s' % i, 'Other'])
+            for i in range(6)]
+    jobs.append(write_job(tmpdir, 'Failing', ['Pass', 'Fail']))
+    jobs.append(write_job(tmpdir, 'Broken', ['Pass']))
+
+    cleaned = []
+    results = unit_tests.run_unit_test_jobs(jobs, translate, run,
+                                            cleanup=cleaned.append,
+                                            max_workers=3)
+
+    assert [r.file_name for r in results] == [j.file_name for j in jobs]
+    assert sorted(cleaned) == sorted(jobs)
+    assert [(r.passed, r.failed) for r in results] == (
+        [(2, 0)] * 6 + [(1, 1), (0, 0)])
+    assert results[-1].error == 'Translating Unit Test file failed'
+    assert not results[-2].succeeded
+
+    summary = unit_tests.format_summary(results)
+    assert summary.startswith('Unit Test Summary: 8 files\n'
+                              'Passed:  13/14     Failed:  1/14\n'
+                              'Errors:  1\n')
+    assert 'Unit Test Results: File3.P.focus' in summary
+    assert re.search(r'Unit Test: Fail - Failed', summary)
+    assert 'Unit Test Results: Broken.P.focus\nError:' in summary
+
+
+def test_format_summary_all_passed():
+    results = [unit_tests.UnitTestResults(
+        'A.P.focus', text='Unit Test Results: A.P.focus\n'
+                          'Passed:  1/1     Failed:  0/1\n')]
+    assert '**All Tests Passed**' in unit_tests.format_summary(results)
+
+
+CACHED_SOURCE = """#Locals
+  :Name Total
+
+#Magic
+:Code First
+//:Doc Unit Test
+//     :Test One
+//     Input 1
+//     Output 2
+@CallSub(Helper);
+
+:Code Second
+//:Doc Unit Test
+//     :Test Two
+//     Input 2
+//     Output 2
+|0;
+
+:Code Helper
+|0+1;
+"""
+
+RESULTS = """Unit Test Results: Cached.P.focus
+Passed:  1/2     Failed:  1/2
+
+:Code {0}
+    Unit Test: {1} - Passed
+:Code {2}
+    Unit Test: {3} - Failed
+"""
+
+
+def get_keys(contents, include_hashes=()):
+    subroutines = unit_tests.get_unit_test_subroutines(contents)
+    return unit_tests.UnitTestResultCache.get_keys(contents, subroutines,
+                                                   include_hashes)
+
+
+def test_result_cache_keys():
+    keys = get_keys(CACHED_SOURCE)
+    assert sorted(keys) == ['First', 'Second']
+
+    changed = get_keys(CACHED_SOURCE.replace('|0+1', '|0+2'))
+    assert changed['First'] != keys['First']
+    assert changed['Second'] == keys['Second']
+
+    changed = get_keys(CACHED_SOURCE.replace('Output 2\n|0', 'Output 3\n|0'))
+    assert changed['First'] == keys['First']
+    assert changed['Second'] != keys['Second']
+
+    changed = get_keys(CACHED_SOURCE.replace('Total', 'Count'))
+    assert changed['First'] != keys['First']
+
+    changed = get_keys(CACHED_SOURCE, ['abc'])
+    assert changed['Second'] != keys['Second']
+
+
+def test_unit_test_plan():
+    unit_tests.UnitTestResultCache.Results.clear()
+
+    plan = unit_tests.UnitTestPlan('Cached.P.focus', CACHED_SOURCE)
+    assert [s.subroutine_name for s in plan.pending] == ['First', 'Second']
+
+    text = RESULTS.format('First', 'One', 'Second', 'Two')
+    results = plan.get_results(
+        unit_tests.UnitTestResults('Cached.P.focus', text=text))
+    assert (results.passed, results.failed) == (1, 1)
+
+    contents = CACHED_SOURCE.replace('Output 2\n|0', 'Output 3\n|0')
+    plan = unit_tests.UnitTestPlan('Cached.P.focus', contents)
+    assert [s.subroutine_name for s in plan.pending] == ['Second']
+    assert list(plan.cached) == ['First']
+
+    text = ('Unit Test Results: Cached.P.focus\n'
+            'Passed:  1/1     Failed:  0/1\n\n'
+            ':Code Second\n    Unit Test: Two - Passed\n')
+    results = plan.get_results(
+        unit_tests.UnitTestResults('Cached.P.focus', text=text))
+    assert (results.passed, results.failed) == (2, 0)
+    assert results.text.index(':Code First') < results.text.index(
+        ':Code Second')
+
+    plan = unit_tests.UnitTestPlan('Cached.P.focus', contents)
+    assert not plan.pending
+    assert plan.get_results().succeeded
@@ -1,4 +1,6 @@
+import os
 import platform
+import time
 import pytest
 
 from ...tools import focus
@@ -80,3 +82,91 @@ def test_error_get_ring_locations(universe, ring, is_local):
         assert (rp.lower(), cp.lower()) == (
             'C:\Program Files (x86)\MEDITECH\PTCTDEV.Universe\DEV25.Ring'.lower(),
             'C:\ProgramData\MEDITECH\PTCTDEV.Universe\DEV25.Ring'.lower())
+
+
+@pytest.mark.parametrize('file_path, universe, ring, is_local',
+                         [(f, u, r, l) for f, u, r, l, rp, cp in test_data])
+def test_parse_ring_path_cached(file_path, universe, ring, is_local):
+    # The second call is answered from the folder cache
+    focus.parse_ring_path(file_path)
+    assert focus.parse_ring_path(file_path) == (universe, ring, is_local)
+
+
+@pytest.mark.parametrize('file_path', [
+    r'C:\Program Files (x86)\MEDITECH\PTCTQA.Universe\QA26.Ring',
+    r'C:\Program Files (x86)\MEDITECH\PTCTQA.Universe\QA26.Ring\Local',
+    r'C:\Program Files (x86)\MEDITECH\PTCTQA.Universe\QA26.Ring\Local\A.focus',
+    r'C:\Program Files (x86)\MEDITECH\PTCTQA.Universe\QA26.Ring\PgmSource\Hha',
+    r'C:\Magic\PTCTQA.Universe\QA26.Ring.Local\Hha\A.focus',
+])
+def test_parse_ring_path_matches_regex(file_path):
+    parent = file_path.rsplit('\\', 2)[0] + '\\Parent.focus'
+    focus.parse_ring_path(parent)
+    assert (focus.parse_ring_path(file_path) ==
+            focus.match_ring_path(file_path))
+
+
+def test_parse_ring_path_benchmark():
+    """
+    Compares the per-call latency of parse_ring_path with matching every
+    path with RING_MATCHER, over a mix of ring and non-ring paths like the
+    ones seen on view activation and completion checks.
+
+    """
+    paths = [f for f, u, r, l, rp, cp in test_data]
+    paths.extend(['C:\\Users\\user\\Documents\\notes{0}.txt'.format(i) for
+                  i in range(20)])
+    paths.extend([
+        'C:\\ProgramData\\MEDITECH\\PTCTDEV.Universe\\DEV25.Ring.Local\\'
+        '!AllUsers\\Sys\\PgmCache\\Ring\\PgmSource\\Hha\\HhaZ.File{0}.P.focus'
+        .format(i) for i in range(50)])
+    paths = paths * 200
+
+    timings = {}
+    for func in (focus.match_ring_path, focus.parse_ring_path):
+        start = time.perf_counter()
+        results = [func(p) for p in paths]
+        timings[func.__name__] = (time.perf_counter() - start) / len(paths)
+        assert results == [focus.match_ring_path(p) for p in paths]
+
+    assert timings['parse_ring_path'] < timings['match_ring_path'], (
+        ', '.join('{0}: {1:.2f} us per call'.format(k, v * 1e6) for
+                  k, v in sorted(timings.items())))
+
+
+def write_root_table(path, ring_root):
+    with open(path, 'w') as f:
+        f.write('\x01Ring\x03\x03{0}\x03\x03\x03\x03\x02'.format(ring_root))
+
+
+def test_get_root_table(tmpdir, monkeypatch):
+    path = str(tmpdir.join('Root Table.mls'))
+    write_root_table(path, 'Root1')
+    table = focus.get_root_table(path)
+    assert table[('Ring', '')][0] == 'Root1'
+
+    parsed = []
+    monkeypatch.setattr(focus, 'read_mls',
+                        lambda p: parsed.append(p) or {'parsed': p})
+    assert focus.get_root_table(path) is table
+    assert not parsed
+
+    write_root_table(path, 'Root2')
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    assert focus.get_root_table(path) == {'parsed': path}
+
+
+def test_get_root_table_unreachable(monkeypatch):
+    path = 'Q:\\Universe\\PTCT.HCIS\\!RootTable\\DEV.Ring\\Root Table.mls'
+    focus._unreachable_drives.clear()
+
+    checked = []
+    monkeypatch.setattr(focus.os.path, 'isdir',
+                        lambda p: checked.append(p) or False)
+    assert focus.get_root_table(path) is None
+    assert focus.get_root_table(path.replace('DEV', 'LIVE')) is None
+    assert len(checked) == 1
+
+    assert focus.get_root_table(path, retry_interval=0) is None
+    assert len(checked) == 2
@@ -134,3 +134,72 @@ def test_create_folder_failure(tmpdir):
 
     with pytest.raises(OSError):
         general.create_folder(path)
+
+
+def test_file_buffer(tmpdir):
+    path = tmpdir.join('File.focus')
+    path.write_binary(b'#Magic\r\n:Code Main\r\n\r\n@Nil;\r\n')
+
+    buffer = general.FileBuffer.get_buffer(str(path))
+    assert buffer.contents == '#Magic\n:Code Main\n\n@Nil;\n'
+    assert list(buffer.line_starts) == [0, 7, 18, 19]
+    assert list(buffer.iter_lines()) == list(
+        general.read_file_iter(str(path), False))
+    assert list(buffer.iter_lines(skip_blanks=True)) == general.read_file(
+        str(path))
+    assert list(buffer.iter_lines(2, reverse=True)) == [
+        '', ':Code Main', '#Magic']
+
+    point = buffer.contents.index('Main')
+    assert buffer.get_row(point) == 1
+    assert buffer.get_line(1) == ':Code Main'
+    assert buffer.get_line_span(3) == (19, 24)
+    assert buffer.get_row(len(buffer.contents) + 1) is None
+
+    assert general.FileBuffer.get_buffer(str(path)) is buffer
+    path.write_binary(b'#Magic\n')
+    assert general.FileBuffer.get_buffer(str(path)).contents == '#Magic\n'
+
+
+def test_file_buffer_empty(tmpdir):
+    path = tmpdir.join('Empty.focus')
+    path.write('')
+    buffer = general.FileBuffer(str(path))
+    assert buffer.contents == ''
+    assert list(buffer.iter_lines(skip_blanks=True)) == []
+
+
+def test_list_directory(tmpdir):
+    folder = tmpdir.mkdir('PgmSource')
+    folder.join('HhaZ.Tools.I.focus').write('')
+    names = general.list_directory(str(folder))
+    assert names == {os.path.normcase('HhaZ.Tools.I.focus')}
+    assert general.list_directory(str(folder)) is names
+
+    folder.join('HhaZ.Other.I.focus').write('')
+    os.utime(str(folder), (0, 0))
+    assert len(general.list_directory(str(folder))) == 2
+
+    assert general.list_directory(str(folder.join('Missing'))) == set()
+
+
+def test_directory_listing_find_newest(tmpdir):
+    folder = tmpdir.mkdir('PgmObject')
+    folder.join('HhaZ.Tools.P.mps').write('')
+    folder.join('HhaZ.Tools.P.mts').write('')
+    folder.join('HhaZ.Tools.P.focus').write('')
+    folder.join('HhaZ.Tools.PX.mps').write('')
+    os.utime(str(folder.join('HhaZ.Tools.P.mps')), (10, 10))
+    os.utime(str(folder.join('HhaZ.Tools.P.mts')), (5, 5))
+
+    extensions = ('.mps', '.mcs', '.mts')
+    listing = general.DirectoryListing.get_listing(str(folder))
+    assert listing.find_newest('HhaZ.Tools.P', extensions) == str(
+        folder.join('HhaZ.Tools.P.mps'))
+    assert listing.find_newest('HhaZ.Other.P', extensions) is None
+    assert 'HhaZ.Tools.P.focus' in listing
+
+    general.DirectoryListing.invalidate(str(folder))
+    assert general.DirectoryListing.get_listing(str(folder)) is not listing
+    assert general.DirectoryListing.get_listing(
+        str(folder.join('Missing'))) is None
@@ -0,0 +1,123 @@
+import io
+import random
+import re
+import time
+
+import pytest
+
+from ...tools import mls
+
+
+# The regular expressions tools.focus.read_mls and HomeCareRing.load_aliases
+# used before the record reader.
+ROOT_TABLE_MATCHER = re.compile(
+    r'{start}(.+?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?)'
+    r'{end}'.format(start=mls.START, sep=mls.SEPARATOR, end=mls.END))
+
+ALIAS_MATCHER = re.compile(
+    r'{start}(.+?){sep}.+?{sep}(.+?){sep}(.+?)({sep}.*?)?{end}'.format(
+        start=mls.START, sep=mls.SEPARATOR, end=mls.END))
+
+
+def write_list(fields):
+    return (mls.START +
+            mls.SEPARATOR.join(write_list(f) if isinstance(f, list) else f
+                               for f in fields) +
+            mls.END)
+
+
+def read(contents, chunk_size=mls.CHUNK_SIZE):
+    return list(mls.iter_records(io.StringIO(contents), chunk_size))
+
+
+def random_field(rand):
+    return ''.join(rand.choice('AbZ09 .\\') for _ in
+                   range(rand.randint(0, 8)))
+
+
+def random_records(seed, count, field_counts, empty=True):
+    rand = random.Random(seed)
+    for _ in range(count):
+        fields = [random_field(rand) for _ in
+                  range(rand.choice(field_counts))]
+        fields[0] = fields[0] or 'Name'
+        if not empty:
+            fields = [f or 'Field' for f in fields]
+        yield fields
+
+
+def test_iter_records():
+    contents = ('\n' + write_list(['A', '', 'B']) + '\r\n' +
+                write_list(['C', ['D', ['E', 'F']], '']) +
+                write_list([]) + write_list(['G']))
+    expected = [['A', '', 'B'], ['C', ['D', ['E', 'F']], ''], [''], ['G']]
+    for chunk_size in (1, 2, 3, 5, 64):
+        assert read(contents, chunk_size) == expected, chunk_size
+
+
+def test_incomplete_record():
+    contents = write_list(['A']) + mls.START + 'B' + mls.SEPARATOR + 'C'
+    assert read(contents, 2) == [['A']]
+    nested = write_list(['A']) + mls.START + 'B' + mls.START + 'C' + mls.END
+    assert read(nested, 2) == [['A']]
+
+
+def test_stop_early():
+    contents = ''.join(write_list(['Key%s' % i, 'Value']) for i in
+                       range(10000))
+    f = io.StringIO(contents)
+    record = mls.find_record(mls.iter_records(f, 100), 'Key5', 'Value')
+    assert record == ['Key5', 'Value']
+    assert f.tell() == 100
+
+
+def test_matches_root_table_regex():
+    contents = ''.join(write_list(r) + '\n' for r in
+                       random_records(38, 500, [7]))
+    expected = {m[0:2]: m[2:] for m in ROOT_TABLE_MATCHER.findall(contents)}
+    assert {tuple(r[0:2]): tuple(r[2:]) for r in read(contents, 100)} == \
+        expected
+
+
+def test_matches_alias_regex():
+    # The regular expression runs into the next field when a field is empty
+    contents = ''.join(write_list(r) + '\n' for r in
+                       random_records(380, 2000, [1, 3, 4, 5, 8],
+                                      empty=False))
+    expected = {a[0]: (a[2], a[1]) for a in ALIAS_MATCHER.findall(contents)}
+    assert mls.get_alias_lookup(read(contents, 100)) == expected
+
+    assert mls.get_alias_lookup([['A', 'B', '', 'D'], ['E', 'F', 'G', 'H']]) \
+        == {'E': ('H', 'G')}
+
+
+@pytest.mark.parametrize('nested', [False, True], ids=['flat', 'nested'])
+def test_throughput(nested):
+    """
+    Benchmark for reading a multi-MB alias list, which should take well
+    under a second per MB. Flat records are matched in bulk and should be
+    within a small factor of the regular expression the reader replaced.
+
+    """
+    records = list(random_records(3800, 100000, [6]))
+    if nested:
+        for r in records:
+            r[4] = [r[4], [r[5]]]
+    contents = ''.join(write_list(r) + '\n' for r in records)
+    size = len(contents) / 1e6
+    assert size > 2
+
+    start = time.perf_counter()
+    lookup = mls.get_alias_lookup(mls.iter_records(io.StringIO(contents)))
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ALIAS_MATCHER.findall(contents)
+    regex_elapsed = time.perf_counter() - start
+
+    timings = '{0:.1f} MB: reader {1:.3f}s, regex {2:.3f}s'.format(
+        size, elapsed, regex_elapsed)
+    assert len(lookup) > 0
+    assert elapsed < size / 2, timings
+    if not nested:
+        assert elapsed < max(regex_elapsed * 4, 0.5), timings
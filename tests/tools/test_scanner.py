@@ -0,0 +1,130 @@
+import random
+import re
+import time
+
+import pytest
+
+from ...tools import general
+from ...tools import scanner
+
+
+# Copies of the matchers in tools.sublime, which can not be imported outside
+# of Sublime Text.
+FOCUS_FUNCTION_MATCHER = re.compile(r"(?<!\@)\@[A-Za-z]{3,}[A-Za-z0-9]*"
+                                    r"\(([^)]+|\([^)]*\))*\)")
+
+FS_FUNCTION_MATCHER = re.compile(r"(?<!\@)\@([A-Z][A-Za-z]|[A-Za-z]\d+)")
+
+RT_TOOL_MATCHER = re.compile(r"(?<!\@)\@([a-wz][A-Za-z])")
+
+OPERATOR_MATCHER = re.compile(r"@?\~?[\!\#\$\%\&\*\+\-\.\/\:\<\=\>\?\|\\]")
+
+ALIAS_MATCHER = re.compile(r"\@\@[^(]+\(([^)]+|\([^)]*\))*\)")
+
+PAIRS = [
+    (FOCUS_FUNCTION_MATCHER, scanner.FocusFunctionScanner()),
+    (FS_FUNCTION_MATCHER, scanner.FSFunctionScanner()),
+    (RT_TOOL_MATCHER, scanner.RTToolScanner()),
+    (OPERATOR_MATCHER, scanner.OperatorScanner()),
+    (ALIAS_MATCHER, scanner.AliasScanner()),
+]
+
+IDS = ['focus_function', 'fs_function', 'rt_tool', 'operator', 'alias']
+
+# Weighted towards the characters the matchers care about
+ALPHABET = ('@@@@((()))AbcxyZ019~+-.:\\ ,\n٣é')
+
+EXAMPLES = [
+    '@Abc(1,2)',
+    '@Abc(@Def(1),2)',
+    '@@Abc(@Def(1),2)',
+    '@@@Abc(1)',
+    '@@(1)@@A(2)',
+    '@Ab(1)@Abcd1(2)@1bcd(3)',
+    '@Abc(',
+    '@Abc()',
+    'A@Ab@a1@A٣٣@xy@zz@@Zz',
+    '@~+@+~-@@~:a\\b',
+]
+
+
+def spans(matcher, string, pos=0):
+    return [m.span() for m in matcher.finditer(string, pos)]
+
+
+def random_strings(seed, count, max_length, closed=False):
+    rand = random.Random(seed)
+    for _ in range(count):
+        string = ''.join(rand.choice(ALPHABET) for _ in
+                         range(rand.randint(0, max_length)))
+        # The matchers take exponential time when a call is not closed, so
+        # long strings end in a close parenthesis.
+        if closed:
+            string += ')'
+        yield string
+
+
+@pytest.mark.parametrize('matcher,scan', PAIRS, ids=IDS)
+def test_examples(matcher, scan):
+    for string in EXAMPLES:
+        assert spans(scan, string) == spans(matcher, string), string
+        for pos in range(len(string)):
+            assert spans(scan, string, pos) == spans(matcher, string, pos)
+            match = matcher.match(string, pos)
+            scan_match = scan.match(string, pos)
+            assert ((match and match.span()) ==
+                    (scan_match and scan_match.span())), (string, pos)
+
+
+@pytest.mark.parametrize('matcher,scan', PAIRS, ids=IDS)
+def test_random_short_strings(matcher, scan):
+    for string in random_strings(31, 3000, 12):
+        assert spans(scan, string) == spans(matcher, string), string
+
+
+@pytest.mark.parametrize('matcher,scan', PAIRS, ids=IDS)
+def test_random_long_strings(matcher, scan):
+    for string in random_strings(310, 300, 200, closed=True):
+        assert spans(scan, string) == spans(matcher, string), string
+
+
+@pytest.mark.parametrize('matcher,scan', PAIRS, ids=IDS)
+def test_extract_entity(matcher, scan):
+    for string in random_strings(3100, 200, 40, closed=True):
+        for point in range(len(string) + 1):
+            assert (general.extract_entity(scan, string, point, 10) ==
+                    general.extract_entity(matcher, string, point, 10))
+
+
+def test_scan_match():
+    match = scanner.AliasScanner().search('x = @@Abc(1);')
+    assert match.span() == (4, 12)
+    assert match.group() == '@@Abc(1)'
+    assert (match.start(), match.end()) == (4, 12)
+    with pytest.raises(IndexError):
+        match.group(1)
+
+
+PATHOLOGICAL = [
+    '@Abc(' + '(a' * 20000,
+    '@@Abc(' + 'a' * 20000,
+    ('@Abc(' + '@Def(' * 5000 + '@@Ghi(') * 10,
+    '@' * 50000 + 'Abc(',
+    '@~' * 50000,
+]
+
+
+@pytest.mark.parametrize('string', PATHOLOGICAL)
+def test_pathological_input(string):
+    """
+    Benchmark for inputs where the matchers backtrack exponentially (the
+    first two take hours with FOCUS_FUNCTION_MATCHER and ALIAS_MATCHER).
+    The scanners should get through them in linear time.
+
+    """
+    for _, scan in PAIRS:
+        start = time.perf_counter()
+        list(scan.finditer(string))
+        for point in (0, len(string) // 2, len(string)):
+            general.extract_entity(scan, string, point)
+        assert time.perf_counter() - start < 1
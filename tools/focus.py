@@ -1,10 +1,11 @@
-import glob
 import logging
 import re
 import os
 import platform
+import time
 
-from .general import get_env, read_file
+from .general import DirectoryListing, LimitedSizeDict, get_env, read_file
+from .mls import read_records
 
 
 logger = logging.getLogger(__name__)
@@ -30,26 +31,78 @@ def read_ini(filename):
 
 
 def read_mls(filename):
-    with open(filename, 'r') as f:
-        contents = f.read()
-
-    matches = re.findall(
-        r'{start}(.+?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?){sep}(.*?){end}'.format(
-            start=chr(1), sep=chr(3), end=chr(2)),
-        contents)
+    """
+    Reads a Meditech list file. Root Table.mls files are returned as a dict
+    of the remaining fields of each record keyed by its first two fields;
+    other files are returned as a list of records.
 
+    """
+    records = read_records(filename)
     if os.path.basename(filename).lower() == 'root table.mls':
-        elements = {}
-        for m in matches:
-            elements[m[0:2]] = m[2:]
+        return {tuple(r[0:2]): tuple(r[2:]) for r in records if len(r) > 1}
     else:
-        for m in matches:
-            elements.append(m)
+        return list(records)
 
-    return elements
 
+# Seconds to wait before trying a drive again after failing to reach it
+UNREACHABLE_RETRY_INTERVAL = 300
 
-def parse_ring_path(file_path):
+# Parsed root tables keyed by path, with the modification time they were
+# parsed at.
+_root_tables = LimitedSizeDict(size_limit=64)
+
+# Times drives were last found to be unreachable, keyed by drive.
+_unreachable_drives = {}
+
+
+def get_root_table(path, retry_interval=UNREACHABLE_RETRY_INTERVAL):
+    """
+    Returns the parsed contents of a Root Table.mls file, or None if it
+    doesn't exist or its drive can't be reached.
+
+    Tables are only parsed again when the file is modified. If the drive
+    can't be reached, it isn't checked again for any root table until
+    retry_interval seconds have passed, so resolving several rings on an
+    unreachable server only waits on it once.
+
+    Keyword arguments:
+    path - The path of the Root Table.mls file.
+    retry_interval - The number of seconds to wait before checking an
+        unreachable drive again.
+
+    """
+    drive = os.path.splitdrive(path)[0].lower()
+    failed = _unreachable_drives.get(drive)
+    if (failed is not None) and (time.time() - failed < retry_interval):
+        logger.debug('Skipping unreachable drive %s', drive)
+        return None
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        if drive and not os.path.isdir(drive + os.sep):
+            logger.info('Drive %s unreachable', drive)
+            _unreachable_drives[drive] = time.time()
+        return None
+
+    _unreachable_drives.pop(drive, None)
+
+    key = path.lower()
+    try:
+        table_mtime, table = _root_tables[key]
+    except KeyError:
+        pass
+    else:
+        if table_mtime == mtime:
+            return table
+
+    table = read_mls(path)
+    _root_tables[key] = (mtime, table)
+    return table
+
+
+def match_ring_path(file_path):
+    """Parses a path with RING_MATCHER. See parse_ring_path."""
     is_local = False
     try:
         match = RING_MATCHER.match(file_path)
@@ -63,6 +116,72 @@ def parse_ring_path(file_path):
     return (None, None, False)
 
 
+# Results of match_ring_path for the folders seen, keyed by folder.
+_ring_folders = LimitedSizeDict(size_limit=1024)
+
+
+def _get_parent_ring_folder(folder):
+    """
+    Returns the cached result for a folder inside a ring folder that has
+    already been seen, or None.
+
+    """
+    parent = folder
+    while True:
+        index = parent.rfind('\\')
+        if index < 0:
+            return None
+        child = parent[index + 1:].lower()
+        parent = parent[:index]
+
+        try:
+            result = _ring_folders[parent]
+        except KeyError:
+            continue
+
+        # A folder named Local directly under the ring folder is matched as
+        # a local ring.
+        if (result[0] is None) or (parent.lower().endswith('.ring') and
+                                   (child == 'local')):
+            return None
+        return result
+
+
+def parse_ring_path(file_path):
+    """
+    Returns a tuple of the universe name, ring name and whether the ring is
+    local for a path in a ring, or (None, None, False).
+
+    Every file in a folder is in the same ring, so results are cached by
+    folder, and new folders inside a ring folder that has been seen are
+    resolved from the cache without matching RING_MATCHER.
+
+    """
+    try:
+        index = file_path.rindex('\\')
+    except (AttributeError, ValueError):
+        return match_ring_path(file_path)
+
+    folder = file_path[:index]
+    name = file_path[index + 1:]
+
+    # The file name itself is only part of the match if it's the ring
+    # folder, or a folder named Local inside it.
+    if folder.lower().endswith('.universe') or (name.lower() == 'local'):
+        return match_ring_path(file_path)
+
+    try:
+        return _ring_folders[folder]
+    except KeyError:
+        pass
+
+    result = _get_parent_ring_folder(folder)
+    if result is None:
+        result = match_ring_path(file_path[:index + 1])
+    _ring_folders[folder] = result
+    return result
+
+
 def get_cache_root():
     version = int(platform.win32_ver()[1].split('.', 1)[0])
     if (version <= 5):
@@ -159,9 +278,12 @@ def get_translated_path(file_path, focus_possible_paths=None):
 
         for path in file_name_list:
             logger.debug("path=%s", path)
-            for f in sorted(glob.glob(path + '*.m?s'), reverse=True):
-                logger.debug(f)
-                if os.path.isfile(f):
-                    return f
+            folder, base_name = os.path.split(path)
+            listing = DirectoryListing.get_listing(folder)
+            if listing is None:
+                continue
+            f = listing.find_newest(base_name, extension_list)
+            if f is not None:
+                return f
 
     return None
@@ -1,8 +1,12 @@
 # Contains general purpose tools used by many modules
 
+from array import array
+import bisect
 from collections import OrderedDict, namedtuple
 import errno
+import locale
 import logging
+import mmap
 import os
 import re
 import sys
@@ -61,6 +65,245 @@ def read_file_iter(filename, filter_out_empty_lines=True):
                 yield line.replace('\n', '')
 
 
+class FileBuffer(object):
+    """
+    The decoded contents of a file, read through a memory map. Buffers are
+    cached by path, modification time and size, so every reader of an
+    unchanged file shares one copy of its contents.
+
+    Newlines are translated the same way as files opened in text mode.
+    Lines are located through a table of line start offsets, which is only
+    built the first time it's needed.
+
+    """
+
+    Buffers = LimitedSizeDict(size_limit=32)
+
+    def __init__(self, file_name, encoding=None):
+        super(FileBuffer, self).__init__()
+        self.file_name = file_name
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+
+        with open(file_name, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                contents = ''
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    with memoryview(m) as data:
+                        contents = str(data, encoding)
+
+        if '\r' in contents:
+            contents = contents.replace('\r\n', '\n').replace('\r', '\n')
+
+        self.contents = contents
+
+    @classmethod
+    def get_buffer(cls, file_name):
+        """
+        Returns the buffer for a file, reading it again only if it has
+        changed since it was last read.
+
+        """
+        stat = os.stat(file_name)
+        key = (file_name.lower(), stat.st_mtime, stat.st_size)
+        try:
+            return cls.Buffers[key]
+        except KeyError:
+            buffer = cls.Buffers[key] = cls(file_name)
+            return buffer
+
+    @property
+    def line_starts(self):
+        """An array of the offset where each line starts."""
+        try:
+            return self._line_starts
+        except AttributeError:
+            contents = self.contents
+            starts = array('L', [0])
+            pos = contents.find('\n')
+            while pos != -1:
+                starts.append(pos + 1)
+                pos = contents.find('\n', pos + 1)
+
+            # Like files opened in text mode, a final newline does not start
+            # another line.
+            if contents.endswith('\n'):
+                starts.pop()
+
+            self._line_starts = starts
+            return self._line_starts
+
+    @property
+    def line_count(self):
+        return len(self.line_starts)
+
+    def get_row(self, point):
+        """Returns the row of the line containing point, or None."""
+        if (point < 0) or (point > len(self.contents)):
+            return None
+        return bisect.bisect_right(self.line_starts, point) - 1
+
+    def get_line_span(self, row):
+        """Returns the start and end of a line, excluding its newline."""
+        starts = self.line_starts
+        start = starts[row]
+        if row + 1 < len(starts):
+            return (start, starts[row + 1] - 1)
+
+        end = len(self.contents)
+        if self.contents.endswith('\n'):
+            end -= 1
+        return (start, end)
+
+    def get_line(self, row):
+        start, end = self.get_line_span(row)
+        return self.contents[start:end]
+
+    def iter_lines(self, start_row=0, reverse=False, skip_blanks=False):
+        """
+        Iterates over the lines of the file, without newlines.
+
+        Keyword arguments:
+        start_row - The row to start at.
+        reverse - If True, iterate from start_row back to the first line.
+        skip_blanks - If True, do not return empty lines.
+
+        """
+        if reverse:
+            rows = range(start_row, -1, -1)
+        else:
+            rows = range(start_row, self.line_count)
+
+        for row in rows:
+            start, end = self.get_line_span(row)
+            if (not skip_blanks) or (end > start):
+                yield self.contents[start:end]
+
+
+class DirectoryListing(object):
+    """
+    The names of the files in a folder. Listings are cached until the
+    modification time of the folder changes, so checking a folder again only
+    costs a stat.
+
+    """
+
+    Listings = LimitedSizeDict(size_limit=256)
+
+    def __init__(self, folder, mtime, names):
+        super(DirectoryListing, self).__init__()
+        self.folder = folder
+        self.mtime = mtime
+        self.names = names
+        self.normalized_names = frozenset(os.path.normcase(n) for n in names)
+
+    @classmethod
+    def get_listing(cls, folder):
+        """Returns the listing for folder, or None if it doesn't exist."""
+        try:
+            mtime = os.stat(folder).st_mtime
+        except OSError:
+            return None
+
+        key = os.path.normcase(folder)
+        try:
+            listing = cls.Listings[key]
+        except KeyError:
+            pass
+        else:
+            if listing.mtime == mtime:
+                return listing
+
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return None
+
+        listing = cls.Listings[key] = cls(folder, mtime, names)
+        return listing
+
+    @classmethod
+    def invalidate(cls, folder):
+        """
+        Drops the cached listing for folder. Only needed when files may have
+        been replaced within the resolution of the folder's modification
+        time.
+
+        """
+        cls.Listings.pop(os.path.normcase(folder), None)
+
+    def __contains__(self, name):
+        return os.path.normcase(name) in self.normalized_names
+
+    @property
+    def base_names(self):
+        """
+        A dictionary mapping each normalized name without its extension to
+        the names in the folder.
+
+        """
+        try:
+            return self._base_names
+        except AttributeError:
+            base_names = dict()
+            for n in self.names:
+                base = os.path.normcase(os.path.splitext(n)[0])
+                base_names.setdefault(base, []).append(n)
+            self._base_names = base_names
+            return self._base_names
+
+    def find_newest(self, base_name, extensions):
+        """
+        Returns the path of the most recently modified file in the folder
+        named base_name with one of the given extensions, or None.
+
+        Keyword arguments:
+        base_name - The name of the file without its extension.
+        extensions - A collection of lower case extensions, including the
+            leading period.
+
+        """
+        names = [n for n in
+                 self.base_names.get(os.path.normcase(base_name), ()) if
+                 os.path.splitext(n)[1].lower() in extensions]
+        paths = [os.path.join(self.folder, n) for n in names]
+        if len(paths) > 1:
+            paths.sort(key=_get_mtime, reverse=True)
+        for path in paths:
+            if os.path.isfile(path):
+                return path
+        return None
+
+
+def _get_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def get_file_version(file_name):
+    """Returns the modified time and size of a file, or None if it's gone."""
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def list_directory(folder):
+    """
+    Returns a frozenset of the names in a folder, normalized with
+    os.path.normcase, or an empty set if the folder doesn't exist.
+
+    """
+    listing = DirectoryListing.get_listing(folder)
+    if listing is None:
+        return frozenset()
+    return listing.normalized_names
+
+
 def _get_match(reg_ex, string, op, flags=0):
     if isinstance(reg_ex, str):
         return getattr(re, op)(reg_ex, string, flags)
@@ -211,6 +454,30 @@ def extract_entity(reg_ex, string, point, base_point=0, match_group=0,
         return MatchResult(None, None)
 
 
+def diff_lines(old_lines, new_lines):
+    """
+    Compares two lists of lines and returns a tuple of (start, old_end,
+    new_end) so that old_lines[start:old_end] was replaced by
+    new_lines[start:new_end]. Returns None if the lists are the same.
+
+    """
+    start = 0
+    limit = min(len(old_lines), len(new_lines))
+    while (start < limit) and (old_lines[start] == new_lines[start]):
+        start += 1
+
+    old_end = len(old_lines)
+    new_end = len(new_lines)
+    while ((old_end > start) and (new_end > start) and
+           (old_lines[old_end - 1] == new_lines[new_end - 1])):
+        old_end -= 1
+        new_end -= 1
+
+    if (start == old_end) and (start == new_end):
+        return None
+    return (start, old_end, new_end)
+
+
 def add_to_path(path):
     """
     Adds path to the system path.
@@ -0,0 +1,155 @@
+# Reader for the Meditech list format used by .mls files and mtIo output.
+#
+# A list is written as START, its fields separated by SEPARATOR, then END.
+# A field is either text or another list. A file is a sequence of top level
+# lists (records), with anything between them ignored.
+
+import re
+
+
+START = chr(1)
+SEPARATOR = chr(3)
+END = chr(2)
+
+# Number of characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+DELIMITER_MATCHER = re.compile('[{0}{1}{2}]'.format(START, SEPARATOR, END))
+
+# A list without nested lists
+FLAT_LIST_MATCHER = re.compile('{0}([^{0}{1}]*){1}'.format(START, END))
+
+# The start of a list that contains a nested list
+NESTED_LIST_MATCHER = re.compile('{0}[^{0}{1}]*{0}'.format(START, END))
+
+
+def _parse_list(buffer, pos):
+    """
+    Parses the list starting at buffer[pos], which must be START.
+
+    Returns a tuple of the list of fields and the position after the list's
+    END, or None if the list does not end within buffer. Text between the
+    end of a nested list and the next delimiter is ignored.
+
+    """
+    parents = []
+    fields = []
+    value = None
+    field_start = pos + 1
+    for match in DELIMITER_MATCHER.finditer(buffer, pos + 1):
+        index = match.start()
+        char = match.group()
+        if char == START:
+            parents.append(fields)
+            fields = []
+            field_start = index + 1
+            continue
+
+        if value is None:
+            value = buffer[field_start:index]
+        fields.append(value)
+        field_start = index + 1
+
+        if char == SEPARATOR:
+            value = None
+        elif parents:
+            value = fields
+            fields = parents.pop()
+        else:
+            return (fields, index + 1)
+
+    return None
+
+
+def iter_records(f, chunk_size=CHUNK_SIZE):
+    """
+    Yields each record in a file as a list of fields. Text fields are
+    strings and nested lists are lists.
+
+    The file is read chunk_size characters at a time, so only the records
+    in the current chunk are held in memory and a caller that stops
+    iterating early doesn't read the rest of the file. A record that isn't
+    ended before the end of the file is not returned.
+
+    Keyword arguments:
+    f - A file object opened in text mode.
+    chunk_size - The number of characters to read at a time.
+
+    """
+    buffer = f.read(chunk_size)
+    pos = 0
+    while buffer:
+        match = NESTED_LIST_MATCHER.search(buffer, pos)
+        if match is None:
+            nested = len(buffer)
+        else:
+            nested = match.start()
+
+        # Flat records are matched in bulk up to the next nested record
+        for fields in FLAT_LIST_MATCHER.findall(buffer, pos, nested):
+            yield fields.split(SEPARATOR)
+
+        if match is not None:
+            result = _parse_list(buffer, nested)
+            if result is not None:
+                record, pos = result
+                yield record
+                continue
+            start = nested
+        else:
+            # Keep the last record if it hasn't ended yet
+            start = buffer.rfind(START, pos)
+            if (start == -1) or (buffer.find(END, start) != -1):
+                start = len(buffer)
+
+        more = f.read(max(chunk_size, len(buffer) - start))
+        if not more:
+            return
+        buffer = buffer[start:] + more
+        pos = 0
+
+
+def read_records(filename, chunk_size=CHUNK_SIZE):
+    """
+    Yields each record in the file at filename. See iter_records.
+
+    The file is closed when iteration finishes or the generator is closed.
+
+    """
+    with open(filename, 'r') as f:
+        for record in iter_records(f, chunk_size):
+            yield record
+
+
+def find_record(records, *key):
+    """
+    Returns the first record whose leading fields equal key, or None. Stops
+    reading as soon as the record is found.
+
+    Keyword arguments:
+    records - An iterable of records, such as from read_records.
+    key - The values of the leading fields to look for.
+
+    """
+    size = len(key)
+    for record in records:
+        if tuple(record[:size]) == key:
+            return record
+    return None
+
+
+def get_alias_lookup(records):
+    """
+    Returns a dict of the Alias definitions in the records of an alias list.
+    Each Alias name maps to a tuple of the folder and file of the subroutine
+    that defines it.
+
+    Records with fewer than four fields, or with any of the first four
+    empty, are skipped.
+
+    """
+    lookup = {}
+    for record in records:
+        if (len(record) >= 4) and all(record[:4]):
+            lookup[record[0]] = (record[3], record[2])
+    return lookup
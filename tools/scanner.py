@@ -0,0 +1,250 @@
+# Hand written scanners for the entities extracted from Focus and FS code.
+#
+# The scanners find exactly the same spans as the regular expressions in
+# tools.sublime, but never backtrack. FOCUS_FUNCTION_MATCHER and ALIAS_MATCHER
+# use a nested quantifier which is exponential on long lines with unbalanced
+# parentheses, and they are run on every hover and completion trigger.
+
+from abc import ABCMeta, abstractmethod
+from string import ascii_letters, ascii_lowercase, ascii_uppercase, digits
+
+
+LETTERS = frozenset(ascii_letters)
+ALPHANUMERICS = frozenset(ascii_letters + digits)
+UPPERCASE = frozenset(ascii_uppercase)
+RT_TOOL_START = frozenset(ascii_lowercase) - frozenset('xy')
+OPERATORS = frozenset('!#$%&*+-./:<=>?|\\')
+
+
+class ScanMatch(object):
+    """
+    The result of a successful scan. Supports the subset of the match object
+    interface used by tools.general, which only uses the whole match (group
+    0).
+
+    """
+
+    __slots__ = ('string', '_start', '_end')
+
+    def __init__(self, string, start, end):
+        self.string = string
+        self._start = start
+        self._end = end
+
+    def __repr__(self):
+        return '<ScanMatch span=({0}, {1}) match={2!r}>'.format(
+            self._start, self._end, self.group())
+
+    @staticmethod
+    def _check_group(group):
+        if group != 0:
+            raise IndexError('no such group')
+
+    def span(self, group=0):
+        self._check_group(group)
+        return (self._start, self._end)
+
+    def start(self, group=0):
+        self._check_group(group)
+        return self._start
+
+    def end(self, group=0):
+        self._check_group(group)
+        return self._end
+
+    def group(self, group=0):
+        self._check_group(group)
+        return self.string[self._start:self._end]
+
+
+class Scanner(object, metaclass=ABCMeta):
+    """
+    Base class for the scanners. Subclasses implement iter_spans, which
+    yields the (start, end) of each non-overlapping match from a position.
+
+    Scanners can be passed anywhere tools.general accepts a compiled regular
+    expression. They hold no state between calls, so a single instance can
+    be shared between threads.
+
+    """
+
+    @abstractmethod
+    def iter_spans(self, string, pos):
+        pass
+
+    def finditer(self, string, pos=0):
+        for start, end in self.iter_spans(string, pos):
+            yield ScanMatch(string, start, end)
+
+    def search(self, string, pos=0):
+        for match in self.finditer(string, pos):
+            return match
+        return None
+
+    def match(self, string, pos=0):
+        match = self.search(string, pos)
+        if (match is not None) and (match.start() == pos):
+            return match
+        return None
+
+
+class NextFinder(object):
+    """
+    Finds the next occurrence of a character at or after a position. Lookups
+    must be made with non-decreasing positions, which lets the last result be
+    reused so scanning a string only takes linear time.
+
+    """
+
+    def __init__(self, string, char):
+        self.string = string
+        self.char = char
+        self.found = -1
+        self.exhausted = False
+
+    def find(self, pos):
+        if (self.found < pos) and not self.exhausted:
+            self.found = self.string.find(self.char, pos)
+            self.exhausted = self.found == -1
+        return -1 if self.exhausted else self.found
+
+
+def _at_candidates(string, pos):
+    """Yields the positions of each @ that does not follow another @."""
+    pos = string.find('@', pos)
+    while pos != -1:
+        if (pos == 0) or (string[pos - 1] != '@'):
+            yield pos
+        pos = string.find('@', pos + 1)
+
+
+def _scan_run(string, pos, chars):
+    """Returns the end of the run of characters in chars starting at pos."""
+    size = len(string)
+    while (pos < size) and (string[pos] in chars):
+        pos += 1
+    return pos
+
+
+class FocusFunctionScanner(Scanner):
+    """
+    Scanner for Focus function calls such as @Abc(...). Equivalent to
+    tools.sublime.FOCUS_FUNCTION_MATCHER: the name starts with three letters
+    and the call ends at the first close parenthesis after the name.
+
+    """
+
+    def iter_spans(self, string, pos):
+        close_finder = NextFinder(string, ')')
+        candidates = _at_candidates(string, pos)
+        for start in candidates:
+            if start < pos:
+                continue
+
+            open_ = _scan_run(string, start + 1, ALPHANUMERICS)
+            if ((open_ - start <= 3) or (string[open_:open_ + 1] != '(') or
+                    not all(c in LETTERS for c in string[start + 1:start + 4])):
+                continue
+
+            close = close_finder.find(open_ + 1)
+            if close == -1:
+                # No later call can be closed either
+                return
+
+            yield (start, close + 1)
+            pos = close + 1
+
+
+class AliasScanner(Scanner):
+    """
+    Scanner for Alias calls such as @@Alias(...). Equivalent to
+    tools.sublime.ALIAS_MATCHER: the name runs to the first open parenthesis
+    and the call ends at the first close parenthesis after that.
+
+    """
+
+    def iter_spans(self, string, pos):
+        open_finder = NextFinder(string, '(')
+        close_finder = NextFinder(string, ')')
+        start = string.find('@@', pos)
+        while start != -1:
+            open_ = open_finder.find(start + 2)
+            if open_ == -1:
+                return
+
+            if open_ > start + 2:
+                close = close_finder.find(open_ + 1)
+                if close == -1:
+                    return
+                yield (start, close + 1)
+                start = string.find('@@', close + 1)
+            else:
+                start = string.find('@@', start + 1)
+
+
+class FSFunctionScanner(Scanner):
+    """
+    Scanner for FS functions such as @Ab or @A1. Equivalent to
+    tools.sublime.FS_FUNCTION_MATCHER.
+
+    """
+
+    def iter_spans(self, string, pos):
+        for start in _at_candidates(string, pos):
+            if start < pos:
+                continue
+
+            first = string[start + 1:start + 2]
+            second = string[start + 2:start + 3]
+            if (first in UPPERCASE) and (second in LETTERS):
+                end = start + 3
+            elif (first in LETTERS) and second.isdecimal():
+                end = start + 3
+                while string[end:end + 1].isdecimal():
+                    end += 1
+            else:
+                continue
+
+            yield (start, end)
+            pos = end
+
+
+class RTToolScanner(Scanner):
+    """
+    Scanner for RT Tool calls such as @ab. Equivalent to
+    tools.sublime.RT_TOOL_MATCHER.
+
+    """
+
+    def iter_spans(self, string, pos):
+        for start in _at_candidates(string, pos):
+            if start < pos:
+                continue
+
+            if ((string[start + 1:start + 2] in RT_TOOL_START) and
+                    (string[start + 2:start + 3] in LETTERS)):
+                yield (start, start + 3)
+                pos = start + 3
+
+
+class OperatorScanner(Scanner):
+    """
+    Scanner for FS operators such as @~+. Equivalent to
+    tools.sublime.OPERATOR_MATCHER.
+
+    """
+
+    def iter_spans(self, string, pos):
+        size = len(string)
+        while pos < size:
+            end = pos
+            if string[end] == '@':
+                end += 1
+            if string[end:end + 1] == '~':
+                end += 1
+
+            if string[end:end + 1] in OPERATORS:
+                yield (pos, end + 1)
+                pos = end + 1
+            else:
+                pos += 1
@@ -37,14 +37,97 @@ SETTINGS_INFO = (
     ('get_ring_utilities', 'ring_utilities', {}),
     ('get_disable_translator_indent', 'disable_translator_indent_for', False),
     ('get_break_label', 'break_label', '{counter}'),
-    ('get_list_entities', 'list_entity_commands', {})
+    ('get_list_entities', 'list_entity_commands', {}),
+    ('get_unit_test_max_workers', 'unit_test_max_workers', 4),
+    ('get_prefetch_max_workers', 'prefetch_max_workers', 4),
+    ('get_analyze_on_save', 'analyze_on_save', False),
+    ('get_analysis_server_python', 'analysis_server_python', ''),
+    ('get_completion_loader_workers', 'completion_loader_workers', 2),
+    ('get_max_processes', 'max_processes', 4),
+    ('get_process_timeout', 'process_timeout', 600)
 )
 
 
+# Key the snapshot's change listener is registered under
+SNAPSHOT_LISTENER_KEY = 'focus_settings_snapshot'
+
+
+class SettingsSnapshot(object):
+    """
+    The values of the settings in SETTINGS_INFO, read once from the settings
+    file, along with forms of them that are used on hot paths.
+
+    Snapshots are never modified. get_snapshot discards the current one when
+    the settings file changes and builds a new one the next time it is
+    called.
+
+    """
+
+    def __init__(self, settings):
+        super(SettingsSnapshot, self).__init__()
+        self.values = {setting_name: settings.get(setting_name, default) for
+                       _, setting_name, default in SETTINGS_INFO}
+
+        self.tool_file_names = frozenset(
+            n.lower() for n in self.values['tool_file_names'])
+        self.server_access = tuple(
+            d.lower() for d in self.values['server_access'])
+        self._completion_sources = settings.get(
+            'enable_smart_completion_sources', True)
+        self._completion_sources_enabled = dict()
+
+    def is_tool_file_name(self, name):
+        """Returns True if name is one of the tool_file_names."""
+        return name.lower() in self.tool_file_names
+
+    def has_server_drive_access(self, drive):
+        """Returns True if drive is one of the server_access drives."""
+        return drive.lower() in self.server_access
+
+    def has_server_path_access(self, path):
+        """Returns True if path is on one of the server_access drives."""
+        return path.lower().startswith(self.server_access)
+
+    def completion_source_enabled(self, completion_type, source):
+        """See get_completion_source_enabled_setting."""
+        key = (completion_type, source)
+        try:
+            return self._completion_sources_enabled[key]
+        except KeyError:
+            enabled = self._completion_sources_enabled[key] = \
+                convert_nested_setting(self._completion_sources,
+                                       completion_type, source)
+            return enabled
+
+
+_snapshot = None
+
+
+def _discard_snapshot():
+    global _snapshot
+    logger.debug('Settings changed')
+    _snapshot = None
+
+
+def get_snapshot():
+    """
+    Returns the SettingsSnapshot for the current settings, building it if
+    the settings have changed since the last call.
+
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        settings = sublime.load_settings(SETTINGS_FILE)
+        settings.clear_on_change(SNAPSHOT_LISTENER_KEY)
+        settings.add_on_change(SNAPSHOT_LISTENER_KEY, _discard_snapshot)
+        snapshot = _snapshot = SettingsSnapshot(settings)
+    return snapshot
+
+
 def add_basic_settings_function(name, setting_name, default):
     def basic_settings_function():
-        settings = sublime.load_settings(SETTINGS_FILE)
-        return settings.get(setting_name, default)
+        return get_snapshot().values[setting_name]
 
     basic_settings_function.__name__ = name
     globals()[name] = basic_settings_function
@@ -141,22 +224,25 @@ def get_completion_trigger_enabled_setting(trigger):
         return bool(s)
 
 
-def get_completion_source_enabled_setting(completion_type, source):
-    settings = sublime.load_settings(SETTINGS_FILE)
-    s = settings.get('enable_smart_completion_sources', True)
-
-    def convert_setting(setting, *args):
-        if isinstance(setting, dict):
-            try:
-                return convert_setting(setting[args[0]], *args[1:])
-            except KeyError:
-                return True
-        elif isinstance(setting, bool):
-            return setting
-        else:
-            return bool(setting)
+def convert_nested_setting(setting, *keys):
+    """
+    Returns whether something is enabled by a setting which is either a
+    bool, or a dict of keys to nested settings. Missing keys are enabled.
+
+    """
+    if isinstance(setting, dict):
+        try:
+            return convert_nested_setting(setting[keys[0]], *keys[1:])
+        except KeyError:
+            return True
+    elif isinstance(setting, bool):
+        return setting
+    else:
+        return bool(setting)
 
-    return convert_setting(s, completion_type, source)
+
+def get_completion_source_enabled_setting(completion_type, source):
+    return get_snapshot().completion_source_enabled(completion_type, source)
 
 
 def get_universe_roots():
@@ -4,6 +4,13 @@ import re
 import sublime
 
 from .general import extract_entity, string_match, read_file
+from .scanner import (
+    AliasScanner,
+    FocusFunctionScanner,
+    FSFunctionScanner,
+    OperatorScanner,
+    RTToolScanner
+)
 
 
 def scope_from_view(view):
@@ -26,44 +33,6 @@ def load_settings(file_name):
     return json.loads(s)
 
 
-def split_member_region(view, codeblock_region):
-    """
-    Splits the codeblock region into header region, documentation region
-    and code region.
-    """
-    start = codeblock_region.begin()
-    if view.score_selector(start, 'meta.subroutine.fs, meta.list.fs') <= 0:
-        yield None
-        yield None
-        yield None
-        yield None
-    else:
-        header_region = view.line(start)
-        yield header_region
-
-        doc_start = header_region.end() + 1
-        if view.score_selector(doc_start, 'comment') > 0:
-            doc_region = view.extract_scope(doc_start)
-            doc_region = sublime.Region(doc_region.begin(), doc_region.end()-1)
-        else:
-            doc_region = sublime.Region(doc_start, doc_start)
-        yield doc_region
-
-        if doc_region.empty():
-            var_declaration_start = doc_region.end()
-        else:
-            var_declaration_start = doc_region.end()+1
-        if view.score_selector(var_declaration_start,
-                'meta.variable.other.local.named.declaration') > 0:
-            var_declaration = view.line(var_declaration_start)
-        else:
-            var_declaration = sublime.Region(var_declaration_start,
-                                             var_declaration_start)
-        yield var_declaration
-
-        yield sublime.Region(var_declaration.end()+1, codeblock_region.end())
-
-
 FOCUS_FUNCTION_MATCHER = re.compile(r"(?<!\@)\@[A-Za-z]{3,}[A-Za-z0-9]*"
                                     r"\(([^)]+|\([^)]*\))*\)")
 
@@ -95,6 +64,18 @@ KEYWORD_ATTRIBUTE_MATCHER = re.compile(
 FOCUS_FILE_MATCHER = re.compile(
     r"([A-Z][a-z]{1,2}[A-Z0-9][A-Za-z0-9.]+?\.[A-Z])(\.focus)?\b")
 
+# Linear time equivalents of the matchers above, used for extraction as the
+# function and alias matchers backtrack exponentially on unbalanced lines.
+FOCUS_FUNCTION_SCANNER = FocusFunctionScanner()
+
+FS_FUNCTION_SCANNER = FSFunctionScanner()
+
+RT_TOOL_SCANNER = RTToolScanner()
+
+OPERATOR_SCANNER = OperatorScanner()
+
+ALIAS_SCANNER = AliasScanner()
+
 
 def extract_focus_function(string, point, base_point=0):
     """
@@ -110,7 +91,7 @@ def extract_focus_function(string, point, base_point=0):
                  and added to the resulting location before it is returned.
 
     """
-    return extract_entity(FOCUS_FUNCTION_MATCHER, string, point, base_point)
+    return extract_entity(FOCUS_FUNCTION_SCANNER, string, point, base_point)
 
 
 def split_focus_function(string, base_point=0):
@@ -141,7 +122,7 @@ def extract_fs_function(string, point, base_point=0):
                  and added to the resulting location before it is returned.
 
     """
-    return extract_entity(FS_FUNCTION_MATCHER, string, point, base_point)
+    return extract_entity(FS_FUNCTION_SCANNER, string, point, base_point)
 
 def extract_rt_tool(string, point, base_point=0):
     """
@@ -157,7 +138,7 @@ def extract_rt_tool(string, point, base_point=0):
                  and added to the resulting location before it is returned.
 
     """
-    return extract_entity(RT_TOOL_MATCHER, string, point, base_point)
+    return extract_entity(RT_TOOL_SCANNER, string, point, base_point)
 
 
 def extract_operator(string, point, base_point=0):
@@ -174,7 +155,7 @@ def extract_operator(string, point, base_point=0):
                  and added to the resulting location before it is returned.
 
     """
-    return extract_entity(OPERATOR_MATCHER, string, point, base_point)
+    return extract_entity(OPERATOR_SCANNER, string, point, base_point)
 
 
 def extract_alias(string, point, base_point=0):
@@ -190,7 +171,7 @@ def extract_alias(string, point, base_point=0):
                  and added to the resulting location before it is returned.
 
     """
-    return extract_entity(ALIAS_MATCHER, string, point, base_point)
+    return extract_entity(ALIAS_SCANNER, string, point, base_point)
 
 
 def extract_subroutine(string, point, base_point=0):
@@ -207,7 +188,7 @@ def extract_subroutine(string, point, base_point=0):
 
     """
     string += ":END"
-    return extract_entity(ALIAS_MATCHER, string, point, base_point)
+    return extract_entity(ALIAS_SCANNER, string, point, base_point)
 
 
 def extract_include_file(string, point, base_point=0):
@@ -346,6 +327,20 @@ def strip_alias(alias):
         return name.group(2)
 
 
+COMPLETION_QUERY_MATCHER = re.compile(r"[\w.]*$")
+
+
+def get_completion_query(view):
+    """
+    Returns the name being completed at the first selection of view: the
+    letters, digits, underscores and dots before the cursor.
+
+    """
+    point = view.sel()[0].begin()
+    line = view.substr(sublime.Region(view.line(point).begin(), point))
+    return COMPLETION_QUERY_MATCHER.search(line).group()
+
+
 def display_in_output_panel(window, panel_id, file_name=None, text=''):
     output_panel = window.create_output_panel(panel_id)
     if file_name is not None: